@@ -0,0 +1,199 @@
+import asyncio
+import math
+import os
+import random
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from aiohttp import web
+
+from modules.media_utils import run_ffmpeg
+from modules.tts_engine import SynthesisResult, EDGE_MP3_BITRATE
+
+# Story sizes in words (a word is about 0.33 s of speech)
+STORY_SIZES = {"small": 60, "medium": 250, "long": 800}
+
+# Background resolutions (width, height): landscape source, exact output size, oversized portrait
+BACKGROUND_RESOLUTIONS = [(1280, 720), (1080, 1920), (2160, 3840)]
+
+WORDS = ("landlord apartment sister wedding neighbor money office manager birthday party husband wife "
+         "roommate kitchen dinner vacation airport phone message parents brother friend school teacher "
+         "car garage dog cat coffee weekend argument secret surprise contract deposit rent lease key").split()
+
+# Silent MPEG-2 Layer III frame: 48 kbps, 24 kHz, mono -> 144 bytes, 576 samples (24 ms),
+# i.e. the same constant bitrate Edge TTS streams, so EDGE_MP3_BITRATE duration math holds
+SILENT_MP3_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + bytes(140)
+MP3_FRAME_SECONDS = 576 / 24000
+
+
+def make_story(size: str, index: int = 0, subreddit: str = "tifu") -> Dict[str, Any]:
+    """
+    Deterministic story with STORY_SIZES[size] words of content.
+    """
+    rng = random.Random(f"{size}-{index}")
+    words = [rng.choice(WORDS) for _ in range(STORY_SIZES[size])]
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+    return {
+        "id": f"{size[:1]}{index:05d}",
+        "fullname": f"t3_{size[:1]}{index:05d}",
+        "subreddit": subreddit,
+        "title": f"TIFU by telling my {rng.choice(WORDS)} about the {rng.choice(WORDS)}",
+        "content": " ".join(sentences),
+        "url": f"https://www.reddit.com/r/{subreddit}/comments/{index}/",
+        "author": f"user{index}",
+        "score": 1000 + rng.randint(0, 9000),
+        "num_comments": rng.randint(0, 500),
+        "created_utc": 1_700_000_000.0 + index,
+    }
+
+
+class FakeTTSBackend:
+    """
+    Deterministic stand-in for EdgeTTSBackend: silent CBR MP3 audio with
+    word boundaries spaced by word length, plus an optional simulated
+    network latency per request.
+    """
+    version = "fake-tts-1"
+
+    def __init__(self, latency: float = 0.0, seconds_per_char: float = 0.06):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+
+    async def synthesize(self, text: str, voice: str) -> SynthesisResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        timings = []
+        t = 0.05
+        for word in text.split():
+            duration = max(0.12, len(word) * self.seconds_per_char)
+            timings.append({"word": word, "start": t, "end": t + duration})
+            t += duration + 0.04
+        frames = math.ceil((t + 0.1) / MP3_FRAME_SECONDS)
+        audio = SILENT_MP3_FRAME * frames
+        return SynthesisResult(audio, timings, len(audio) * 8 / EDGE_MP3_BITRATE)
+
+
+def generate_background(path: str, width: int, height: int, duration: float = 10.0, fps: int = 30) -> str:
+    """
+    Synthetic moving test pattern (ffmpeg testsrc2), encoded like a typical stock clip.
+    """
+    if not os.path.exists(path):
+        run_ffmpeg([
+            "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p", path
+        ])
+    return path
+
+
+def generate_backgrounds(directory: str, resolutions: List[Tuple[int, int]] = BACKGROUND_RESOLUTIONS,
+                         duration: float = 10.0) -> List[str]:
+    os.makedirs(directory, exist_ok=True)
+    return [generate_background(os.path.join(directory, f"pattern_{w}x{h}.mp4"), w, h, duration)
+            for w, h in resolutions]
+
+
+def write_post_html(path: str, story: Dict[str, Any]) -> str:
+    """
+    Static page with a shreddit-post element, for screenshot benchmarks (returns a file:// URL).
+    """
+    html = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><style>
+body {{ background: #0b1416; color: #f2f4f5; font-family: sans-serif; margin: 0; padding: 24px; }}
+shreddit-post {{ display: block; width: 640px; padding: 16px; border-radius: 16px; background: #1a282d; }}
+h1 {{ font-size: 22px; }}
+</style></head><body>
+<shreddit-post><small>r/{story['subreddit']} &middot; u/{story['author']}</small>
+<h1>{story['title']}</h1><p>{story['content'][:600]}</p></shreddit-post>
+</body></html>"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return "file://" + os.path.abspath(path)
+
+
+class FakeRedditServer:
+    """
+    Local server for Reddit's JSON listing and comment endpoints, run on a
+    background thread. Every listing returns `posts_per_listing` deterministic
+    posts; requests with a 'before' cursor get no new posts.
+    """
+    def __init__(self, posts_per_listing: int = 100, story_size: str = "medium",
+                 comments_per_post: int = 20, latency: float = 0.0):
+        self.posts_per_listing = posts_per_listing
+        self.story_size = story_size
+        self.comments_per_post = comments_per_post
+        self.latency = latency
+        self.requests = 0
+        self.base_url = ""
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _post(self, subreddit: str, index: int) -> Dict[str, Any]:
+        story = make_story(self.story_size, index, subreddit)
+        post_id = f"{subreddit[:4].lower()}{story['id']}"
+        return {"kind": "t3", "data": {
+            "id": post_id, "name": f"t3_{post_id}", "title": story["title"],
+            "selftext": story["content"], "url": story["url"], "author": story["author"],
+            "score": story["score"], "num_comments": story["num_comments"],
+            "created_utc": story["created_utc"], "stickied": False, "over_18": False,
+            "subreddit": subreddit,
+        }}
+
+    async def _listing(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        subreddit = request.match_info["subreddit"]
+        if request.query.get("before"):
+            children = []
+        else:
+            limit = min(int(request.query.get("limit", 25)), self.posts_per_listing)
+            children = [self._post(subreddit, i) for i in range(limit)]
+        return web.json_response({"kind": "Listing", "data": {"children": children}})
+
+    async def _comments(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        post_id = request.match_info["post_id"]
+        rng = random.Random(post_id)
+        comments = [{"kind": "t1", "data": {
+            "id": f"{post_id}c{i}", "author": f"commenter{i}", "score": 500 - i,
+            "body": " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 60))),
+            "stickied": False,
+        }} for i in range(self.comments_per_post)]
+        return web.json_response([
+            {"kind": "Listing", "data": {"children": []}},
+            {"kind": "Listing", "data": {"children": comments}},
+        ])
+
+    def start(self) -> str:
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            app = web.Application()
+            app.router.add_get("/r/{subreddit}/{listing}.json", self._listing)
+            app.router.add_get("/comments/{post_id}.json", self._comments)
+            self._runner = web.AppRunner(app)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            self._loop.run_until_complete(site.start())
+            port = site._server.sockets[0].getsockname()[1]
+            self.base_url = f"http://127.0.0.1:{port}"
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="fake-reddit", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.base_url
+
+    def stop(self):
+        if not self._loop:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
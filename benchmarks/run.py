@@ -0,0 +1,349 @@
+"""
+Offline benchmark suite: every stage runs against local stand-ins (fake Reddit
+server, fake TTS backend, generated backgrounds, static HTML), so results only
+depend on this code and this machine.
+
+    python -m benchmarks.run                      # all benchmarks, all sizes
+    python -m benchmarks.run --bench tts,pipeline --sizes small
+    python -m benchmarks.run --compare            # latest two commits side by side
+
+Each case runs in a fresh process with its own working directory (cold
+caches, accurate peak RSS) and appends one JSON line to the results file,
+tagged with the git commit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Any, List, Callable
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+# Frame counts come from the tracer, which is off by default
+os.environ.setdefault("TRACE", "1")
+
+from benchmarks import fixtures # noqa: E402
+
+RESULTS_PATH = os.path.join(REPO_ROOT, "benchmarks", "results.jsonl")
+FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "reddit-tts-bench-fixtures")
+
+
+def bench_reddit(size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Incremental catalog update from the fake listing server, then a comment batch.
+    """
+    from config import Config
+    from modules.reddit_scraper import RedditScraper
+    from modules.reddit_transport import RedditJSONTransport
+    from modules.story_catalog import StoryCatalog
+
+    server = fixtures.FakeRedditServer(posts_per_listing=100, story_size=size, latency=options["latency"])
+    base_url = server.start()
+    try:
+        async def run():
+            catalog = StoryCatalog("catalog.db")
+            async with RedditJSONTransport(base_url=base_url) as transport:
+                scraper = RedditScraper(transport=transport)
+                t0 = time.perf_counter()
+                added = await scraper.update_catalog_async(catalog)
+                t1 = time.perf_counter()
+                post_ids = [story["id"] for story in catalog.candidates(limit=20, min_score=0)]
+                comments = await scraper.fetch_comments_batch(post_ids)
+                t2 = time.perf_counter()
+            return added, t1 - t0, len(comments), t2 - t1
+
+        added, fetch_s, posts, comments_s = asyncio.run(run())
+    finally:
+        server.stop()
+    return {
+        "wall_s": fetch_s + comments_s,
+        "stories": added,
+        "stories_per_s": added / fetch_s,
+        "catalog_update_s": fetch_s,
+        "comment_posts_per_s": posts / comments_s if comments_s else 0.0,
+        "requests": server.requests,
+        "subreddits": len(Config.SUBREDDITS),
+    }
+
+
+def bench_tts(size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Chunked concurrent synthesis of one story (no cache) with simulated backend latency.
+    """
+    from modules.tts_engine import TTSEngine
+
+    story = fixtures.make_story(size)
+    tts = TTSEngine(backend=fixtures.FakeTTSBackend(latency=options["latency"]), cache=False)
+    t0 = time.perf_counter()
+    timings = asyncio.run(tts.generate_audio_long(story["content"], os.path.join("tts", "content.mp3")))
+    wall = time.perf_counter() - t0
+    audio_s = timings[-1]["end"] if timings else 0.0
+    return {
+        "wall_s": wall,
+        "chars_per_s": len(story["content"]) / wall,
+        "audio_s": audio_s,
+        "realtime_factor": audio_s / wall,
+        "words": len(timings),
+    }
+
+
+def bench_keywords(size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Corpus update plus one batch extraction over many stories.
+    """
+    from modules.keyword_engine import KeywordEngine, story_document
+
+    count = 2000
+    documents = [story_document(fixtures.make_story(size, i)) for i in range(count)]
+    texts = [text for _, text in documents]
+    engine = KeywordEngine("vocab.json")
+    t0 = time.perf_counter()
+    engine.add_documents(documents)
+    t1 = time.perf_counter()
+    engine.extract_batch(texts, update=False)
+    t2 = time.perf_counter()
+    return {
+        "wall_s": t2 - t0,
+        "stories": count,
+        "add_stories_per_s": count / (t1 - t0),
+        "extract_stories_per_s": count / (t2 - t1),
+    }
+
+
+def bench_cards(size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Offline Pillow title cards.
+    """
+    from modules.card_renderer import CardRenderer
+
+    renderer = CardRenderer()
+    stories = [fixtures.make_story(size, i) for i in range(20)]
+    t0 = time.perf_counter()
+    for story in stories:
+        renderer.render_title_card(story, f"card_{story['id']}.png")
+    wall = time.perf_counter() - t0
+    return {"wall_s": wall, "cards": len(stories), "ms_per_card": wall / len(stories) * 1000}
+
+
+def bench_screenshot(size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Headless Chrome screenshots of a static post page (skipped without Chrome).
+    """
+    from modules.screenshot_manager import ScreenshotManager
+
+    story = fixtures.make_story(size)
+    url = fixtures.write_post_html("post.html", story)
+    manager = ScreenshotManager()
+    try:
+        manager.capture_screenshot(url, "warmup.png", "shreddit-post")
+        t0 = time.perf_counter()
+        jobs = [(url, f"shot_{i}.png", "shreddit-post") for i in range(6)]
+        ok = manager.capture_many(jobs)
+        wall = time.perf_counter() - t0
+    finally:
+        manager.pool.close()
+    if not any(ok):
+        raise RuntimeError("No screenshots captured (is Chrome installed?)")
+    return {"wall_s": wall, "screenshots": sum(ok), "ms_per_screenshot": wall / len(jobs) * 1000}
+
+
+def bench_backgrounds(size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Proxy transcodes of generated backgrounds at several resolutions, plus index selection.
+    """
+    from modules.background_proxy import BackgroundProxyCache
+    from modules.background_index import BackgroundIndex
+    from modules.media_utils import probe_media
+
+    sources = fixtures.generate_backgrounds(FIXTURE_DIR)
+    cache = BackgroundProxyCache("proxies")
+    metrics: Dict[str, Any] = {"wall_s": 0.0}
+    for source in sources:
+        info = probe_media(source)
+        t0 = time.perf_counter()
+        cache.get_proxy(source)
+        wall = time.perf_counter() - t0
+        label = f"{info['width']}x{info['height']}"
+        metrics[f"proxy_{label}_s"] = wall
+        metrics[f"proxy_{label}_fps"] = info["duration"] * info["fps"] / wall
+        metrics["wall_s"] += wall
+
+    index = BackgroundIndex("index.json")
+    index.scan_directory(FIXTURE_DIR)
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        index.select(["pattern", "landlord"])
+    # 1000 selections: total seconds == milliseconds per selection
+    metrics["index_select_ms"] = time.perf_counter() - t0
+    index.flush()
+    return metrics
+
+
+def bench_pipeline(size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Full story graph with cold caches: title card, fake TTS, local background index, render.
+    """
+    from config import Config
+    from modules.story_graph import build_story_graph, story_input
+    from modules.tracing import get_tracer
+    from modules.tts_engine import TTSEngine
+    from modules.visual_manager import VisualManager
+
+    Config.RENDER_ENGINE = options["engine"]
+    background_dir = os.path.join("assets", "backgrounds")
+    os.makedirs(background_dir, exist_ok=True)
+    source = fixtures.generate_background(os.path.join(FIXTURE_DIR, "pattern_1080x1920.mp4"), 1080, 1920)
+    shutil.copyfile(source, os.path.join(background_dir, "pattern_1080x1920.mp4"))
+
+    story = fixtures.make_story(size)
+    tts = TTSEngine(backend=fixtures.FakeTTSBackend(latency=options["latency"]), cache=False)
+    graph = build_story_graph("work", "final.mp4", tts=tts, visuals=VisualManager())
+    t0 = time.perf_counter()
+    asyncio.run(graph.run({"story": story_input(story)}))
+    wall = time.perf_counter() - t0
+
+    frames = next((row["frames"] for row in get_tracer().summary()
+                   if row["name"] == "VideoAssembler.assemble_video"), 0)
+    metrics = {"wall_s": wall, "frames": frames, "fps": frames / wall if wall else 0.0}
+    for name, (start, end) in graph.timings.items():
+        metrics[f"stage_{name}_s"] = end - start
+    render = graph.timings.get("render")
+    if render and frames:
+        metrics["render_fps"] = frames / (render[1] - render[0])
+    return metrics
+
+
+BENCHMARKS: Dict[str, Callable[[str, Dict[str, Any]], Dict[str, Any]]] = {
+    "reddit": bench_reddit,
+    "tts": bench_tts,
+    "keywords": bench_keywords,
+    "cards": bench_cards,
+    "screenshot": bench_screenshot,
+    "backgrounds": bench_backgrounds,
+    "pipeline": bench_pipeline,
+}
+
+# Benchmarks whose cost doesn't depend on story size run once
+SIZE_INDEPENDENT = {"backgrounds", "screenshot"}
+
+
+def _run_case(name: str, size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Child process entry point: runs one case in a scratch working directory.
+    """
+    from modules.tracing import peak_rss_mb
+
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    os.chdir(work_dir)
+    try:
+        metrics = BENCHMARKS[name](size, options)
+    finally:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(work_dir, ignore_errors=True)
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args) -> str:
+        try:
+            return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+        except OSError:
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run(benches: List[str], sizes: List[str], options: Dict[str, Any], output: str, repeat: int = 1):
+    revision = git_revision()
+    context = get_context("spawn")
+    for name in benches:
+        for size in (["-"] if name in SIZE_INDEPENDENT else sizes):
+            for _ in range(repeat):
+                # Fresh interpreter per case: cold caches, per-case peak RSS
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    try:
+                        metrics = pool.submit(_run_case, name, "medium" if size == "-" else size, options).result()
+                        status = "ok"
+                    except Exception as e:
+                        metrics, status = {"error": f"{type(e).__name__}: {e}"}, "error"
+                record = {
+                    **revision,
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "machine": f"{platform.node()} {platform.machine()} {os.cpu_count()} cpus",
+                    "python": platform.python_version(),
+                    "benchmark": name,
+                    "size": size,
+                    "options": options,
+                    "status": status,
+                    "metrics": metrics,
+                }
+                with open(output, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+                summary = ", ".join(f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}"
+                                    for k, v in metrics.items())
+                print(f"[{status}] {name:<12} {size:<7} {summary}")
+
+
+def compare(output: str, metric: str = "wall_s"):
+    """
+    Prints `metric` for every benchmark/size for the two most recent commits in the results file.
+    """
+    with open(output, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    commits: List[str] = []
+    for record in records:
+        if record["commit"] in commits:
+            commits.remove(record["commit"])
+        commits.append(record["commit"])
+    commits = commits[-2:]
+
+    latest: Dict[tuple, Dict[str, float]] = {}
+    for record in records:
+        if record["commit"] in commits and record["status"] == "ok" and metric in record["metrics"]:
+            key = (record["benchmark"], record["size"], record["options"].get("engine"))
+            latest.setdefault(key, {})[record["commit"]] = record["metrics"][metric]
+
+    print(f"{metric}: " + " -> ".join(commits))
+    for (name, size, engine), values in sorted(latest.items()):
+        row = [f"{values[c]:10.3f}" if c in values else f"{'-':>10}" for c in commits]
+        change = ""
+        if len(commits) == 2 and all(c in values for c in commits) and values[commits[0]]:
+            change = f"{(values[commits[1]] / values[commits[0]] - 1) * 100:+7.1f}%"
+        print(f"  {name:<12} {size:<7} {engine or '':<9}" + " ".join(row) + f"  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks")
+    parser.add_argument("--bench", default=",".join(BENCHMARKS), help="comma separated benchmarks")
+    parser.add_argument("--sizes", default=",".join(fixtures.STORY_SIZES), help="comma separated story sizes")
+    parser.add_argument("--engine", default=None, help="render engine for the pipeline benchmark")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated network latency per request (s)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--compare", action="store_true", help="compare the last two commits instead of running")
+    parser.add_argument("--metric", default="wall_s", help="metric shown by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.output, args.metric)
+        return
+
+    from config import Config
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    options = {"engine": args.engine or Config.RENDER_ENGINE, "latency": args.latency}
+    run([b for b in args.bench.split(",") if b], [s for s in args.sizes.split(",") if s],
+        options, args.output, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,91 @@ class Config:
 
     # Pexels API
     PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")
+    PEXELS_API_URL = os.getenv("PEXELS_API_URL", "https://api.pexels.com/videos/search")
 
     # Settings
     SUBREDDITS = ["AskReddit", "TIFU", "Confession", "TalesFromTechSupport"]
     MIN_UPVOTES = 100
+    REDDIT_FETCH_MODE = os.getenv("REDDIT_FETCH_MODE", "praw") # "praw" (API credentials) or "async" (JSON listings)
+    REDDIT_LISTINGS = [("hot", None), ("top", "day"), ("top", "week")] # (listing, time filter)
+    REDDIT_JSON_BASE_URL = os.getenv("REDDIT_JSON_BASE_URL", "https://www.reddit.com")
+    REDDIT_MAX_CONNECTIONS = 8
+    CATALOG_PATH = os.path.join("assets", "catalog.db") # Local index of seen / rendered stories
+    VIDEO_MODE = os.getenv("VIDEO_MODE", "story") # "story" (title + post body) or "comments" (title + top comments)
+    COMMENTS_PER_POST = 5
+    COMMENT_MAX_CHARS = 600 # Longer comments are skipped in comment mode
+    COMMENT_FETCH_CONCURRENCY = 4
+    COMMENT_CACHE_TTL = 6 * 3600 # Seconds before cached comment trees are refetched
     VOICE_NAME = "en-US-ChristopherNeural" # Edge-TTS voice
+    TTS_CHUNK_CHARS = 800 # Long texts are synthesized in chunks of about this size
+    TTS_CONCURRENCY = 4 # Chunks synthesized at the same time
+    TTS_CACHE_DIR = os.path.join("assets", "cache", "tts") # Set to None to disable the TTS cache
+    TTS_CACHE_MAX_BYTES = 500 * 1024 * 1024
+    BROWSER_POOL_SIZE = 2 # Warm headless Chrome sessions kept for screenshots
+    SCREENSHOT_TIMEOUT = 15 # Seconds to wait for the target element
+    TITLE_CARD_SOURCE = os.getenv("TITLE_CARD_SOURCE", "renderer") # "renderer" (Pillow) or "screenshot" (Chrome)
+    CARD_WIDTH = 980
+    CARD_FONT = os.getenv("CARD_FONT", "arial.ttf")
+    CARD_FONT_BOLD = os.getenv("CARD_FONT_BOLD", "arialbd.ttf")
     VIDEO_WIDTH = 1080
     VIDEO_HEIGHT = 1920
+
+    # Captions
+    CAPTION_FONT = os.getenv("CAPTION_FONT", "arialbd.ttf")
+    CAPTION_CACHE_SIZE = 512 # Bitmaps kept in memory
+    CAPTION_CACHE_DIR = os.path.join("assets", "cache", "captions") # Set to None to disable disk cache
+    CAPTION_PHRASE_MAX_CHARS = 0 # 0 = one word at a time, otherwise group words into short phrases
+
+    # Rendering
+    RENDER_ENGINE = os.getenv("RENDER_ENGINE", "moviepy") # "moviepy", "ffmpeg" or "parallel"
+    RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) # Parallel engine processes, 0 = one per CPU
+    FFMPEG_BINARY = os.getenv("FFMPEG_BINARY") # None = use the one bundled with moviepy
+    FFMPEG_PRESET = "veryfast"
+    FFMPEG_CRF = 23
+    OUTPUT_VARIANTS = [v for v in os.getenv("OUTPUT_VARIANTS", "").split(",") if v] # e.g. "square,landscape", rendered in the same pass
+    VARIANT_FORMATS = {"square": (1080, 1080, 23), "landscape": (1920, 1080, 23)} # name: (width, height, crf)
+    PREVIEW_SCALE = 0.4 # Draft renders (--preview): fraction of the output size
+    PREVIEW_FPS = 8
+    PREVIEW_CRF = 32
+
+    # Audio
+    AUDIO_SAMPLE_RATE = 44100
+    AUDIO_TARGET_DBFS = -16.0 # RMS level title and content speech are normalized to
+    AUDIO_TITLE_GAP = 0.3 # Seconds of silence between the title and the content
+    BACKGROUND_MUSIC = os.getenv("BACKGROUND_MUSIC") # Music file looped under the voice, None = no music
+    MUSIC_VOLUME_DB = -14.0 # Music level relative to the voice, between sentences
+    MUSIC_DUCK_DB = -12.0 # Further attenuation while someone is speaking
+    MUSIC_DUCK_ATTACK = 0.15 # Seconds the music takes to duck before speech starts
+    MUSIC_DUCK_RELEASE = 0.6 # Seconds it takes to come back up after speech stops
+
+    # Backgrounds
+    USE_BACKGROUND_PROXIES = True # Pre-normalize backgrounds to the output size once
+    PROXY_DIR = os.path.join("assets", "cache", "proxies")
+    DOWNLOAD_DIR = os.path.join("assets", "cache", "downloads") # Content-addressed downloaded clips
+    DOWNLOAD_SEGMENTS = 4 # Parallel Range requests per large download
+    SEARCH_CACHE_DIR = os.path.join("assets", "cache", "search")
+    SEARCH_CACHE_TTL = 24 * 3600
+    BACKGROUND_INDEX_PATH = os.path.join("assets", "cache", "background_index.json")
+    BACKGROUND_MATCH_THRESHOLD = 0.3 # Below this keyword overlap, fetch a better clip in the background
+    BACKGROUND_ROTATION_PENALTY = 0.5 # Score divisor grows by this much per previous use
+    BACKGROUND_INDEX_SAVE_INTERVAL = 30 # Seconds between writes of background usage counts
+    KEYWORD_VOCAB_PATH = os.path.join("assets", "cache", "keyword_vocab.json") # Corpus document frequencies for TF-IDF
+
+    # Batch / daemon mode
+    JOB_QUEUE_PATH = os.path.join("assets", "jobs.db")
+    JOBS_DIR = os.path.join("assets", "jobs") # One work directory per job
+    OUTPUT_DIR = os.path.join("assets", "output")
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "2")) # Stories in flight at once
+    IO_WORKERS = 8 # Threads for blocking I/O stages (cards, downloads, screenshots)
+    RENDER_PROCESSES = int(os.getenv("RENDER_PROCESSES", "1")) # Processes for the CPU-heavy render stage
+    JOB_MAX_ATTEMPTS = 3
+    JOB_RETRY_BACKOFF = 60 # Seconds before the first retry, doubled on every further attempt
+    JOB_LEASE_SECONDS = 300 # A running job whose owner hasn't sent a heartbeat for this long is taken over
+    JOB_HEARTBEAT_INTERVAL = 60 # Seconds between lease renewals while a job runs
+    DAEMON_POLL_INTERVAL = 300 # Seconds between Reddit catalog updates
+    TARGET_VIDEOS_PER_HOUR = float(os.getenv("TARGET_VIDEOS_PER_HOUR", "0")) # 0 = as fast as possible
+
+    # Tracing
+    TRACE_ENABLED = os.getenv("TRACE", "0") != "0" # TRACE=1 records timing spans, exported after each run
+    TRACE_DIR = os.path.join("assets", "traces") # Chrome trace JSON (open in chrome://tracing or Perfetto)
+    PROFILE_STAGE = os.getenv("PROFILE_STAGE") # Span name to run under cProfile, e.g. "stage:render"
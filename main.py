@@ -1,105 +1,125 @@
+import argparse
 import asyncio
 from config import Config
+from modules.tracing import get_tracer
 
-async def main():
+def export_trace():
+    """
+    Writes the Chrome trace of this run and prints the per-span summary.
+    """
+    tracer = get_tracer()
+    path = tracer.export()
+    if path:
+        print(f"Trace written to {path} (open in chrome://tracing or ui.perfetto.dev)")
+        print(tracer.format_summary())
+
+async def run_batch(count: int, daemon: bool):
+    """
+    Batch mode: queue `count` stories and produce them all; daemon mode:
+    keep fetching and producing until interrupted. Jobs survive restarts.
+    """
+    from modules.reddit_scraper import RedditScraper
+    from modules.story_catalog import StoryCatalog
+    from modules.batch_runner import BatchRunner
+    runner = BatchRunner(RedditScraper(), StoryCatalog())
+    try:
+        if daemon:
+            print(f"Daemon mode: {runner.concurrency} stories in flight, Ctrl+C to stop.")
+            await runner.run_daemon()
+        else:
+            added = await runner.refresh_catalog()
+            print(f"{added} new stories added to catalog.")
+            queued = runner.enqueue_stories(count)
+            print(f"Queued {queued} stories.")
+            await runner.drain()
+            print(f"Batch finished: {runner.queue.counts()}")
+    finally:
+        runner.close()
+
+async def main(story_id: str = None, preview: bool = False):
     print("Starting Reddit Story Automation Pipeline...")
     
-    # Step 1: Data Acquisition
-    print("Step 1: Fetching stories from Reddit...")
     from modules.reddit_scraper import RedditScraper
+    from modules.story_catalog import StoryCatalog, STATUS_RENDERED, STATUS_FAILED
     scraper = RedditScraper()
-    stories = scraper.fetch_stories(limit=1)
-    
-    if not stories:
-        print("No stories found matching criteria.")
-        return
-
-    selected_story = stories[0]
-    print(f"Selected Story: {selected_story['title']} (r/{selected_story['subreddit']})")
-
-    # Capture Screenshot
-    print("Capturing screenshot...")
-    from modules.screenshot_manager import ScreenshotManager
-    # Note: Screenshotting can be slow, might want to run in parallel or cache
-    ss_manager = ScreenshotManager()
-    screenshot_path = ss_manager.capture_post_title(selected_story['url'], selected_story['id'])
-    ss_manager.close()
-    
-    if screenshot_path:
-        print(f"Screenshot saved to: {screenshot_path}")
+    catalog = StoryCatalog()
+    if story_id:
+        # Re-render a catalogued story: unchanged stages are reused from their manifests
+        selected_story = catalog.get_story(story_id)
+        if not selected_story:
+            print(f"Story {story_id} is not in the catalog.")
+            return
     else:
-        print("Failed to capture screenshot.")
+        # Step 1: Data Acquisition
+        print("Step 1: Fetching stories from Reddit...")
+        # Only posts newer than the last run are fetched; selection is a local query
+        with get_tracer().span("stage:fetch", "stage"):
+            if Config.REDDIT_FETCH_MODE == "async":
+                added = await scraper.update_catalog_async(catalog)
+            else:
+                added = scraper.update_catalog(catalog)
+        print(f"{added} new stories added to catalog.")
+        
+        selected_story = catalog.claim_next()
+        if not selected_story:
+            print("No stories found matching criteria.")
+            return
 
+    print(f"Selected Story: {selected_story['title']} (r/{selected_story['subreddit']})")
 
-    
-    # Step 2: TTS
-    print("Step 2: Converting text to speech...")
-    from modules.tts_engine import TTSEngine
+    # Steps 2-4 as a stage graph: title card, title TTS, content TTS and the
+    # background fetch run concurrently, then the video is assembled
     import os
+    from modules.tts_engine import TTSEngine
+    from modules.visual_manager import VisualManager
+    from modules.keyword_engine import story_document
+    from modules.story_graph import build_story_graph, story_input
+    from modules.pipeline import StageError
     
     tts = TTSEngine()
-    
-    # Process Title
-    title_audio_path = os.path.join("assets", "temp", "title.mp3")
-    title_timings_path = os.path.join("assets", "temp", "title_timings.json")
-    print("Generating Title Audio...")
-    title_timings = await tts.generate_audio(selected_story['title'], title_audio_path)
-    tts.save_subtitles_to_json(title_timings, title_timings_path)
-    
-    # Process Content (First paragraph only for testing if long)
-    content_text = selected_story['content']
-    if len(content_text) > 500:
-        content_text = content_text[:500] + "..." # Truncate for testing
-    
-    content_audio_path = os.path.join("assets", "temp", "content.mp3")
-    content_timings_path = os.path.join("assets", "temp", "content_timings.json")
-    print("Generating Content Audio...")
-    content_timings = await tts.generate_audio(content_text, content_audio_path)
-    tts.save_subtitles_to_json(content_timings, content_timings_path)
-    
-    print(f"Audio generated at {title_audio_path} and {content_audio_path}")
-    
-    # Step 3: Backgrounds
-    print("Step 3: Fetching background visuals...")
-    from modules.visual_manager import VisualManager
     vm = VisualManager()
+    # Corpus statistics for keyword ranking; stories already counted are skipped
+    for batch in catalog.iter_stories():
+        vm.keywords.add_documents(map(story_document, batch), save=False)
+    vm.keywords.save()
     
-    # Use content text to find relevant bg
-    background_video_path = vm.get_background_video(selected_story['content'])
-    
-    if background_video_path:
-        print(f"Background video ready: {background_video_path}")
-    else:
-        print("No background video found (check assets/backgrounds/ or Pexels key).")
-        # Creating a dummy file so pipeline doesn't crash in next steps if we want to proceed?
-        # Or just return
-        if not os.path.exists(os.path.join("assets", "backgrounds")):
-             print("Please add a video to 'assets/backgrounds/' for fallback.")
-
-    
-    # Step 4: Assembly
-    print("Step 4: Assembling video...")
-    from modules.video_editor import VideoAssembler
-    
-    if background_video_path and os.path.exists(background_video_path):
-        assembler = VideoAssembler()
-        
-        output_file = os.path.join("assets", "final_video.mp4")
-        
-        files_map = {
-            'title_audio': title_audio_path,
-            'title_timings': title_timings,
-            'title_screenshot': screenshot_path if screenshot_path else None,
-            'content_audio': content_audio_path,
-            'content_timings': content_timings
-        }
-        
-        assembler.assemble_video(background_video_path, files_map, output_file)
-        print(f"Pipeline finished! Check {output_file}")
-    else:
-        print("Skipping assembly (missing background).")
+    output_file = os.path.join("assets", "preview.mp4" if preview else "final_video.mp4")
+    # Own work directory per story, so concurrent runs don't overwrite each other
+    graph = build_story_graph(os.path.join(Config.JOBS_DIR, f"story_{selected_story['id']}"), output_file,
+                              scraper=scraper, catalog=catalog, tts=tts, visuals=vm, preview=preview)
+    print("Steps 2-4: Speech, card, background and assembly...")
+    try:
+        await graph.run({"story": story_input(selected_story)})
+    except StageError as e:
+        catalog.mark_status(selected_story['id'], STATUS_FAILED)
+        print(f"Pipeline failed: {e}")
+        return
+    finally:
+        print(graph.report())
     
-    print("Pipeline completed!")
+    if tts.cache:
+        stats = tts.cache.stats()
+        print(f"TTS cache: {stats['hits']} hits, {stats['misses']} misses")
+    if preview:
+        # A draft doesn't count as rendered
+        print(f"Preview finished! Check {output_file}")
+        return
+    catalog.mark_status(selected_story['id'], STATUS_RENDERED)
+    print(f"Pipeline finished! Check {output_file}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Reddit story video pipeline")
+    parser.add_argument("--batch", type=int, metavar="N", help="queue and produce N stories, then exit")
+    parser.add_argument("--daemon", action="store_true", help="keep fetching and producing videos")
+    parser.add_argument("--story", metavar="ID", help="re-render a story from the catalog, reusing unchanged stages")
+    parser.add_argument("--preview", action="store_true", help="render a fast low-resolution draft and a contact sheet")
+    args = parser.parse_args()
+    try:
+        if args.batch or args.daemon:
+            asyncio.run(run_batch(args.batch or 0, args.daemon))
+        else:
+            asyncio.run(main(args.story, args.preview))
+    except KeyboardInterrupt:
+        print("Stopped.")
+    finally:
+        export_trace()
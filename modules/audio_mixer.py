@@ -0,0 +1,189 @@
+import math
+import os
+from typing import List, Dict, Any, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from config import Config
+from modules.media_utils import run_ffmpeg
+from modules.tracing import get_tracer, traced
+from modules.word_timeline import WordTimeline, as_timeline
+
+# Duck envelope resolution (Hz); upsampled to the audio rate when applied
+ENVELOPE_RATE = 200
+# Blocks quieter than this don't count towards a track's loudness
+GATE_DBFS = -50.0
+PEAK_CEILING = 0.98
+
+
+def db_to_gain(db: float) -> float:
+    return 10.0 ** (db / 20.0)
+
+
+class AudioMixer:
+    """
+    Builds a video's soundtrack in NumPy. Every track is decoded once to
+    float32 PCM; concatenation, gaps, loudness normalization and ducking the
+    background music under speech are then whole-array operations, and the
+    result is encoded once to AAC so the renderers only have to mux it.
+    """
+    def __init__(self, sample_rate: int = Config.AUDIO_SAMPLE_RATE, channels: int = 2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    def decode(self, path: str) -> np.ndarray:
+        """
+        Decodes any audio (or video) file to float32 samples, shape (n, channels).
+        """
+        result = run_ffmpeg([
+            "-i", path, "-vn",
+            "-f", "f32le", "-acodec", "pcm_f32le",
+            "-ac", str(self.channels), "-ar", str(self.sample_rate),
+            "pipe:1",
+        ])
+        get_tracer().count(bytes=len(result.stdout))
+        return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, self.channels)
+
+    def encode(self, samples: np.ndarray, output_path: str, bitrate: str = "192k"):
+        """
+        Encodes float32 samples to an AAC (.m4a) file in one ffmpeg call.
+        """
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        run_ffmpeg([
+            "-f", "f32le", "-ar", str(self.sample_rate), "-ac", str(self.channels), "-i", "pipe:0",
+            "-c:a", "aac", "-b:a", bitrate,
+            output_path,
+        ], input=np.ascontiguousarray(samples, dtype=np.float32).tobytes())
+
+    def silence(self, seconds: float) -> np.ndarray:
+        return np.zeros((max(0, round(seconds * self.sample_rate)), self.channels), dtype=np.float32)
+
+    def loudness_dbfs(self, samples: np.ndarray, block_seconds: float = 0.05) -> Optional[float]:
+        """
+        RMS level in dBFS over the blocks above GATE_DBFS, so pauses don't
+        drag the level down. None for silent or empty audio.
+        """
+        block = max(1, int(block_seconds * self.sample_rate))
+        usable = len(samples) // block * block
+        if usable == 0:
+            return None
+        power = np.mean(np.square(samples[:usable].reshape(-1, block * self.channels), dtype=np.float64), axis=1)
+        active = power[power > 10.0 ** (GATE_DBFS / 10.0)]
+        if not len(active):
+            return None
+        return 10.0 * math.log10(float(np.mean(active)))
+
+    def normalize(self, samples: np.ndarray, target_dbfs: float = Config.AUDIO_TARGET_DBFS) -> np.ndarray:
+        """
+        Scales a track to the target RMS level (returns a new array).
+        """
+        level = self.loudness_dbfs(samples)
+        if level is None:
+            return samples.copy()
+        return samples * np.float32(db_to_gain(target_dbfs - level))
+
+    def duck_envelope(self,
+                      intervals: Union[np.ndarray, Iterable[Tuple[float, float]]],
+                      n_samples: int,
+                      duck_db: float = Config.MUSIC_DUCK_DB,
+                      attack: float = Config.MUSIC_DUCK_ATTACK,
+                      release: float = Config.MUSIC_DUCK_RELEASE) -> np.ndarray:
+        """
+        Per-sample music gain: duck_db while speech is playing, ramping down
+        over `attack` seconds before each word (timings are known up front, so
+        the music gets out of the way early) and back up over `release`
+        seconds after speech stops. Built without a per-sample loop: distances
+        to the nearest speech on either side come from running max/min over
+        frame indices, and the ramps follow from those distances.
+        """
+        frames = max(1, math.ceil(n_samples / self.sample_rate * ENVELOPE_RATE))
+        if not isinstance(intervals, np.ndarray):
+            intervals = np.asarray(list(intervals), dtype=np.float64)
+        intervals = intervals.reshape(-1, 2)
+
+        # Speech mask at envelope resolution, from +1/-1 edges and a running sum
+        edges = np.zeros(frames + 1, dtype=np.int32)
+        starts = np.clip(np.floor(intervals[:, 0] * ENVELOPE_RATE).astype(np.int64), 0, frames)
+        ends = np.clip(np.ceil(intervals[:, 1] * ENVELOPE_RATE).astype(np.int64), 0, frames)
+        keep = ends > starts
+        np.add.at(edges, starts[keep], 1)
+        np.add.at(edges, ends[keep], -1)
+        speech = np.cumsum(edges[:frames]) > 0
+
+        index = np.arange(frames)
+        far = 2 * frames
+        last_speech = np.maximum.accumulate(np.where(speech, index, -far))
+        next_speech = np.minimum.accumulate(np.where(speech, index, far)[::-1])[::-1]
+        since = (index - last_speech) / ENVELOPE_RATE
+        until = (next_speech - index) / ENVELOPE_RATE
+
+        # 0 = fully ducked, 1 = full music level
+        opening = np.minimum(np.clip(since / max(release, 1e-3), 0.0, 1.0),
+                             np.clip(until / max(attack, 1e-3), 0.0, 1.0))
+        gain = np.power(10.0, duck_db * (1.0 - opening) / 20.0)
+
+        frame_times = (index + 0.5) / ENVELOPE_RATE
+        sample_times = np.arange(n_samples, dtype=np.float64) / self.sample_rate
+        return np.interp(sample_times, frame_times, gain).astype(np.float32)
+
+    def music_bed(self, music_path: str, n_samples: int, level_db: float = Config.MUSIC_VOLUME_DB,
+                  fade: float = 1.0) -> np.ndarray:
+        """
+        The music track normalized to level_db below the voice, looped or cut
+        to n_samples, with a fade in and out.
+        """
+        music = self.decode(music_path)
+        if not len(music):
+            return np.zeros((n_samples, self.channels), dtype=np.float32)
+        music = self.normalize(music, Config.AUDIO_TARGET_DBFS + level_db)
+        # np.resize repeats the data cyclically, i.e. loops the track
+        bed = np.resize(music, (n_samples, self.channels))
+        fade_samples = min(n_samples // 2, int(fade * self.sample_rate))
+        if fade_samples:
+            ramp = np.linspace(0.0, 1.0, fade_samples, dtype=np.float32)[:, None]
+            bed[:fade_samples] *= ramp
+            bed[n_samples - fade_samples:] *= ramp[::-1]
+        return bed
+
+    @traced()
+    def mix(self,
+            title_audio: str,
+            content_audio: str,
+            output_path: str,
+            title_timings: Optional[Union[WordTimeline, List[Dict[str, Any]]]] = None,
+            content_timings: Optional[Union[WordTimeline, List[Dict[str, Any]]]] = None,
+            music_path: Optional[str] = Config.BACKGROUND_MUSIC,
+            gap: float = Config.AUDIO_TITLE_GAP) -> Dict[str, Any]:
+        """
+        Title, a gap of silence, then the content, each normalized to the
+        same loudness, over optional ducked background music.
+        Writes one AAC track and returns {'mixed_audio': path,
+        'title_duration': seconds before the content starts (title + gap),
+        'total_duration': seconds}.
+        """
+        title = self.normalize(self.decode(title_audio))
+        content = self.normalize(self.decode(content_audio))
+        voice = np.concatenate([title, self.silence(gap), content])
+        title_duration = len(title) / self.sample_rate + gap
+        n_samples = len(voice)
+
+        if music_path and os.path.exists(music_path):
+            speech = WordTimeline.concat([as_timeline(title_timings),
+                                          as_timeline(content_timings).shift(title_duration)])
+            intervals = speech.intervals()
+            bed = self.music_bed(music_path, n_samples)
+            bed *= self.duck_envelope(intervals, n_samples)[:, None]
+            voice += bed
+        elif music_path:
+            print(f"Background music not found: {music_path}")
+
+        peak = float(np.max(np.abs(voice))) if n_samples else 0.0
+        if peak > PEAK_CEILING:
+            voice *= np.float32(PEAK_CEILING / peak)
+
+        self.encode(voice, output_path)
+        return {
+            'mixed_audio': output_path,
+            'title_duration': title_duration,
+            'total_duration': n_samples / self.sample_rate,
+        }
@@ -0,0 +1,260 @@
+import atexit
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import weakref
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from config import Config
+from modules.background_proxy import VIDEO_EXTENSIONS
+from modules.downloader import file_lock
+from modules.media_utils import probe_media
+
+# Indexes with usage updates to write at exit (weak, so they can still be collected)
+_open_indexes: "weakref.WeakSet[BackgroundIndex]" = weakref.WeakSet()
+
+
+def _flush_all():
+    for index in list(_open_indexes):
+        try:
+            index.flush()
+        except OSError as e:
+            print(f"Could not save background index {index.index_path}: {e}")
+
+
+atexit.register(_flush_all)
+
+
+def tokenize_tags(text: str) -> List[str]:
+    """
+    Lowercase alphabetic tokens, e.g. "Minecraft_Parkour-02.mp4" -> ["minecraft", "parkour", "mp4"].
+    """
+    return [t for t in re.findall(r'[a-z]+', text.lower()) if len(t) > 1]
+
+
+def tag_vector(tags: List[str]) -> Dict[str, float]:
+    """
+    Unit-length term vector for a tag list (repeated tags weigh more).
+    """
+    counts: Dict[str, float] = defaultdict(float)
+    for tag in tags:
+        counts[tag] += 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {term: value / norm for term, value in counts.items()}
+
+
+class BackgroundIndex:
+    """
+    Persistent index of local background clips.
+    Each clip is stored with tags, duration, resolution and a precomputed
+    keyword vector; an in-memory inverted index maps terms to clips, so
+    picking a background is a local lookup ranked by keyword overlap,
+    with a penalty on clips that were used often.
+    Usage counts are written at most every BACKGROUND_INDEX_SAVE_INTERVAL
+    seconds (and on exit), not on every selection. Several processes can
+    share the index file: saving merges with what is on disk under a lock
+    file, adding this process's uses as deltas.
+    """
+    def __init__(self, index_path: str = Config.BACKGROUND_INDEX_PATH):
+        # Absolute, so saving still works after the working directory changes
+        self.index_path = os.path.abspath(index_path)
+        self._lock = threading.Lock()
+        self.clips: Dict[str, Dict[str, Any]] = {}
+        self.inverted: Dict[str, Set[str]] = defaultdict(set)
+        self._dirty = False
+        self._saved_at = 0.0
+        # Uses since the last save, and clips removed since then
+        self._pending_uses: Dict[str, int] = defaultdict(int)
+        self._removed: Set[str] = set()
+
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        self.clips = self._read()
+        for clip_id, clip in self.clips.items():
+            for term in clip["vector"]:
+                self.inverted[term].add(clip_id)
+        _open_indexes.add(self)
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, stored: Dict[str, Dict[str, Any]]):
+        """
+        Folds the on-disk index (possibly written by other processes) into
+        memory: their new clips are added, use counts become the stored
+        count plus our uses since the last save. Caller holds self._lock.
+        """
+        for clip_id, theirs in stored.items():
+            if clip_id in self._removed:
+                continue
+            ours = self.clips.get(clip_id)
+            if ours is None:
+                self.clips[clip_id] = theirs
+                for term in theirs["vector"]:
+                    self.inverted[term].add(clip_id)
+                continue
+            ours["uses"] = theirs["uses"] + self._pending_uses.get(clip_id, 0)
+            ours["last_used"] = max(ours["last_used"], theirs["last_used"])
+
+    def save(self):
+        with self._lock, file_lock(f"{self.index_path}.lock"):
+            self._merge(self._read())
+            data = json.dumps(self.clips)
+            tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+            self._pending_uses.clear()
+            self._removed.clear()
+            self._dirty = False
+            self._saved_at = time.time()
+
+    def flush(self):
+        """
+        Writes pending usage updates.
+        """
+        if self._dirty:
+            self.save()
+
+    @staticmethod
+    def clip_id_for(path: str) -> str:
+        return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+    def add_clip(self, path: str, tags: List[str], source: str = "local", save: bool = True) -> Optional[str]:
+        """
+        Indexes a clip (or updates its tags). Returns the clip id, or None if it can't be probed.
+        """
+        clip_id = self.clip_id_for(path)
+        try:
+            info = probe_media(path)
+        except RuntimeError as e:
+            print(f"Skipping background {path}: {e}")
+            return None
+
+        vector = tag_vector(tags)
+        with self._lock:
+            previous = self.clips.get(clip_id)
+            if previous:
+                for term in previous["vector"]:
+                    self.inverted[term].discard(clip_id)
+            self.clips[clip_id] = {
+                "path": path,
+                "tags": sorted(set(tags)),
+                "duration": info["duration"],
+                "width": info["width"],
+                "height": info["height"],
+                "vector": vector,
+                "source": source,
+                "uses": previous["uses"] if previous else 0,
+                "last_used": previous["last_used"] if previous else 0.0,
+            }
+            for term in vector:
+                self.inverted[term].add(clip_id)
+            self._removed.discard(clip_id)
+        if save:
+            self.save()
+        return clip_id
+
+    def remove_clip(self, clip_id: str):
+        with self._lock:
+            clip = self.clips.pop(clip_id, None)
+            if clip:
+                self._removed.add(clip_id)
+                self._pending_uses.pop(clip_id, None)
+                self._dirty = True
+                for term in clip["vector"]:
+                    self.inverted[term].discard(clip_id)
+
+    def scan_directory(self, directory: str) -> int:
+        """
+        Indexes videos in a directory that aren't indexed yet, tagged from their file names
+        (plus a "<name>.tags" sidecar with extra comma-separated tags, if present).
+        Returns the number of clips added.
+        """
+        known_paths = {os.path.abspath(clip["path"]) for clip in self.clips.values()}
+        added = 0
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not name.lower().endswith(VIDEO_EXTENSIONS) or os.path.abspath(path) in known_paths:
+                continue
+            tags = tokenize_tags(os.path.splitext(name)[0])
+            sidecar = os.path.splitext(path)[0] + ".tags"
+            if os.path.exists(sidecar):
+                with open(sidecar, "r", encoding="utf-8") as f:
+                    tags += tokenize_tags(f.read())
+            if self.add_clip(path, tags, save=False):
+                added += 1
+        if added:
+            self.save()
+        return added
+
+    def rank(self, keywords: List[str], min_duration: float = 0.0) -> List[Tuple[float, str]]:
+        """
+        Scores clips against keywords: cosine similarity of tag vectors,
+        divided by a usage penalty so the library rotates.
+        Only clips sharing at least one term are considered.
+        """
+        query = tag_vector([k.lower() for k in keywords])
+        ranked = []
+        # The growth thread adds clips concurrently
+        with self._lock:
+            candidates: Set[str] = set()
+            for term in query:
+                candidates |= self.inverted.get(term, set())
+
+            for clip_id in candidates:
+                clip = self.clips[clip_id]
+                if clip["duration"] < min_duration:
+                    continue
+                similarity = sum(weight * clip["vector"].get(term, 0.0) for term, weight in query.items())
+                penalty = 1.0 + Config.BACKGROUND_ROTATION_PENALTY * clip["uses"]
+                ranked.append((similarity / penalty, clip_id))
+        ranked.sort(reverse=True)
+        return ranked
+
+    def select(self, keywords: List[str], min_duration: float = 0.0) -> Tuple[str, float]:
+        """
+        Picks the best matching clip and records its use.
+        Falls back to the least used clip that is long enough when nothing matches.
+        Returns (path, match score); path is "" if no clip qualifies.
+        """
+        for score, clip_id in self.rank(keywords, min_duration):
+            with self._lock:
+                clip = self.clips.get(clip_id)
+            if clip is None:
+                continue
+            if os.path.exists(clip["path"]):
+                return self._use(clip_id), score
+            self.remove_clip(clip_id)
+
+        # No overlap at all: rotate through the least used clips
+        with self._lock:
+            clips = [(clip_id, dict(clip)) for clip_id, clip in self.clips.items()]
+        fallback = sorted(
+            (clip["uses"], clip["last_used"], clip_id)
+            for clip_id, clip in clips
+            if clip["duration"] >= min_duration and os.path.exists(clip["path"])
+        )
+        if fallback:
+            return self._use(fallback[0][2]), 0.0
+        return "", 0.0
+
+    def _use(self, clip_id: str) -> str:
+        with self._lock:
+            clip = self.clips[clip_id]
+            clip["uses"] += 1
+            clip["last_used"] = time.time()
+            self._pending_uses[clip_id] += 1
+            self._dirty = True
+            due = time.time() - self._saved_at >= Config.BACKGROUND_INDEX_SAVE_INTERVAL
+        if due:
+            self.save()
+        return clip["path"]
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from typing import List, Dict, Optional
+
+from config import Config
+from modules.media_utils import run_ffmpeg
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm")
+
+
+class BackgroundProxyCache:
+    """
+    Transcodes background clips once into render-ready proxies
+    (output resolution, fixed fps, short GOP, no audio) stored under
+    a content-hash key, so renders never resize or crop per frame.
+    """
+    def __init__(self,
+                 proxy_dir: str = Config.PROXY_DIR,
+                 width: int = Config.VIDEO_WIDTH,
+                 height: int = Config.VIDEO_HEIGHT,
+                 fps: int = 24):
+        self.proxy_dir = proxy_dir
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.index_path = os.path.join(self.proxy_dir, "index.json")
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, str]] = None
+
+        os.makedirs(self.proxy_dir, exist_ok=True)
+
+    def _load_index(self) -> Dict[str, str]:
+        if self._index is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def content_hash(self, path: str) -> str:
+        """
+        Returns the sha256 of a file's content.
+        Memoized on (path, size, mtime) so unchanged files are only hashed once.
+        """
+        stat = os.stat(path)
+        stamp = f"{os.path.abspath(path)}|{stat.st_size}|{int(stat.st_mtime)}"
+        with self._lock:
+            cached = self._load_index().get(stamp)
+        if cached:
+            return cached
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+
+        with self._lock:
+            self._load_index()[stamp] = content_hash
+            self._save_index()
+        return content_hash
+
+    def proxy_path_for(self, content_hash: str) -> str:
+        return os.path.join(self.proxy_dir, f"{content_hash[:32]}_{self.width}x{self.height}_{self.fps}.mp4")
+
+    def is_proxy(self, path: str) -> bool:
+        return os.path.abspath(os.path.dirname(path)) == os.path.abspath(self.proxy_dir)
+
+    def get_proxy(self, source_path: str) -> str:
+        """
+        Returns the proxy for a source clip, transcoding it on first use.
+        """
+        if self.is_proxy(source_path):
+            return source_path
+
+        proxy_path = self.proxy_path_for(self.content_hash(source_path))
+        if os.path.exists(proxy_path):
+            return proxy_path
+
+        print(f"Creating background proxy for {source_path}...")
+        W, H = self.width, self.height
+        tmp_path = f"{proxy_path}.{os.getpid()}.tmp.mp4"
+        try:
+            run_ffmpeg([
+                "-i", source_path,
+                "-vf", f"scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},fps={self.fps},setsar=1",
+                "-an",
+                "-c:v", "libx264",
+                "-preset", Config.FFMPEG_PRESET,
+                "-crf", "18",
+                "-g", str(self.fps),
+                "-keyint_min", str(self.fps),
+                "-sc_threshold", "0",
+                "-pix_fmt", "yuv420p",
+                "-movflags", "+faststart",
+                tmp_path,
+            ])
+            os.replace(tmp_path, proxy_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return proxy_path
+
+    def ingest_directory(self, directory: str) -> List[str]:
+        """
+        Creates proxies for every video in a directory.
+        Returns the proxy paths; clips that fail to transcode are skipped.
+        """
+        proxies = []
+        for name in sorted(os.listdir(directory)):
+            if not name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            try:
+                proxies.append(self.get_proxy(os.path.join(directory, name)))
+            except RuntimeError as e:
+                print(f"Skipping {name}: {e}")
+        return proxies
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+from config import Config
+from modules.job_queue import JobQueue, JOB_QUEUED
+from modules.keyword_engine import story_document
+from modules.pipeline import StageError
+from modules.story_catalog import STATUS_RENDERED, STATUS_FAILED
+from modules.story_graph import build_story_graph, story_input
+from modules.tracing import get_tracer
+
+
+class BatchRunner:
+    """
+    Produces videos for queued stories, several at a time.
+    Blocking I/O stages share one thread pool and renders run in a separate,
+    separately sized process pool, so downloads and TTS for the next stories
+    overlap with encoding. Each job works in its own directory
+    (JOBS_DIR/<job id>) and finished stages are checkpointed in the queue,
+    so a crashed or failed job picks up where it stopped.
+    """
+    def __init__(self,
+                 scraper,
+                 catalog,
+                 queue: Optional[JobQueue] = None,
+                 tts=None,
+                 visuals=None,
+                 concurrency: int = Config.BATCH_CONCURRENCY,
+                 io_workers: int = Config.IO_WORKERS,
+                 render_processes: int = Config.RENDER_PROCESSES):
+        if tts is None:
+            from modules.tts_engine import TTSEngine
+            tts = TTSEngine()
+        if visuals is None:
+            from modules.visual_manager import VisualManager
+            visuals = VisualManager()
+        self.scraper = scraper
+        self.catalog = catalog
+        self.queue = queue or JobQueue()
+        self.tts = tts
+        self.visuals = visuals
+        self.concurrency = max(1, concurrency)
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+        self.render_pool = ProcessPoolExecutor(max_workers=render_processes) if render_processes > 0 else None
+        self._last_start = 0.0
+
+        os.makedirs(Config.JOBS_DIR, exist_ok=True)
+        os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
+
+    def close(self):
+        self.io_pool.shutdown(wait=True)
+        if self.render_pool:
+            self.render_pool.shutdown(wait=True)
+
+    async def refresh_catalog(self) -> int:
+        """
+        Fetches new posts into the story catalog.
+        """
+        with get_tracer().span("stage:fetch", "stage"):
+            if Config.REDDIT_FETCH_MODE == "async":
+                added = await self.scraper.update_catalog_async(self.catalog)
+            else:
+                loop = asyncio.get_running_loop()
+                added = await loop.run_in_executor(self.io_pool, self.scraper.update_catalog, self.catalog)
+        # Corpus statistics for keyword ranking; stories already counted are skipped
+        for batch in self.catalog.iter_stories():
+            self.visuals.keywords.add_documents(map(story_document, batch), save=False)
+        self.visuals.keywords.save()
+        return added
+
+    def enqueue_stories(self, count: int) -> int:
+        """
+        Moves the best unprocessed catalog stories into the job queue.
+        """
+        queued = 0
+        while queued < count:
+            story = self.catalog.claim_next()
+            if not story:
+                break
+            if self.queue.enqueue(story) is not None:
+                queued += 1
+        return queued
+
+    @staticmethod
+    def _still_valid(work_dir: str, outputs: Dict[str, Any]) -> bool:
+        """
+        A checkpointed stage is only reused if the files it wrote are still there.
+        """
+        for value in outputs.values():
+            if isinstance(value, str) and value.startswith(work_dir) and not os.path.exists(value):
+                return False
+        return True
+
+    async def _pace(self):
+        """
+        Spaces job starts out to honor TARGET_VIDEOS_PER_HOUR.
+        """
+        if Config.TARGET_VIDEOS_PER_HOUR <= 0:
+            return
+        interval = 3600.0 / Config.TARGET_VIDEOS_PER_HOUR
+        # Reserve the slot before sleeping, so concurrent workers queue up
+        # behind each other instead of all waking at the same moment
+        now = time.monotonic()
+        start = max(now, self._last_start + interval)
+        self._last_start = start
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def run_job(self, job: Dict[str, Any]) -> bool:
+        """
+        Runs one claimed job to completion (or failure). Returns True on success.
+        """
+        story = job["story"]
+        work_dir = os.path.join(Config.JOBS_DIR, str(job["id"]))
+        output_path = os.path.join(Config.OUTPUT_DIR, f"{story['subreddit']}_{story['id']}.mp4")
+
+        print(f"[job {job['id']}] attempt {job['attempts']}: {story['title']} (r/{story['subreddit']})")
+        graph = None
+        heartbeat = asyncio.ensure_future(self._heartbeat(job["id"]))
+        try:
+            completed = {name: outputs for name, outputs in job["stages"].items()
+                         if self._still_valid(work_dir, outputs)}
+            graph = build_story_graph(work_dir, output_path, scraper=self.scraper, catalog=self.catalog,
+                                      tts=self.tts, visuals=self.visuals)
+            await graph.run(
+                {"story": story_input(story)},
+                executor=self.io_pool,
+                process_executor=self.render_pool,
+                completed=completed,
+                on_stage_done=lambda name, outputs: self.queue.save_stage(job["id"], name, outputs)
+            )
+            self.queue.complete(job["id"], output_path)
+            self.catalog.mark_status(story["id"], STATUS_RENDERED)
+        except Exception as e:
+            # Anything else (a bad story, a database error) still fails the job
+            # instead of leaving it claimed until the lease runs out
+            error = str(e) if isinstance(e, StageError) else f"{type(e).__name__}: {e}"
+            retry = self.queue.fail(job["id"], error)
+            if not retry:
+                self.catalog.mark_status(story["id"], STATUS_FAILED)
+            print(f"[job {job['id']}] {error}" + (" (will retry)" if retry else " (giving up)"))
+            return False
+        finally:
+            heartbeat.cancel()
+            if graph is not None:
+                print(f"[job {job['id']}] stages:\n{graph.report()}")
+
+        print(f"[job {job['id']}] done: {output_path}")
+        return True
+
+    async def _heartbeat(self, job_id: int, interval: float = Config.JOB_HEARTBEAT_INTERVAL):
+        """
+        Keeps the lease on a running job alive so other processes don't take it over.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            if not self.queue.heartbeat(job_id):
+                print(f"[job {job_id}] lease lost to another process")
+                return
+
+    async def _worker(self, stop_when_idle: bool, stop: asyncio.Event):
+        while not stop.is_set():
+            job = self.queue.claim()
+            if job is None and not stop_when_idle and self.enqueue_stories(1):
+                continue
+            if job is None:
+                due = self.queue.next_due()
+                if due is None and stop_when_idle:
+                    return
+                # Wait for a retry to become due (or for new jobs)
+                wait = min(5.0, max(0.1, due - time.time())) if due is not None else 5.0
+                await asyncio.sleep(wait)
+                continue
+            await self._pace()
+            await self.run_job(job)
+
+    async def drain(self):
+        """
+        Processes queued jobs (including retries) until none are left.
+        """
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Resuming {recovered} interrupted job(s).")
+        stop = asyncio.Event()
+        await asyncio.gather(*[self._worker(True, stop) for _ in range(self.concurrency)])
+
+    async def run_daemon(self, poll_interval: float = Config.DAEMON_POLL_INTERVAL):
+        """
+        Runs until cancelled: refreshes the catalog periodically, keeps the
+        queue topped up and processes jobs as they become due.
+        """
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Resuming {recovered} interrupted job(s).")
+        stop = asyncio.Event()
+        workers = [asyncio.ensure_future(self._worker(False, stop)) for _ in range(self.concurrency)]
+        try:
+            while True:
+                try:
+                    added = await self.refresh_catalog()
+                    print(f"{added} new stories added to catalog.")
+                except Exception as e:
+                    print(f"Catalog refresh failed: {e}")
+                # Keep enough work queued for every worker
+                queued = self.queue.counts().get(JOB_QUEUED, 0)
+                self.enqueue_stories(max(0, 2 * self.concurrency - queued))
+                print(f"Jobs: {self.queue.counts()}")
+                # One trace file per poll interval keeps memory bounded
+                tracer = get_tracer()
+                if tracer.export():
+                    tracer.clear()
+                await asyncio.sleep(poll_interval)
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,148 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from config import Config
+
+
+@lru_cache(maxsize=1)
+def get_chromedriver_path() -> str:
+    """
+    Resolves chromedriver once per process instead of once per browser.
+    """
+    return ChromeDriverManager().install()
+
+
+class BrowserPool:
+    """
+    A pool of long-lived headless Chrome sessions.
+    Browsers are started lazily (up to `size`), handed out one caller at
+    a time and returned warm, so captures skip Chrome's cold start.
+    Callers waiting for a browser are woken both when one is returned and
+    when a crashed one is discarded (freeing a slot for a new browser).
+    """
+    def __init__(self, size: int = Config.BROWSER_POOL_SIZE):
+        self.size = size
+        self._idle: List[webdriver.Chrome] = []
+        self._all = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._closed = False
+
+    def _create_driver(self) -> webdriver.Chrome:
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        # get() returns immediately; callers wait for the element they need
+        options.page_load_strategy = "none"
+        return webdriver.Chrome(service=Service(get_chromedriver_path()), options=options)
+
+    def _acquire(self, timeout: Optional[float]) -> webdriver.Chrome:
+        """
+        An idle browser, or a new one if the pool has a free slot;
+        otherwise waits for either. Raises TimeoutError after `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._all) < self.size:
+                    # Reserve the slot before the (slow) browser start
+                    self._all.append(None)
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No browser became available")
+                self._available.wait(remaining)
+
+        try:
+            driver = self._create_driver()
+        except Exception:
+            with self._available:
+                self._all.remove(None)
+                self._available.notify()
+            raise
+        with self._lock:
+            self._all[self._all.index(None)] = driver
+        return driver
+
+    def _release(self, driver: webdriver.Chrome):
+        with self._available:
+            if not self._closed:
+                self._idle.append(driver)
+                self._available.notify()
+                return
+        self._discard(driver)
+
+    def _discard(self, driver: webdriver.Chrome):
+        with self._available:
+            if driver in self._all:
+                self._all.remove(driver)
+            # The freed slot lets a waiting caller start a replacement
+            self._available.notify()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None):
+        """
+        Borrows a browser for the duration of the with-block.
+        Browsers that crash are replaced instead of being returned to the pool.
+        Any other error in the block still returns the browser.
+        """
+        driver = self._acquire(timeout)
+        discarded = False
+        try:
+            yield driver
+        except WebDriverException:
+            discarded = True
+            self._discard(driver)
+            raise
+        finally:
+            if not discarded:
+                self._release(driver)
+
+    def close(self):
+        with self._available:
+            self._closed = True
+            drivers = [d for d in self._all if d is not None]
+            self._all = []
+            self._idle = []
+            self._available.notify_all()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+_shared_pool: Optional[BrowserPool] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pool() -> BrowserPool:
+    """
+    Returns the process-wide pool, so browsers stay warm across stories.
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None or _shared_pool._closed:
+            _shared_pool = BrowserPool()
+            atexit.register(_shared_pool.close)
+        return _shared_pool
@@ -0,0 +1,78 @@
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+from moviepy.editor import VideoClip
+
+from modules.caption_renderer import CaptionRenderer
+from modules.word_timeline import WordTimeline, as_timeline
+
+# Shown when no caption is active: a single fully transparent pixel
+_EMPTY_RGB = np.zeros((1, 1, 3), dtype=np.uint8)
+_EMPTY_ALPHA = np.zeros((1, 1), dtype=np.float32)
+
+
+def group_into_phrases(timings: List[Dict[str, Any]], max_chars: int, max_gap: float = 0.35) -> List[Dict[str, Any]]:
+    """
+    Merges consecutive words into short phrases.
+    A new phrase starts when adding a word would exceed max_chars
+    or when the pause before it is longer than max_gap seconds.
+    List version of WordTimeline.group_phrases.
+    """
+    return WordTimeline.from_dicts(timings).group_phrases(max_chars, max_gap).to_dicts()
+
+
+class CaptionLayer(VideoClip):
+    """
+    One clip holding every caption of a video.
+    Word timings are kept in a sorted WordTimeline and the active
+    caption for time t is found by binary search, so compositing cost per
+    frame is O(log n) instead of one layer per word. Bitmaps are looked up
+    once per distinct word (or phrase) of the timeline's word table.
+    """
+    def __init__(self,
+                 timings: Union[WordTimeline, List[Dict[str, Any]]],
+                 renderer: CaptionRenderer,
+                 duration: float,
+                 fontsize: int = 70,
+                 color: str = 'white',
+                 stroke_color: str = 'black',
+                 stroke_width: int = 2,
+                 max_width: Optional[int] = None,
+                 phrase_max_chars: int = 0):
+        timeline = as_timeline(timings).sorted()
+        if phrase_max_chars:
+            timeline = timeline.group_phrases(phrase_max_chars)
+        self.timeline = timeline
+
+        # One bitmap per entry of the word table, indexed by word id
+        used = set(timeline.word_ids.tolist())
+        self._bitmaps = [
+            renderer.render(word, fontsize=fontsize, color=color,
+                            stroke_color=stroke_color, stroke_width=stroke_width,
+                            max_width=max_width) if i in used else None
+            for i, word in enumerate(timeline.words)
+        ]
+        drawn = [b for b in self._bitmaps if b is not None]
+
+        VideoClip.__init__(self, make_frame=self._make_rgb, duration=duration, has_constant_size=False)
+        self.size = (max((b.size[0] for b in drawn), default=1),
+                     max((b.size[1] for b in drawn), default=1))
+        self.mask = VideoClip(make_frame=self._make_alpha, ismask=True, duration=duration, has_constant_size=False)
+        self.mask.size = self.size
+
+    def active_index(self, t: float) -> int:
+        """
+        Returns the index of the caption shown at time t, or -1.
+        """
+        return self.timeline.index_at(t)
+
+    def _make_rgb(self, t: float) -> np.ndarray:
+        i = self.active_index(t)
+        return self._bitmaps[self.timeline.word_ids[i]].rgb if i >= 0 else _EMPTY_RGB
+
+    def _make_alpha(self, t: float) -> np.ndarray:
+        i = self.active_index(t)
+        return self._bitmaps[self.timeline.word_ids[i]].alpha if i >= 0 else _EMPTY_ALPHA
+
+    def __len__(self) -> int:
+        return len(self.timeline)
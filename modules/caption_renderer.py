@@ -0,0 +1,160 @@
+import hashlib
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from config import Config
+
+# Fonts tried (in order) when the configured font cannot be loaded
+FALLBACK_FONTS = ["arialbd.ttf", "Arial Bold.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"]
+REGULAR_FALLBACK_FONTS = ["arial.ttf", "Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"]
+
+
+@lru_cache(maxsize=32)
+def load_font(font: str, size: int, bold: bool = True) -> ImageFont.FreeTypeFont:
+    """
+    Loads a TrueType font, falling back to common bold (or regular) fonts
+    and finally to Pillow's bundled default font.
+    """
+    fallbacks = FALLBACK_FONTS if bold else REGULAR_FALLBACK_FONTS
+    for candidate in [font] + fallbacks:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except (OSError, ValueError):
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError: # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+class CaptionBitmap:
+    """
+    A rasterized caption: RGB pixels plus a separate alpha mask,
+    in the layout moviepy expects for ImageClip / mask clips.
+    """
+    __slots__ = ("rgb", "alpha")
+
+    def __init__(self, rgb: np.ndarray, alpha: np.ndarray):
+        self.rgb = rgb
+        self.alpha = alpha
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.rgb.shape[1], self.rgb.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.rgb.nbytes + self.alpha.nbytes
+
+
+class CaptionRenderer:
+    """
+    Rasterizes caption words with Pillow and caches the bitmaps.
+    Keyed on (word, font, size, color, stroke) so repeated words
+    ("I", "the", "my"...) are only drawn once per story.
+    """
+    def __init__(self,
+                 font: str = Config.CAPTION_FONT,
+                 max_entries: int = Config.CAPTION_CACHE_SIZE,
+                 cache_dir: Optional[str] = Config.CAPTION_CACHE_DIR):
+        self.font = font
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._cache: "OrderedDict[tuple, CaptionBitmap]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def render(self, word: str, fontsize: int = 70, color: str = 'white',
+               stroke_color: str = 'black', stroke_width: int = 2,
+               max_width: Optional[int] = None) -> CaptionBitmap:
+        """
+        Returns the cached bitmap for a word, rendering it on first use.
+        """
+        key = (word, self.font, fontsize, color, stroke_color, stroke_width, max_width)
+
+        bitmap = self._cache.get(key)
+        if bitmap is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return bitmap
+
+        self.misses += 1
+        bitmap = self._load_from_disk(key)
+        if bitmap is None:
+            bitmap = self._rasterize(word, fontsize, color, stroke_color, stroke_width, max_width)
+            self._save_to_disk(key, bitmap)
+
+        self._cache[key] = bitmap
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return bitmap
+
+    def _rasterize(self, word: str, fontsize: int, color: str, stroke_color: str,
+                   stroke_width: int, max_width: Optional[int]) -> CaptionBitmap:
+        font = load_font(self.font, fontsize)
+        probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+        left, top, right, bottom = probe.textbbox((0, 0), word, font=font, stroke_width=stroke_width)
+        width, height = max(1, right - left), max(1, bottom - top)
+
+        image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        draw.text((-left, -top), word, font=font, fill=color,
+                  stroke_width=stroke_width, stroke_fill=stroke_color)
+
+        # Shrink overly long words instead of wrapping (captions are single words)
+        if max_width and image.width > max_width:
+            ratio = max_width / image.width
+            image = image.resize((max_width, max(1, int(image.height * ratio))), Image.LANCZOS)
+
+        pixels = np.asarray(image)
+        return CaptionBitmap(
+            np.ascontiguousarray(pixels[:, :, :3]),
+            pixels[:, :, 3].astype(np.float32) / 255.0
+        )
+
+    def _disk_path(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.png")
+
+    def _load_from_disk(self, key: tuple) -> Optional[CaptionBitmap]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with Image.open(path) as image:
+                pixels = np.asarray(image.convert("RGBA"))
+        except OSError:
+            return None
+        return CaptionBitmap(
+            np.ascontiguousarray(pixels[:, :, :3]),
+            pixels[:, :, 3].astype(np.float32) / 255.0
+        )
+
+    def _save_to_disk(self, key: tuple, bitmap: CaptionBitmap):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        alpha = (bitmap.alpha * 255).astype(np.uint8)[:, :, None]
+        rgba = np.concatenate([bitmap.rgb, alpha], axis=2)
+        # Write to a temp file first so concurrent renders never read half a PNG
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            Image.fromarray(rgba).save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write caption cache entry: {e}")
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,202 @@
+import os
+import math
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from config import Config
+from modules.caption_renderer import load_font
+
+# Reddit dark mode palette
+CARD_BACKGROUND = (26, 26, 27)
+CARD_BORDER = (52, 53, 54)
+TEXT_PRIMARY = (215, 218, 220)
+TEXT_SECONDARY = (129, 131, 132)
+REDDIT_ORANGE = (255, 69, 0)
+
+
+def format_count(value: int) -> str:
+    """
+    Formats counts the way Reddit does (950, 1.2k, 15k, 1.1m).
+    """
+    value = int(value or 0)
+    if value >= 1_000_000:
+        return f"{value / 1_000_000:.1f}m".replace(".0m", "m")
+    if value >= 10_000:
+        return f"{value // 1000}k"
+    if value >= 1000:
+        return f"{value / 1000:.1f}k".replace(".0k", "k")
+    return str(value)
+
+
+def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int, max_lines: int = 0) -> List[str]:
+    """
+    Greedy word wrap by rendered pixel width.
+    With max_lines set, the last line is ellipsized.
+    """
+    lines = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and font.getlength(candidate) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+
+    if max_lines and len(lines) > max_lines:
+        last = lines[max_lines - 1]
+        while last and font.getlength(last + "...") > max_width:
+            last = last[:-1]
+        lines = lines[:max_lines - 1] + [last.rstrip() + "..."]
+    return lines
+
+
+@lru_cache(maxsize=16)
+def upvote_icon(size: int, color: Tuple[int, int, int] = REDDIT_ORANGE) -> Image.Image:
+    image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    s = size
+    draw.polygon([(s * 0.5, s * 0.08), (s * 0.92, s * 0.52), (s * 0.66, s * 0.52),
+                  (s * 0.66, s * 0.92), (s * 0.34, s * 0.92), (s * 0.34, s * 0.52),
+                  (s * 0.08, s * 0.52)], fill=color)
+    return image
+
+
+@lru_cache(maxsize=16)
+def comment_icon(size: int, color: Tuple[int, int, int] = TEXT_SECONDARY) -> Image.Image:
+    image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    s = size
+    width = max(2, size // 10)
+    draw.rounded_rectangle([s * 0.08, s * 0.12, s * 0.92, s * 0.72], radius=s * 0.18, outline=color, width=width)
+    draw.polygon([(s * 0.3, s * 0.7), (s * 0.3, s * 0.92), (s * 0.52, s * 0.7)], fill=color)
+    return image
+
+
+@lru_cache(maxsize=16)
+def avatar_icon(size: int, label: str = "r/") -> Image.Image:
+    image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse([0, 0, size - 1, size - 1], fill=REDDIT_ORANGE)
+    font = load_font(Config.CARD_FONT_BOLD, int(size * 0.42))
+    draw.text((size / 2, size / 2), label, font=font, fill=(255, 255, 255), anchor="mm")
+    return image
+
+
+class CardRenderer:
+    """
+    Draws Reddit-style dark mode title and comment cards directly with Pillow,
+    from the story dicts RedditScraper returns. No browser needed.
+    """
+    def __init__(self, width: int = Config.CARD_WIDTH):
+        self.width = width
+        self.padding = int(width * 0.045)
+        self.radius = int(width * 0.025)
+
+    def _fonts(self) -> Dict[str, ImageFont.FreeTypeFont]:
+        unit = self.width / 1000
+        return {
+            "meta": load_font(Config.CARD_FONT, int(30 * unit), bold=False),
+            "meta_bold": load_font(Config.CARD_FONT_BOLD, int(30 * unit)),
+            "title": load_font(Config.CARD_FONT_BOLD, int(52 * unit)),
+            "body": load_font(Config.CARD_FONT, int(40 * unit), bold=False),
+            "footer": load_font(Config.CARD_FONT_BOLD, int(32 * unit)),
+        }
+
+    def _lines_for(self, font: ImageFont.FreeTypeFont, max_chars: int) -> int:
+        """
+        Lines needed to show max_chars of text in font without ellipsizing:
+        characters per line from the font's average width, less a word's worth
+        for what greedy wrapping leaves at the end of each line.
+        """
+        sample = "the quick brown fox jumps over the lazy dog "
+        per_line = (self.width - 2 * self.padding) / (font.getlength(sample) / len(sample))
+        return math.ceil(max_chars / max(1.0, per_line - 8)) + 1
+
+    def _draw_card(self, header: Tuple[str, str], text: str, text_font_key: str,
+                   footer: List[Tuple[Image.Image, str]], output_path: str, max_lines: int,
+                   avatar_label: str = "r/") -> str:
+        fonts = self._fonts()
+        pad = self.padding
+        inner_width = self.width - 2 * pad
+
+        avatar_size = int(self.width * 0.07)
+        text_font = fonts[text_font_key]
+        lines = wrap_text(text, text_font, inner_width, max_lines)
+        line_height = int(text_font.size * 1.3)
+        footer_height = int(fonts["footer"].size * 1.6)
+
+        height = (pad + avatar_size + int(pad * 0.6) + line_height * max(1, len(lines))
+                  + int(pad * 0.6) + footer_height + pad)
+
+        image = Image.new("RGBA", (self.width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        draw.rounded_rectangle([0, 0, self.width - 1, height - 1], radius=self.radius,
+                               fill=CARD_BACKGROUND, outline=CARD_BORDER, width=2)
+
+        # Header: avatar, bold name, secondary details
+        y = pad
+        image.alpha_composite(avatar_icon(avatar_size, avatar_label), (pad, y))
+        x = pad + avatar_size + int(pad * 0.4)
+        name, details = header
+        draw.text((x, y + avatar_size / 2), name, font=fonts["meta_bold"], fill=TEXT_PRIMARY, anchor="lm")
+        x += int(fonts["meta_bold"].getlength(name)) + int(pad * 0.3)
+        draw.text((x, y + avatar_size / 2), details, font=fonts["meta"], fill=TEXT_SECONDARY, anchor="lm")
+
+        # Body text
+        y += avatar_size + int(pad * 0.6)
+        for line in lines:
+            draw.text((pad, y), line, font=text_font, fill=TEXT_PRIMARY)
+            y += line_height
+
+        # Footer: icon + count pairs
+        y += int(pad * 0.6)
+        x = pad
+        icon_size = int(fonts["footer"].size * 1.1)
+        for icon, label in footer:
+            image.alpha_composite(icon, (x, y + (footer_height - icon_size) // 2))
+            x += icon_size + int(pad * 0.25)
+            draw.text((x, y + footer_height / 2), label, font=fonts["footer"], fill=TEXT_SECONDARY, anchor="lm")
+            x += int(fonts["footer"].getlength(label)) + pad
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        image.save(output_path)
+        return output_path
+
+    def render_title_card(self, story: Dict[str, Any], output_path: str) -> str:
+        """
+        Renders the post title card for a story dict (title, subreddit, author, score, num_comments).
+        Returns the path to the image.
+        """
+        icon_size = int(self._fonts()["footer"].size * 1.1)
+        return self._draw_card(
+            header=(f"r/{story.get('subreddit', '')}", f"• u/{story.get('author', '[deleted]')}"),
+            text=story.get('title', ''),
+            text_font_key="title",
+            footer=[
+                (upvote_icon(icon_size), format_count(story.get('score', 0))),
+                (comment_icon(icon_size), format_count(story.get('num_comments', 0))),
+            ],
+            output_path=output_path,
+            max_lines=6,
+        )
+
+    def render_comment_card(self, comment: Dict[str, Any], output_path: str) -> str:
+        """
+        Renders a comment card for a dict with author, body and score.
+        """
+        icon_size = int(self._fonts()["footer"].size * 1.1)
+        return self._draw_card(
+            header=(f"u/{comment.get('author', '[deleted]')}", ""),
+            text=comment.get('body', ''),
+            text_font_key="body",
+            footer=[(upvote_icon(icon_size), format_count(comment.get('score', 0)))],
+            output_path=output_path,
+            # Room for the longest comment the scraper accepts, which TTS reads in full
+            max_lines=self._lines_for(self._fonts()["body"], Config.COMMENT_MAX_CHARS),
+            avatar_label="u/",
+        )
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+from config import Config
+
+
+def create_session(pool_size: int = 16) -> requests.Session:
+    """
+    A requests Session with pooled keep-alive connections and retries
+    on transient errors, shared by every request of a Downloader.
+    """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "HEAD"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _write_json_atomic(path: str, data: Any):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive lock on a lock file, held for the duration of the block.
+    Unlike a threading.Lock it also excludes other processes (batch workers);
+    the OS drops it if the holder dies, so a crash never leaves it stuck.
+    """
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError: # LK_LOCK gives up after ~10 s
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SearchCache:
+    """
+    Caches JSON API responses on disk, keyed by the request parameters,
+    so repeated searches for the same query skip the network.
+    """
+    def __init__(self, cache_dir: str = Config.SEARCH_CACHE_DIR, ttl: float = Config.SEARCH_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key: Dict[str, Any]) -> str:
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, key: Dict[str, Any]) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: Dict[str, Any], value: Any):
+        _write_json_atomic(self._path(key), value)
+
+
+class Downloader:
+    """
+    Downloads files into a content-addressed store (objects/<sha256><ext>).
+    Large files on servers that support Range requests are fetched in parallel
+    segments; interrupted downloads resume from their .part file; the final file
+    only appears (atomically) once it is complete. Each URL and the URL index
+    have a lock file, so several processes can share one download directory.
+    """
+    def __init__(self,
+                 download_dir: str = Config.DOWNLOAD_DIR,
+                 segments: int = Config.DOWNLOAD_SEGMENTS,
+                 chunk_size: int = 1024 * 1024,
+                 min_segment_size: int = 4 * 1024 * 1024,
+                 session: Optional[requests.Session] = None):
+        self.download_dir = download_dir
+        self.objects_dir = os.path.join(download_dir, "objects")
+        self.partial_dir = os.path.join(download_dir, "partial")
+        self.index_path = os.path.join(download_dir, "urls.json")
+        self.segments = segments
+        self.chunk_size = chunk_size
+        self.min_segment_size = min_segment_size
+        self.session = session or create_session(pool_size=max(16, segments * 2))
+        self.bytes_downloaded = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def _load_index(self) -> Dict[str, str]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def cached_path(self, url: str) -> Optional[str]:
+        """
+        Returns the stored file for a URL if it was downloaded before.
+        """
+        path = self._load_index().get(url)
+        if path and os.path.exists(path):
+            return path
+        return None
+
+    def _probe(self, url: str) -> Tuple[int, bool]:
+        """
+        Returns (content length, supports ranges). Length is 0 if unknown.
+        """
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=30)
+            response.raise_for_status()
+        except requests.RequestException:
+            return 0, False
+        size = int(response.headers.get("Content-Length") or 0)
+        ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return size, ranges
+
+    def _count(self, n: int):
+        with self._lock:
+            self.bytes_downloaded += n
+
+    def _download_stream(self, url: str, part_path: str, resumable: bool, size: int = 0):
+        """
+        Single connection download, resuming from an existing .part file when possible.
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if size and offset == size:
+            # Complete, but interrupted before it was moved into place
+            return
+        if size and offset > size:
+            offset = 0
+        headers = {"Range": f"bytes={offset}-"} if offset and resumable else {}
+        with self.session.get(url, stream=True, headers=headers, timeout=60) as r:
+            if r.status_code == 416 and offset:
+                # Range starts at the end of the file: the .part is already complete,
+                # unless the server reports a different total (the file changed)
+                total = r.headers.get("Content-Range", "").rpartition("/")[2]
+                if not total.isdigit() or int(total) == offset:
+                    return
+                os.remove(part_path)
+                return self._download_stream(url, part_path, resumable, size)
+            r.raise_for_status()
+            # Server ignored the Range header: start over
+            mode = "ab" if r.status_code == 206 else "wb"
+            with open(part_path, mode) as f:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    self._count(len(chunk))
+
+    def _download_segmented(self, url: str, part_path: str, state_path: str, size: int):
+        """
+        Parallel Range download. Finished segments are recorded in a state file
+        so a restarted download only fetches what is missing.
+        """
+        count = max(1, min(self.segments, size // self.min_segment_size))
+        bounds = [(i * size // count, (i + 1) * size // count - 1) for i in range(count)]
+
+        state = {}
+        if os.path.exists(state_path) and os.path.exists(part_path):
+            try:
+                with open(state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+        if state.get("size") != size or state.get("segments") != count:
+            state = {"size": size, "segments": count, "done": []}
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            _write_json_atomic(state_path, state)
+
+        state_lock = threading.Lock()
+
+        def fetch(index: int):
+            start, end = bounds[index]
+            headers = {"Range": f"bytes={start}-{end}"}
+            with self.session.get(url, stream=True, headers=headers, timeout=60) as r:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise RuntimeError("Server does not honor Range requests")
+                with open(part_path, "r+b") as f:
+                    f.seek(start)
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        self._count(len(chunk))
+            with state_lock:
+                state["done"].append(index)
+                _write_json_atomic(state_path, state)
+
+        todo: List[int] = [i for i in range(count) if i not in state["done"]]
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            list(pool.map(fetch, todo))
+
+    def download(self, url: str, suffix: str = ".mp4") -> str:
+        """
+        Downloads a URL (or reuses an earlier download) and returns the local path.
+        """
+        cached = self.cached_path(url)
+        if cached:
+            return cached
+
+        url_key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+        with file_lock(os.path.join(self.partial_dir, f"{url_key}.lock")):
+            # Another process may have finished it while we waited
+            return self.cached_path(url) or self._download_locked(url, url_key, suffix)
+
+    def _download_locked(self, url: str, url_key: str, suffix: str) -> str:
+        part_path = os.path.join(self.partial_dir, f"{url_key}.part")
+        state_path = os.path.join(self.partial_dir, f"{url_key}.json")
+
+        size, ranges = self._probe(url)
+        if ranges and size >= 2 * self.min_segment_size and self.segments > 1:
+            self._download_segmented(url, part_path, state_path, size)
+        else:
+            self._download_stream(url, part_path, resumable=ranges, size=size)
+
+        if size and os.path.getsize(part_path) != size:
+            raise RuntimeError(f"Incomplete download of {url}")
+
+        digest = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            for block in iter(lambda: f.read(self.chunk_size), b""):
+                digest.update(block)
+        final_path = os.path.join(self.objects_dir, f"{digest.hexdigest()}{suffix}")
+
+        # Same content may already exist under another URL
+        if os.path.exists(final_path):
+            os.remove(part_path)
+        else:
+            os.replace(part_path, final_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+        with self._lock, file_lock(f"{self.index_path}.lock"):
+            index = self._load_index()
+            index[url] = final_path
+            _write_json_atomic(self.index_path, index)
+        return final_path
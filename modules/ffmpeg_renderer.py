@@ -0,0 +1,220 @@
+import os
+import tempfile
+from typing import List, Dict, Any, Optional, Union
+
+from PIL import Image, ImageColor, ImageDraw
+
+from config import Config
+from modules.caption_renderer import load_font
+from modules.media_utils import run_ffmpeg, probe_media
+from modules.word_timeline import WordTimeline, as_timeline
+
+
+def format_ass_time(seconds: float) -> str:
+    """
+    Formats seconds as an ASS timestamp (H:MM:SS.cc).
+    """
+    centis = int(round(max(0.0, seconds) * 100))
+    hours, centis = divmod(centis, 360000)
+    minutes, centis = divmod(centis, 6000)
+    secs, centis = divmod(centis, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centis:02d}"
+
+
+def ass_color(color: str) -> str:
+    """
+    Converts a Pillow color name / hex string to ASS &HAABBGGRR notation.
+    """
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+
+def escape_filter_path(path: str) -> str:
+    """
+    Escapes a file path for use as a filter argument inside -filter_complex.
+    """
+    path = os.path.abspath(path).replace("\\", "/")
+    return path.replace(":", "\\:").replace("'", "\\'")
+
+
+class FFmpegRenderer:
+    """
+    Renders the same layout as VideoAssembler's moviepy path,
+    but as a single native ffmpeg filter graph invocation.
+    """
+    def __init__(self, output_width: int = 1080, output_height: int = 1920, fps: int = 24):
+        self.width = output_width
+        self.height = output_height
+        self.fps = fps
+
+    def write_ass(self, timings: Union[WordTimeline, List[Dict[str, Any]]], output_path: str, fontsize=70,
+                  color='white', stroke_color='black', stroke_width=2):
+        """
+        Writes word timings as an ASS subtitle file styled like the Pillow captions.
+        Like the Pillow captions, phrases wider than the frame minus the
+        margins are shrunk instead of wrapped.
+        """
+        timeline = as_timeline(timings)
+        if Config.CAPTION_PHRASE_MAX_CHARS:
+            timeline = timeline.group_phrases(Config.CAPTION_PHRASE_MAX_CHARS)
+
+        font = load_font(Config.CAPTION_FONT, fontsize)
+        try:
+            family, style = font.getname()
+        except AttributeError: # Pillow's bitmap default font has no name
+            family, style = "Arial", "Bold"
+        bold = -1 if style and "bold" in style.lower() else 0
+        max_width = self.width - 200
+        font_sizes = [self._fit_fontsize(font, text, fontsize, stroke_width, max_width)
+                      for text in timeline.words]
+
+        lines = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {self.width}",
+            f"PlayResY: {self.height}",
+            "WrapStyle: 2",
+            "ScaledBorderAndShadow: yes",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+            "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+            f"Style: Caption,{family},{fontsize},{ass_color(color)},{ass_color(color)},{ass_color(stroke_color)},"
+            f"&H00000000,{bold},0,0,0,100,100,0,0,1,{stroke_width},0,5,100,100,0,1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        ]
+        lines.extend(timeline.ass_events("Caption", font_sizes))
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    @staticmethod
+    def _fit_fontsize(font, text: str, fontsize: int, stroke_width: int, max_width: int) -> Optional[int]:
+        """
+        A smaller font size for text wider than max_width, or None if it fits
+        (or can't be measured, e.g. with Pillow's bitmap default font).
+        """
+        probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+        try:
+            left, _, right, _ = probe.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+        except (ValueError, TypeError):
+            return None
+        width = right - left
+        if width <= max_width:
+            return None
+        return max(1, int(fontsize * max_width / width))
+
+    def build_command(self, background_path: str, files_map: Dict[str, Any], output_path: str,
+                      title_duration: float, total_duration: float,
+                      subtitles_path: Optional[str] = None) -> List[str]:
+        """
+        Builds the ffmpeg argument list (without the binary) for one render.
+        """
+        W, H = self.width, self.height
+        screenshot = files_map.get('title_screenshot')
+        has_screenshot = bool(screenshot) and os.path.exists(screenshot)
+
+        overlays = [o for o in files_map.get('content_overlays', []) if o.get('image') and os.path.exists(o['image'])]
+
+        args = ["-stream_loop", "-1", "-i", background_path]
+        if has_screenshot:
+            args += ["-loop", "1", "-framerate", str(self.fps), "-i", screenshot]
+        overlay_index = 2 if has_screenshot else 1
+        for overlay in overlays:
+            args += ["-loop", "1", "-framerate", str(self.fps), "-i", overlay['image']]
+        audio_index = overlay_index + len(overlays)
+        mixed_audio = files_map.get('mixed_audio')
+        if mixed_audio:
+            args += ["-i", mixed_audio]
+        else:
+            args += ["-i", files_map['title_audio'], "-i", files_map['content_audio']]
+
+        # Background: cover, center crop, constant fps (same as the moviepy path).
+        # Proxies are already normalized, so the scale/crop is skipped for them.
+        background = probe_media(background_path)
+        if (background['width'], background['height']) == (W, H) and round(background['fps']) == self.fps:
+            filters = ["[0:v]null[bg]"]
+        else:
+            filters = [f"[0:v]scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},fps={self.fps},setsar=1[bg]"]
+        video_label = "bg"
+
+        if has_screenshot:
+            filters.append(f"[1:v]scale='min(iw,{W - 100})':'min(ih,{H - 100})':force_original_aspect_ratio=decrease[shot]")
+            filters.append(
+                f"[{video_label}][shot]overlay=(W-w)/2:(H-h)/2:"
+                f"enable='between(t,0,{title_duration:.3f})'[titled]"
+            )
+            video_label = "titled"
+
+        for i, overlay in enumerate(overlays):
+            start = title_duration + overlay['start']
+            end = title_duration + overlay['end']
+            filters.append(
+                f"[{overlay_index + i}:v]scale='min(iw,{W - 100})':'min(ih,{H - 100})':force_original_aspect_ratio=decrease[card{i}]"
+            )
+            filters.append(
+                f"[{video_label}][card{i}]overlay=(W-w)/2:(H-h)/2:"
+                f"enable='between(t,{start:.3f},{end:.3f})'[carded{i}]"
+            )
+            video_label = f"carded{i}"
+
+        if subtitles_path:
+            filters.append(f"[{video_label}]subtitles='{escape_filter_path(subtitles_path)}'[captioned]")
+            video_label = "captioned"
+
+        if mixed_audio:
+            # Premixed AAC track: muxed without re-encoding
+            audio_map, audio_codec = f"{audio_index}:a", ["-c:a", "copy"]
+        else:
+            for i in range(2):
+                filters.append(
+                    f"[{audio_index + i}:a]aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo[a{i}]"
+                )
+            filters.append("[a0][a1]concat=n=2:v=0:a=1[aout]")
+            audio_map, audio_codec = "[aout]", ["-c:a", "aac", "-b:a", "128k"]
+
+        args += [
+            "-filter_complex", ";".join(filters),
+            "-map", f"[{video_label}]",
+            "-map", audio_map,
+            "-t", f"{total_duration:.3f}",
+            "-r", str(self.fps),
+            "-c:v", "libx264",
+            "-preset", Config.FFMPEG_PRESET,
+            "-crf", str(Config.FFMPEG_CRF),
+            "-pix_fmt", "yuv420p",
+        ] + audio_codec + [
+            "-movflags", "+faststart",
+            output_path,
+        ]
+        return args
+
+    def render(self, background_path: str, files_map: Dict[str, Any], output_path: str):
+        """
+        Renders the final video with one ffmpeg process.
+        Muxes files_map['mixed_audio'] if present, otherwise joins the
+        title and content audio in the filter graph.
+        """
+        if files_map.get('mixed_audio'):
+            title_duration = files_map['title_duration']
+            total_duration = files_map['total_duration']
+        else:
+            title_duration = probe_media(files_map['title_audio'])['duration']
+            total_duration = title_duration + probe_media(files_map['content_audio'])['duration']
+
+        content_timings = as_timeline(files_map.get('content_timings'))
+
+        with tempfile.TemporaryDirectory(prefix="render_") as tmp_dir:
+            subtitles_path = None
+            if len(content_timings):
+                subtitles_path = os.path.join(tmp_dir, "captions.ass")
+                self.write_ass(content_timings.shift(title_duration), subtitles_path)
+
+            args = self.build_command(background_path, files_map, output_path,
+                                      title_duration, total_duration, subtitles_path)
+            print(f"Writing video to {output_path} (ffmpeg engine)...")
+            run_ffmpeg(args)
+        print("Video generation complete!")
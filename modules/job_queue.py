@@ -0,0 +1,211 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    story_id TEXT NOT NULL UNIQUE,
+    story TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    stages TEXT NOT NULL DEFAULT '{}',
+    output TEXT,
+    last_error TEXT,
+    owner TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_next ON jobs (status, next_attempt_at);
+"""
+
+# Job lifecycle
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Columns added after the first release, created on open for older databases
+MIGRATIONS = {
+    "owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",
+    "lease_until": "ALTER TABLE jobs ADD COLUMN lease_until REAL NOT NULL DEFAULT 0",
+}
+
+
+class JobQueue:
+    """
+    Durable SQLite job queue for batch / daemon runs.
+    Each job is one story. Outputs of finished stages are stored with the job,
+    so a job interrupted by a crash (or a failed attempt) resumes from the
+    last completed stage instead of starting over.
+    A claimed job is leased to its owner (host:pid) until lease_until; the
+    owner extends the lease with heartbeat(), and a job whose lease ran out
+    is taken to be abandoned and can be claimed again by any process.
+    """
+    def __init__(self, db_path: str = Config.JOB_QUEUE_PATH, lease: float = Config.JOB_LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        with self._conn:
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+
+    def close(self):
+        self._conn.close()
+
+    def _to_job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["story"] = json.loads(job["story"])
+        job["stages"] = json.loads(job["stages"])
+        return job
+
+    def enqueue(self, story: Dict[str, Any]) -> Optional[int]:
+        """
+        Adds a job for a story. Returns the job id, or None if the story already has one.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT OR IGNORE INTO jobs (story_id, story, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (story["id"], json.dumps(story, ensure_ascii=False), JOB_QUEUED, now, now)
+            )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def recover(self) -> int:
+        """
+        Requeues jobs left 'running' by a crashed process: those owned by this
+        process and those whose lease has expired. Jobs another live process
+        is still working on are left alone. Returns how many.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET status = ?, next_attempt_at = 0, owner = NULL, lease_until = 0, updated_at = ?
+                WHERE status = ? AND (owner IS ? OR lease_until < ?)
+                """,
+                (JOB_QUEUED, now, JOB_RUNNING, self.owner, now)
+            )
+        return cursor.rowcount
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Takes the oldest job that is due (or whose lease has expired) and
+        marks it running, leased to this process. The UPDATE re-checks the
+        row's state, so when another process claims the same job first it
+        matches nothing and the next candidate is tried.
+        """
+        due = "((status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_until < ?))"
+        with self._lock:
+            while True:
+                now = time.time()
+                params = (JOB_QUEUED, now, JOB_RUNNING, now)
+                row = self._conn.execute(f"SELECT * FROM jobs WHERE {due} ORDER BY id LIMIT 1", params).fetchone()
+                if not row:
+                    return None
+                with self._conn:
+                    claimed = self._conn.execute(
+                        f"""
+                        UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, lease_until = ?, updated_at = ?
+                        WHERE id = ? AND {due}
+                        """,
+                        (JOB_RUNNING, self.owner, now + self.lease, now, row["id"]) + params
+                    ).rowcount
+                if claimed:
+                    break
+        job = self._to_job(row)
+        job["status"] = JOB_RUNNING
+        job["attempts"] += 1
+        job["owner"] = self.owner
+        job["lease_until"] = now + self.lease
+        return job
+
+    def heartbeat(self, job_id: int) -> bool:
+        """
+        Extends the lease on a running job owned by this process.
+        Returns False if the job is no longer ours (e.g. the lease ran out
+        and another process took it over).
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND status = ? AND owner = ?",
+                (now + self.lease, now, job_id, JOB_RUNNING, self.owner)
+            )
+        return cursor.rowcount > 0
+
+    def save_stage(self, job_id: int, stage: str, outputs: Dict[str, Any]):
+        """
+        Records the outputs of a finished stage (they must be JSON serializable).
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row["stages"]) if row else {}
+            stages[stage] = outputs
+            self._conn.execute("UPDATE jobs SET stages = ?, updated_at = ? WHERE id = ?",
+                               (json.dumps(stages, ensure_ascii=False), time.time(), job_id))
+
+    def complete(self, job_id: int, output: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = ?, output = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                               (JOB_DONE, output, time.time(), job_id))
+
+    def fail(self, job_id: int, error: str,
+             max_attempts: int = Config.JOB_MAX_ATTEMPTS,
+             backoff: float = Config.JOB_RETRY_BACKOFF) -> bool:
+        """
+        Records a failed attempt. The job is retried after an exponential backoff
+        until max_attempts is reached. Returns True if it will be retried.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            attempts = row["attempts"] if row else max_attempts
+            retry = attempts < max_attempts
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, next_attempt_at = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (JOB_QUEUED if retry else JOB_FAILED,
+                 time.time() + backoff * (2 ** (attempts - 1)) if retry else 0,
+                 error, time.time(), job_id)
+            )
+        return retry
+
+    def next_due(self) -> Optional[float]:
+        """
+        Time at which the next queued job becomes due, or None if nothing is queued.
+        """
+        row = self._conn.execute("SELECT MIN(next_attempt_at) FROM jobs WHERE status = ?", (JOB_QUEUED,)).fetchone()
+        return row[0]
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        if status:
+            rows = self._conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,))
+        else:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id")
+        return [self._to_job(row) for row in rows]
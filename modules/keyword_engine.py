@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, List, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+STOPWORDS = frozenset([
+    'the', 'and', 'to', 'of', 'a', 'in', 'is', 'that', 'with', 'for', 'it', 'on', 'was', 'my', 'me', 'at',
+    'this', 'but', 'have', 'had', 'not', 'be', 'are', 'we', 'from', 'so', 'just', 'like', 'about', 'what',
+    'an', 'if', 'or', 'when', 'one', 'all', 'do', 'they', 'can', 'up', 'out', 'there', 'who', 'get', 'go',
+    'would', 'because', 'really', 'been', 'were', 'then', 'than', 'them', 'their', 'could', 'should',
+    'said', 'told', 'know', 'even', 'still', 'some', 'into', 'over', 'after', 'before', 'while', 'which',
+    'your', 'yours', 'myself', 'going', 'thing', 'things', 'something', 'anything', 'everything', 'being',
+    'also', 'only', 'very', 'much', 'many', 'more', 'most', 'other', 'again', 'back', 'here', 'where',
+    'these', 'those', 'will', 'does', 'doing', 'didn', 'doesn', 'don', 'wasn', 'isn', 'aren', 'haven',
+    'wouldn', 'couldn', 'shouldn', 'won', 'always', 'never', 'ever', 'since', 'until', 'through', 'though',
+    'every', 'each', 'both', 'such', 'want', 'wanted', 'time', 'make', 'made', 'take', 'took', 'come',
+    'came', 'says', 'saying', 'think', 'thought', 'felt', 'feel', 'look', 'looked', 'well', 'okay',
+    'yeah', 'right', 'left', 'day', 'days', 'year', 'years', 'week', 'update', 'edit', 'throwaway',
+])
+
+WORD_RE = re.compile(r"[a-z]+")
+# Bumped when the meaning of "seen" changes; older vocabularies are rebuilt
+VOCAB_VERSION = 2
+
+
+def tokenize(text: str, min_length: int = 4) -> List[str]:
+    """
+    Lowercase alphabetic words, minus stopwords and short words.
+    """
+    return [w for w in WORD_RE.findall(text.lower()) if len(w) >= min_length and w not in STOPWORDS]
+
+
+def story_document(story: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    The corpus document for a story: (story id, title and content).
+    """
+    return story["id"], f"{story['title']} {story.get('content') or ''}"
+
+
+class KeywordEngine:
+    """
+    TF-IDF keyword extraction over the accumulated story corpus.
+    Document frequencies live in a persisted vocabulary that grows as stories
+    are seen (each story counted once, by story id), so words that are
+    common across Reddit stories rank below words specific to one story.
+    Scoring is vectorized: a batch of stories is scored in a single pass.
+    """
+    def __init__(self, vocab_path: str = Config.KEYWORD_VOCAB_PATH):
+        self.vocab_path = vocab_path
+        self._lock = threading.Lock()
+        self.term_ids: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.df = np.zeros(0, dtype=np.int64)
+        self.n_docs = 0
+        self._seen: set = set()
+        self._dirty = False
+
+        os.makedirs(os.path.dirname(vocab_path) or ".", exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.vocab_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != VOCAB_VERSION:
+            return
+        self.terms = data.get("terms", [])
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.df = np.asarray(data.get("df", []), dtype=np.int64)
+        self.n_docs = data.get("n_docs", 0)
+        self._seen = set(data.get("seen", []))
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({
+                "version": VOCAB_VERSION,
+                "n_docs": self.n_docs,
+                "terms": self.terms,
+                "df": self.df.tolist(),
+                "seen": sorted(self._seen),
+            })
+            self._dirty = False
+        tmp_path = f"{self.vocab_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.vocab_path)
+
+    @staticmethod
+    def _doc_key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    def _ids_for(self, tokens: List[str], local: Optional[Dict[str, int]] = None) -> List[int]:
+        """
+        Maps tokens to term ids, adding unseen terms to the vocabulary.
+        With a `local` dict, unseen terms get temporary ids (after the
+        vocabulary's) recorded there instead, leaving the vocabulary as is.
+        """
+        ids = []
+        for token in tokens:
+            term_id = self.term_ids.get(token)
+            if term_id is None and local is not None:
+                term_id = local.setdefault(token, len(self.terms) + len(local))
+            elif term_id is None:
+                term_id = len(self.terms)
+                self.term_ids[token] = term_id
+                self.terms.append(token)
+            ids.append(term_id)
+        return ids
+
+    def _encode(self, texts: List[str], local: Optional[Dict[str, int]] = None):
+        """
+        Flattens a batch into parallel (doc index, term id) arrays.
+        """
+        doc_index: List[int] = []
+        term_index: List[int] = []
+        for i, text in enumerate(texts):
+            ids = self._ids_for(tokenize(text or ""), local)
+            doc_index.extend([i] * len(ids))
+            term_index.extend(ids)
+        return np.asarray(doc_index, dtype=np.int64), np.asarray(term_index, dtype=np.int64)
+
+    def _grow_df(self):
+        if len(self.df) < len(self.terms):
+            self.df = np.concatenate([self.df, np.zeros(len(self.terms) - len(self.df), dtype=np.int64)])
+
+    def _observe(self, keys: List[str], docs: np.ndarray, terms: np.ndarray):
+        """
+        Adds not yet seen documents of an encoded batch to the document frequencies.
+        """
+        self._grow_df()
+        new_docs = []
+        for i, key in enumerate(keys):
+            if key not in self._seen:
+                self._seen.add(key)
+                new_docs.append(i)
+        if not new_docs:
+            return
+        keep = np.isin(docs, new_docs)
+        # Unique (doc, term) pairs: a word counts once per document
+        pairs = np.unique(docs[keep] * len(self.terms) + terms[keep])
+        self.df += np.bincount(pairs % len(self.terms), minlength=len(self.terms))
+        self.n_docs += len(new_docs)
+        self._dirty = True
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]], save: bool = True) -> int:
+        """
+        Adds (doc id, text) pairs, e.g. from story_document(), to the corpus
+        statistics. Ids already counted are skipped before tokenizing.
+        Returns the corpus size.
+        """
+        with self._lock:
+            new: Dict[str, str] = {}
+            for doc_id, text in documents:
+                if doc_id not in self._seen:
+                    new.setdefault(doc_id, text)
+            if new:
+                docs, terms = self._encode(list(new.values()))
+                self._observe(list(new), docs, terms)
+        if save:
+            self.save()
+        return self.n_docs
+
+    def extract_batch(self, texts: List[str], max_keywords: int = 3, update: bool = True) -> List[List[str]]:
+        """
+        Top TF-IDF keywords for each text, scored in one vectorized pass.
+        With update=True the texts are added to the corpus first, keyed by
+        content hash; pass update=False for stories already added by id.
+        A read-only query leaves the vocabulary untouched: its unknown words
+        get batch-local ids and score as if no document contained them.
+        """
+        texts = list(texts)
+        with self._lock:
+            local: Optional[Dict[str, int]] = None if update else {}
+            docs, terms = self._encode(texts, local)
+            if update:
+                self._observe([self._doc_key(text or "") for text in texts], docs, terms)
+            self._grow_df()
+            results: List[List[str]] = [[] for _ in texts]
+            if not len(terms):
+                return results
+
+            names = self.terms + list(local or ())
+            df = self.df
+            if len(df) < len(names):
+                df = np.concatenate([df, np.zeros(len(names) - len(df), dtype=np.int64)])
+            vocab_size = len(names)
+            pairs, counts = np.unique(docs * vocab_size + terms, return_counts=True)
+            pair_docs = pairs // vocab_size
+            pair_terms = pairs % vocab_size
+
+            doc_lengths = np.bincount(docs, minlength=len(texts))
+            tf = counts / doc_lengths[pair_docs]
+            idf = np.log((1.0 + self.n_docs) / (1.0 + df[pair_terms])) + 1.0
+            scores = tf * idf
+
+            # Sort by document, then score descending (term id breaks ties stably)
+            order = np.lexsort((pair_terms, -scores, pair_docs))
+            sorted_docs = pair_docs[order]
+            starts = np.searchsorted(sorted_docs, np.arange(len(texts)))
+            rank = np.arange(len(order)) - starts[sorted_docs]
+            top = order[rank < max_keywords]
+
+        for doc, term in zip(pair_docs[top].tolist(), pair_terms[top].tolist()):
+            results[doc].append(names[term])
+        if update:
+            self.save()
+        return results
+
+    def extract(self, text: str, max_keywords: int = 3, update: bool = True) -> List[str]:
+        return self.extract_batch([text], max_keywords, update)[0]
+
+
+_shared_engine: Optional[KeywordEngine] = None
+
+
+def get_shared_engine() -> KeywordEngine:
+    """
+    Process-wide engine, so the vocabulary is loaded once.
+    """
+    global _shared_engine
+    if _shared_engine is None:
+        _shared_engine = KeywordEngine()
+    return _shared_engine
@@ -0,0 +1,71 @@
+import re
+import subprocess
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
+
+from config import Config
+
+
+@lru_cache(maxsize=1)
+def get_ffmpeg_binary() -> str:
+    """
+    Returns the ffmpeg executable to use.
+    Prefers Config.FFMPEG_BINARY, then the binary bundled with moviepy (imageio-ffmpeg).
+    """
+    if Config.FFMPEG_BINARY:
+        return Config.FFMPEG_BINARY
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+def run_ffmpeg(args: List[str], input: Optional[bytes] = None) -> subprocess.CompletedProcess:
+    """
+    Runs ffmpeg with the given arguments (without the binary itself).
+    input is fed to stdin (for "-i pipe:0"); stdout is captured (for "pipe:1").
+    Raises RuntimeError with the tail of stderr if ffmpeg fails.
+    """
+    cmd = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"] + args
+    result = subprocess.run(cmd, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {stderr[-2000:]}")
+    return result
+
+
+def probe_media(path: str) -> Dict[str, Any]:
+    """
+    Reads duration, resolution and fps of a media file from ffmpeg's banner output.
+    Same approach moviepy uses, so it works without ffprobe.
+    """
+    result = subprocess.run(
+        [get_ffmpeg_binary(), "-hide_banner", "-i", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    info = result.stderr.decode("utf-8", errors="replace")
+
+    duration_match = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", info)
+    if not duration_match:
+        raise RuntimeError(f"Could not read duration of {path}")
+    hours, minutes, seconds = duration_match.groups()
+
+    data = {
+        "duration": int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        "width": 0,
+        "height": 0,
+        "fps": 0.0,
+        "has_audio": " Audio: " in info,
+    }
+
+    video_line = next((line for line in info.splitlines() if " Video: " in line), None)
+    if video_line:
+        size_match = re.search(r"\s(\d{2,5})x(\d{2,5})[\s,]", video_line)
+        if size_match:
+            data["width"], data["height"] = int(size_match.group(1)), int(size_match.group(2))
+        fps_match = re.search(r"([\d.]+) (?:fps|tbr)", video_line)
+        if fps_match:
+            data["fps"] = float(fps_match.group(1))
+
+    return data
@@ -0,0 +1,349 @@
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Sequence
+
+from modules.tracing import get_tracer, in_worker_process
+
+STAGE_THREAD = "thread"
+STAGE_ASYNC = "async"
+STAGE_PROCESS = "process"
+
+
+def source_hash(*module_names: str) -> str:
+    """
+    Hash of the source files of the given modules, for use in stage params:
+    editing a template or renderer invalidates the stages that use it.
+    """
+    digest = hashlib.sha256()
+    for name in module_names:
+        spec = importlib.util.find_spec(name)
+        if spec and spec.origin and os.path.exists(spec.origin):
+            with open(spec.origin, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def _hash_value(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _file_stamp(path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _fingerprint(value: Any) -> str:
+    """
+    Hash of a stage input: the value itself plus the size/mtime of every file
+    path inside it, so a rewritten output file counts as a changed input.
+    """
+    files = {}
+
+    def collect(item: Any):
+        if isinstance(item, str):
+            if (os.sep in item or "/" in item) and os.path.isfile(item):
+                files[item] = _file_stamp(item)
+        elif isinstance(item, dict):
+            for child in item.values():
+                collect(child)
+        elif isinstance(item, (list, tuple)):
+            for child in item:
+                collect(child)
+
+    collect(value)
+    return _hash_value({"value": value, "files": files})
+
+
+def _call_in_span(span_name: str, func: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    """
+    Runs a blocking stage inside its span, on the thread (or process) doing the work.
+    """
+    tracer = get_tracer()
+    try:
+        with tracer.span(span_name, "stage"):
+            return func(**kwargs)
+    finally:
+        if in_worker_process():
+            tracer.dump_partial()
+
+
+class StageError(RuntimeError):
+    """
+    Raised when a stage fails; .stage is the stage name, the original
+    exception is chained as __cause__.
+    """
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+
+
+class Stage:
+    """
+    One step of a pipeline.
+    func is called with the declared inputs as keyword arguments. With a single
+    output its return value is that output; with several it returns a dict
+    (or a tuple in the declared order).
+    Blocking stages (kind "thread") run on a thread pool, coroutine functions
+    (kind "async") on the event loop, CPU-heavy ones (kind "process") in a
+    process pool if the run has one; their func and inputs must be picklable.
+    params are extra settings that affect the result (config values, voice,
+    template versions); with a manifest directory they are part of the
+    stage's input hash.
+    """
+    def __init__(self,
+                 name: str,
+                 func: Callable[..., Any],
+                 inputs: Sequence[str] = (),
+                 outputs: Sequence[str] = (),
+                 kind: str = STAGE_THREAD,
+                 params: Optional[Dict[str, Any]] = None):
+        if kind not in (STAGE_THREAD, STAGE_ASYNC, STAGE_PROCESS):
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.kind = kind
+        self.params = params or {}
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs}, kind={self.kind!r})"
+
+    def unpack(self, result: Any) -> Dict[str, Any]:
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        if isinstance(result, dict):
+            missing = [name for name in self.outputs if name not in result]
+            if missing:
+                raise ValueError(f"Stage '{self.name}' did not produce {missing}")
+            return {name: result[name] for name in self.outputs}
+        if len(result) != len(self.outputs):
+            raise ValueError(f"Stage '{self.name}' returned {len(result)} values, expected {len(self.outputs)}")
+        return dict(zip(self.outputs, result))
+
+
+class StageGraph:
+    """
+    A small dataflow executor: stages are wired together by the names of their
+    inputs and outputs, and every stage starts as soon as its inputs exist,
+    so independent stages (e.g. TTS and the background fetch) overlap and the
+    run takes roughly as long as its longest path instead of the sum.
+
+    With a manifest_dir, every finished stage writes <stage>.json holding a
+    hash of its inputs and params plus its outputs. On the next run a stage
+    whose hash matches (and whose output files are untouched) is skipped,
+    make-style. A stage's hash covers the values it actually reads (and the
+    files they point to), so when an upstream stage re-runs and produces
+    something different, everything downstream runs again.
+    """
+    def __init__(self, stages: Optional[List[Stage]] = None, manifest_dir: Optional[str] = None):
+        self.stages: List[Stage] = []
+        self.manifest_dir = manifest_dir
+        self.producers: Dict[str, str] = {}
+        # name -> (start, end), seconds relative to the start of the last run
+        self.timings: Dict[str, tuple] = {}
+        # Stages of the last run whose outputs were reused (checkpoint or manifest)
+        self.skipped: List[str] = []
+        for stage in stages or []:
+            self.add(stage)
+
+    def add(self, stage: Stage) -> Stage:
+        if any(s.name == stage.name for s in self.stages):
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        for output in stage.outputs:
+            if output in self.producers:
+                raise ValueError(f"'{output}' is produced by both '{self.producers[output]}' and '{stage.name}'")
+            self.producers[output] = stage.name
+        self.stages.append(stage)
+        return stage
+
+    def validate(self, provided: Sequence[str] = ()):
+        """
+        Checks that every input is produced by a stage or provided up front,
+        and that the graph has no cycles.
+        """
+        available = set(provided)
+        for stage in self.stages:
+            for name in stage.inputs:
+                if name not in available and name not in self.producers:
+                    raise ValueError(f"Stage '{stage.name}' needs '{name}', which nothing produces")
+
+        remaining = list(self.stages)
+        while remaining:
+            ready = [s for s in remaining if all(i in available for i in s.inputs)]
+            if not ready:
+                raise ValueError(f"Cycle between stages: {[s.name for s in remaining]}")
+            for stage in ready:
+                available.update(stage.outputs)
+                remaining.remove(stage)
+
+    def _stage_key(self, stage: Stage, context: Dict[str, Any]) -> str:
+        """
+        Input hash of a stage: its params plus the fingerprint of every input value.
+        """
+        parts = {"stage": stage.name, "params": stage.params,
+                 "inputs": {name: _fingerprint(context.get(name)) for name in stage.inputs}}
+        return _hash_value(parts)
+
+    def _manifest_path(self, stage: Stage) -> str:
+        return os.path.join(self.manifest_dir, f"{stage.name}.json")
+
+    def _load_manifest(self, stage: Stage, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Outputs recorded for this exact input hash, if the files they point to are unchanged.
+        """
+        try:
+            with open(self._manifest_path(stage), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("key") != key:
+            return None
+        for path, stamp in manifest.get("files", {}).items():
+            if _file_stamp(path) != stamp:
+                return None
+        outputs = manifest.get("outputs", {})
+        if not all(name in outputs for name in stage.outputs):
+            return None
+        return outputs
+
+    def _save_manifest(self, stage: Stage, key: str, outputs: Dict[str, Any]):
+        files = {}
+        for value in outputs.values():
+            if isinstance(value, str) and os.path.isfile(value):
+                files[value] = _file_stamp(value)
+        manifest = {"stage": stage.name, "key": key, "params": stage.params,
+                    "outputs": outputs, "files": files, "created_at": time.time()}
+        try:
+            data = json.dumps(manifest, ensure_ascii=False)
+        except (TypeError, ValueError):
+            # Outputs that can't be recorded simply aren't memoized
+            return
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        path = self._manifest_path(stage)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def _run_stage(self, stage: Stage, context: Dict[str, Any], executor: Executor,
+                         process_executor: Optional[Executor], t0: float) -> Dict[str, Any]:
+        kwargs = {name: context[name] for name in stage.inputs}
+        start = time.perf_counter()
+        try:
+            span_name = f"stage:{stage.name}"
+            if stage.kind == STAGE_ASYNC:
+                with get_tracer().span(span_name, "stage"):
+                    result = await stage.func(**kwargs)
+            else:
+                pool = process_executor if stage.kind == STAGE_PROCESS and process_executor else executor
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(pool, _call_in_span, span_name, stage.func, kwargs)
+            return stage.unpack(result)
+        finally:
+            self.timings[stage.name] = (start - t0, time.perf_counter() - t0)
+
+    async def run(self,
+                  initial: Optional[Dict[str, Any]] = None,
+                  executor: Optional[Executor] = None,
+                  process_executor: Optional[Executor] = None,
+                  completed: Optional[Dict[str, Dict[str, Any]]] = None,
+                  on_stage_done: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Runs every stage and returns the context (initial values plus all outputs).
+        completed maps stage names to outputs of an earlier run; those stages are
+        skipped, which lets an interrupted run resume. on_stage_done(name, outputs)
+        is called on the event loop after each stage finishes.
+        The first failing stage cancels the ones still running and raises StageError.
+        """
+        context: Dict[str, Any] = dict(initial or {})
+        self.validate(context.keys())
+        self.timings = {}
+        self.skipped = []
+        keys: Dict[str, str] = {}
+
+        pending = list(self.stages)
+        for stage in list(pending):
+            outputs = (completed or {}).get(stage.name)
+            if outputs is not None and all(name in outputs for name in stage.outputs):
+                context.update({name: outputs[name] for name in stage.outputs})
+                self.skipped.append(stage.name)
+                pending.remove(stage)
+
+        def reuse_from_manifests():
+            # Stages become checkable once all their inputs exist; reuse cascades
+            # until the first stage that has to run
+            changed = True
+            while changed and self.manifest_dir:
+                changed = False
+                for stage in [s for s in pending if all(i in context for i in s.inputs)]:
+                    keys[stage.name] = self._stage_key(stage, context)
+                    outputs = self._load_manifest(stage, keys[stage.name])
+                    if outputs is not None:
+                        context.update({name: outputs[name] for name in stage.outputs})
+                        self.skipped.append(stage.name)
+                        pending.remove(stage)
+                        changed = True
+
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=max(1, len(self.stages)), thread_name_prefix="stage")
+
+        t0 = time.perf_counter()
+        running: Dict[asyncio.Task, Stage] = {}
+        try:
+            while pending or running:
+                reuse_from_manifests()
+                for stage in [s for s in pending if all(i in context for i in s.inputs)]:
+                    pending.remove(stage)
+                    task = asyncio.ensure_future(self._run_stage(stage, context, executor, process_executor, t0))
+                    running[task] = stage
+
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = running.pop(task)
+                    try:
+                        outputs = task.result()
+                    except Exception as e:
+                        raise StageError(stage.name, e) from e
+                    context.update(outputs)
+                    if self.manifest_dir:
+                        self._save_manifest(stage, keys[stage.name], outputs)
+                    if on_stage_done:
+                        on_stage_done(stage.name, outputs)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            if own_executor:
+                executor.shutdown(wait=False)
+        return context
+
+    def report(self) -> str:
+        """
+        Per-stage start/end times of the last run, in start order.
+        """
+        lines = []
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            lines.append(f"  {name:<16} {start:7.2f}s -> {end:7.2f}s  ({end - start:.2f}s)")
+        if self.skipped:
+            lines.append(f"  reused: {', '.join(self.skipped)}")
+        if self.timings:
+            total = max(end for _, end in self.timings.values())
+            busy = sum(end - start for start, end in self.timings.values())
+            lines.append(f"  total {total:.2f}s wall, {busy:.2f}s of stage time")
+        return "\n".join(lines)
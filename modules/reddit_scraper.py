@@ -1,16 +1,36 @@
+import asyncio
 import praw
 import time
 from config import Config
-from typing import List, Dict, Any
+from modules.reddit_transport import RedditJSONTransport
+from modules.story_catalog import StoryCatalog
+from modules.tracing import traced
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+def default_score(story: Dict[str, Any]) -> float:
+    """
+    Ranks candidates by engagement: upvotes plus weighted comment count.
+    Any callable taking a story dict and returning a number can replace it.
+    """
+    return story["score"] + 2 * story["num_comments"]
 
 class RedditScraper:
-    def __init__(self):
-        self.reddit = praw.Reddit(
-            client_id=Config.REDDIT_CLIENT_ID,
-            client_secret=Config.REDDIT_CLIENT_SECRET,
-            user_agent=Config.REDDIT_USER_AGENT
-        )
+    def __init__(self, transport: Optional[RedditJSONTransport] = None):
+        self.transport = transport
+        self._reddit = None
+
+    @property
+    def reddit(self) -> praw.Reddit:
+        # Created on first use, so the async JSON mode works without API credentials
+        if self._reddit is None:
+            self._reddit = praw.Reddit(
+                client_id=Config.REDDIT_CLIENT_ID,
+                client_secret=Config.REDDIT_CLIENT_SECRET,
+                user_agent=Config.REDDIT_USER_AGENT
+            )
+        return self._reddit
 
+    @traced()
     def fetch_stories(self, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Fetches top stories from configured subreddits.
@@ -39,20 +59,272 @@ class RedditScraper:
                 if not post.selftext and not post.title:
                     continue
                     
-                story_data = {
-                    "id": post.id,
-                    "title": post.title,
-                    "content": post.selftext,
-                    "url": post.url,
-                    "subreddit": subreddit_name,
-                    "author": str(post.author),
-                    "score": post.score,
-                    "num_comments": post.num_comments
-                }
-                stories.append(story_data)
+                stories.append(self._story_from_post(post, subreddit_name))
         
         return stories
 
+    def _story_from_json(self, post: Dict[str, Any], subreddit_name: str, apply_filters: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Applies the same filters as fetch_stories to a raw JSON post.
+        Returns the story dict, or None if the post is filtered out.
+        With apply_filters=False only stickied and empty posts are dropped
+        (used for the catalog, where scores are still growing).
+        """
+        if post.get("stickied"):
+            return None
+        if apply_filters and post.get("score", 0) < Config.MIN_UPVOTES:
+            return None
+        if not post.get("selftext") and not post.get("title"):
+            return None
+
+        return {
+            "id": post["id"],
+            "title": post.get("title", ""),
+            "content": post.get("selftext", ""),
+            "url": post.get("url", ""),
+            "subreddit": post.get("subreddit", subreddit_name),
+            "author": post.get("author") or "[deleted]",
+            "score": post.get("score", 0),
+            "num_comments": post.get("num_comments", 0),
+            "fullname": post.get("name") or f"t3_{post['id']}",
+            "created_utc": post.get("created_utc")
+        }
+
+    def _story_from_post(self, post, subreddit_name: str) -> Dict[str, Any]:
+        """
+        Converts a PRAW submission to a story dict (no filtering; callers
+        decide which posts to keep).
+        """
+        return {
+            "id": post.id,
+            "title": post.title,
+            "content": post.selftext,
+            "url": post.url,
+            "subreddit": subreddit_name,
+            "author": str(post.author),
+            "score": post.score,
+            "num_comments": post.num_comments,
+            "fullname": post.name,
+            "created_utc": post.created_utc
+        }
+
+    @traced()
+    def update_catalog(self, catalog: StoryCatalog, per_subreddit: int = 100) -> int:
+        """
+        Incrementally pulls posts into the catalog (PRAW).
+        Only posts newer than the last seen fullname per subreddit are requested;
+        the listings in Config.REDDIT_LISTINGS (hot, top of the day, ...) are
+        re-read to pick up popular posts and refresh scores of unprocessed stories.
+        Returns the number of new stories.
+        """
+        added = 0
+        for subreddit_name in Config.SUBREDDITS:
+            print(f"Updating catalog from r/{subreddit_name}...")
+            subreddit = self.reddit.subreddit(subreddit_name)
+            cursor = catalog.get_cursor(subreddit_name)
+
+            params = {"before": cursor} if cursor else {}
+            new_posts = list(subreddit.new(limit=per_subreddit, params=params))
+            if cursor and not new_posts:
+                # The cursor post may have been deleted, which makes `before` return nothing
+                new_posts = list(subreddit.new(limit=per_subreddit))
+            if new_posts:
+                catalog.set_cursor(subreddit_name, new_posts[0].name)
+
+            posts = list(new_posts)
+            for listing, time_filter in Config.REDDIT_LISTINGS:
+                kwargs = {"time_filter": time_filter} if time_filter else {}
+                posts += getattr(subreddit, listing)(limit=per_subreddit // 4, **kwargs)
+            added += catalog.add_stories(
+                self._story_from_post(post, subreddit_name)
+                for post in posts
+                if not post.stickied and not catalog.is_processed(post.id)
+            )
+        return added
+
+    @traced()
+    async def update_catalog_async(self, catalog: StoryCatalog, per_subreddit: int = 100) -> int:
+        """
+        Same as update_catalog, but through the JSON transport with all
+        subreddits and listings queried concurrently (the listings through
+        fetch_stories_async).
+        """
+        transport = self.transport or RedditJSONTransport()
+
+        async def fetch_new(subreddit_name: str):
+            cursor = catalog.get_cursor(subreddit_name)
+            try:
+                params = {"before": cursor} if cursor else None
+                new_posts = await transport.get_listing(subreddit_name, "new", limit=per_subreddit, params=params)
+                if cursor and not new_posts:
+                    new_posts = await transport.get_listing(subreddit_name, "new", limit=per_subreddit)
+            except Exception as e:
+                print(f"Error updating catalog from r/{subreddit_name}: {e}")
+                return subreddit_name, []
+            return subreddit_name, new_posts
+
+        try:
+            results, listed = await asyncio.gather(
+                asyncio.gather(*[fetch_new(name) for name in Config.SUBREDDITS]),
+                self.fetch_stories_async(limit=None, per_listing=per_subreddit // 4,
+                                         apply_filters=False, transport=transport)
+            )
+        finally:
+            if self.transport is None:
+                await transport.close()
+
+        added = 0
+        for subreddit_name, new_posts in results:
+            if new_posts:
+                catalog.set_cursor(subreddit_name, new_posts[0].get("name") or f"t3_{new_posts[0]['id']}")
+            stories = [self._story_from_json(post, subreddit_name, apply_filters=False)
+                       for post in new_posts
+                       if not catalog.is_processed(post["id"])]
+            added += catalog.add_stories(story for story in stories if story)
+        added += catalog.add_stories(story for story in listed if not catalog.is_processed(story["id"]))
+        return added
+
+    @traced()
+    async def fetch_stories_async(self,
+                                  limit: Optional[int] = 5,
+                                  listings: List[Tuple[str, Optional[str]]] = None,
+                                  score_fn: Callable[[Dict[str, Any]], float] = default_score,
+                                  per_listing: int = 25,
+                                  apply_filters: bool = True,
+                                  transport: Optional[RedditJSONTransport] = None) -> List[Dict[str, Any]]:
+        """
+        Queries every configured subreddit and listing (e.g. hot, top/day) concurrently,
+        merges the candidates and returns the best `limit` stories by score_fn
+        (all of them if limit is None). A transport passed in is left open.
+        """
+        listings = listings or Config.REDDIT_LISTINGS
+        owns_transport = transport is None and self.transport is None
+        transport = transport or self.transport or RedditJSONTransport()
+
+        async def fetch(subreddit_name: str, listing: str, time_filter: Optional[str]):
+            try:
+                posts = await transport.get_listing(subreddit_name, listing, time_filter, limit=per_listing)
+            except Exception as e:
+                print(f"Error fetching r/{subreddit_name}/{listing}: {e}")
+                return subreddit_name, []
+            return subreddit_name, posts
+
+        try:
+            print(f"Scraping {len(Config.SUBREDDITS)} subreddits x {len(listings)} listings...")
+            results = await asyncio.gather(*[
+                fetch(subreddit_name, listing, time_filter)
+                for subreddit_name in Config.SUBREDDITS
+                for listing, time_filter in listings
+            ])
+        finally:
+            if owns_transport:
+                await transport.close()
+
+        # The same post often shows up in several listings
+        candidates = {}
+        for subreddit_name, posts in results:
+            for post in posts:
+                story = self._story_from_json(post, subreddit_name, apply_filters)
+                if story and story["id"] not in candidates:
+                    candidates[story["id"]] = story
+
+        ranked = sorted(candidates.values(), key=score_fn, reverse=True)
+        return ranked if limit is None else ranked[:limit]
+
+    def _comment_from_json(self, comment: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Compact form of a comment; None for removed, deleted, stickied or overly long ones.
+        """
+        body = comment.get("body") or ""
+        if comment.get("stickied") or body in ("[removed]", "[deleted]") or not body.strip():
+            return None
+        if len(body) > Config.COMMENT_MAX_CHARS:
+            return None
+        return {
+            "id": comment["id"],
+            "author": comment.get("author") or "[deleted]",
+            "body": body,
+            "score": comment.get("score", 0)
+        }
+
+    def _fetch_comments_praw(self, post_id: str, limit: int) -> List[Dict[str, Any]]:
+        submission = self.reddit.submission(id=post_id)
+        submission.comment_sort = "top"
+        submission.comment_limit = limit * 2
+        submission.comments.replace_more(limit=0)
+        comments = []
+        # Top-level comments only; replies rarely stand on their own in a video
+        for comment in submission.comments:
+            compact = self._comment_from_json({
+                "id": comment.id,
+                "author": str(comment.author) if comment.author else None,
+                "body": comment.body,
+                "score": comment.score,
+                "stickied": comment.stickied
+            })
+            if compact:
+                comments.append(compact)
+            if len(comments) >= limit:
+                break
+        return comments
+
+    @traced()
+    async def fetch_comments_batch(self,
+                                   post_ids: List[str],
+                                   limit: int = Config.COMMENTS_PER_POST,
+                                   catalog: Optional[StoryCatalog] = None,
+                                   max_concurrency: int = Config.COMMENT_FETCH_CONCURRENCY) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Fetches top comments for many posts at once (at most max_concurrency in flight).
+        Comment trees cached in the catalog within Config.COMMENT_CACHE_TTL are reused.
+        Returns {post_id: [{"id", "author", "body", "score"}, ...]}.
+        """
+        results = {}
+        missing = []
+        for post_id in post_ids:
+            cached = catalog.get_comments(post_id) if catalog else None
+            if cached is not None:
+                results[post_id] = cached[:limit]
+            else:
+                missing.append(post_id)
+
+        if missing:
+            semaphore = asyncio.Semaphore(max_concurrency)
+            use_json = Config.REDDIT_FETCH_MODE == "async" or self.transport is not None
+            transport = (self.transport or RedditJSONTransport()) if use_json else None
+
+            async def fetch(post_id: str):
+                async with semaphore:
+                    try:
+                        if transport:
+                            raw = await transport.get_comments(post_id, limit=limit * 2)
+                            comments = [c for c in map(self._comment_from_json, raw) if c][:limit]
+                        else:
+                            # PRAW is blocking, so it runs on the default thread pool
+                            loop = asyncio.get_running_loop()
+                            comments = await loop.run_in_executor(None, self._fetch_comments_praw, post_id, limit)
+                    except Exception as e:
+                        print(f"Error fetching comments for {post_id}: {e}")
+                        return post_id, None
+                return post_id, comments
+
+            try:
+                fetched = await asyncio.gather(*[fetch(post_id) for post_id in missing])
+            finally:
+                if transport is not None and self.transport is None:
+                    await transport.close()
+
+            for post_id, comments in fetched:
+                if comments is None:
+                    results[post_id] = []
+                    continue
+                if catalog:
+                    catalog.put_comments(post_id, comments)
+                results[post_id] = comments
+
+        return {post_id: results[post_id] for post_id in post_ids}
+
+    @traced()
     def get_post_comments(self, post_id: str, limit: int = 3) -> List[str]:
         """
         Fetches top comments for a post.
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import random
+import time
+from typing import List, Dict, Any, Optional
+
+import aiohttp
+
+from config import Config
+from modules.tracing import get_tracer
+
+
+class RedditJSONTransport:
+    """
+    Async client for Reddit's JSON listing endpoints (/r/<sub>/<listing>.json).
+    base_url can point at any compatible server, e.g. a local fake in tests.
+    Requests share one pooled session and back off on rate limits.
+    """
+    def __init__(self,
+                 base_url: str = Config.REDDIT_JSON_BASE_URL,
+                 user_agent: str = Config.REDDIT_USER_AGENT,
+                 max_connections: int = Config.REDDIT_MAX_CONNECTIONS,
+                 max_retries: int = 4,
+                 session: Optional[aiohttp.ClientSession] = None):
+        self.base_url = base_url.rstrip("/")
+        self.user_agent = user_agent
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self._session = session
+        self._owns_session = session is None
+        # Earliest time the next request may go out (shared rate-limit window)
+        self._not_before = 0.0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                headers={"User-Agent": self.user_agent},
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+
+    def _note_rate_limit(self, headers) -> Optional[float]:
+        """
+        Reads Reddit's rate-limit headers. If the window is used up, delays
+        every following request until it resets. Returns the suggested wait.
+        """
+        retry_after = headers.get("Retry-After")
+        remaining = headers.get("X-Ratelimit-Remaining")
+        reset = headers.get("X-Ratelimit-Reset")
+
+        wait = None
+        if retry_after:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                pass
+        elif remaining is not None and reset is not None:
+            try:
+                if float(remaining) < 1:
+                    wait = float(reset)
+            except ValueError:
+                pass
+
+        if wait:
+            self._not_before = max(self._not_before, time.monotonic() + wait)
+        return wait
+
+    async def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GETs a JSON document, retrying 429/5xx responses and connection errors
+        with exponential backoff (or the server's Retry-After).
+        """
+        session = self._get_session()
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            delay = self._not_before - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            backoff = min(30.0, 0.5 * (2 ** attempt)) + random.uniform(0, 0.25)
+            try:
+                async with session.get(url, params=params) as response:
+                    wait = self._note_rate_limit(response.headers)
+                    if response.status == 429 or response.status >= 500:
+                        if attempt == self.max_retries:
+                            response.raise_for_status()
+                        await asyncio.sleep(wait or backoff)
+                        continue
+                    response.raise_for_status()
+                    body = await response.read()
+                    get_tracer().count(bytes=len(body))
+                    return json.loads(body)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(backoff)
+        raise RuntimeError(f"Giving up on {url}")
+
+    async def get_listing(self,
+                          subreddit: str,
+                          listing: str = "hot",
+                          time_filter: Optional[str] = None,
+                          limit: int = 25,
+                          params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the raw post dicts (children[].data) of one listing.
+        """
+        query = {"limit": limit, "raw_json": 1}
+        if time_filter:
+            query["t"] = time_filter
+        if params:
+            query.update(params)
+        data = await self.get_json(f"/r/{subreddit}/{listing}.json", query)
+        return [child["data"] for child in data.get("data", {}).get("children", []) if child.get("kind") == "t3"]
+
+    async def get_comments(self, post_id: str, limit: int = 10, sort: str = "top") -> List[Dict[str, Any]]:
+        """
+        Returns the raw top-level comment dicts of a post (no "load more" stubs).
+        """
+        data = await self.get_json(f"/comments/{post_id}.json",
+                                   {"limit": limit, "sort": sort, "depth": 1, "raw_json": 1})
+        if not isinstance(data, list) or len(data) < 2:
+            return []
+        return [child["data"] for child in data[1].get("data", {}).get("children", []) if child.get("kind") == "t1"]
@@ -1,56 +1,135 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from typing import List
-import time
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import os
 
+from config import Config
+from modules.browser_pool import BrowserPool, get_shared_pool
+from modules.tracing import traced
+
+# (url, output_path, element_selector)
+CaptureJob = Tuple[str, str, Optional[str]]
+
 class ScreenshotManager:
-    def __init__(self):
-        self.options = Options()
-        self.options.add_argument("--headless")
-        self.options.add_argument("--window-size=1920,1080")
-        self.options.add_argument("--disable-gpu")
-        self.options.add_argument("--no-sandbox")
-        # Ensure dark mode if possible (Reddit might default to light, we can inject CSS)
-        
-        self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=self.options)
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        # Browsers come from a long-lived pool and stay warm between captures
+        self.pool = pool or get_shared_pool()
+        self.timeout = Config.SCREENSHOT_TIMEOUT
 
-    def capture_screenshot(self, url: str, output_path: str, element_selector: str = None) -> bool:
+    @traced()
+    def _wait_for_page(self, driver, element_selector: str = None):
+        """
+        Waits for the target element (or the whole document) instead of sleeping.
+        """
+        wait = WebDriverWait(driver, self.timeout)
+        if element_selector:
+            wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, element_selector)))
+        else:
+            wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+
+    def _navigate(self, driver, url: str):
+        """
+        Loads url in a reused browser. get() returns at once
+        (page_load_strategy="none"), so first wait for the previous document
+        to go stale; otherwise the wait below could match the selector (or
+        readyState) of the page left over from the last capture.
+        """
+        old_page = driver.find_element(By.TAG_NAME, "html")
+        driver.get(url)
+        WebDriverWait(driver, self.timeout).until(EC.staleness_of(old_page))
+
+    def _capture_current(self, driver, output_path: str, element_selector: str = None) -> bool:
         try:
-            self.driver.get(url)
-            time.sleep(3) # Wait for load. reliable enough for a script.
+            self._wait_for_page(driver, element_selector)
 
             # Inject CSS for Dark Mode / Clean look
             dark_mode_script = """
             document.documentElement.classList.add('theme-dark');
             document.body.style.background = '#1A1A1B';
             """
-            self.driver.execute_script(dark_mode_script)
-            time.sleep(1)
-
-            # Accept cookies if modal exists (simple try)
-            try:
-                # This selector is a guess, finding by text usually works better but varies
-                pass 
-            except:
-                pass
+            driver.execute_script(dark_mode_script)
 
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
             if element_selector:
-                element = self.driver.find_element(By.CSS_SELECTOR, element_selector)
+                element = driver.find_element(By.CSS_SELECTOR, element_selector)
                 element.screenshot(output_path)
             else:
-                self.driver.save_screenshot(output_path)
-            
+                driver.save_screenshot(output_path)
+
             return True
         except Exception as e:
             print(f"Error taking screenshot: {e}")
             return False
 
+    @traced()
+    def capture_screenshot(self, url: str, output_path: str, element_selector: str = None) -> bool:
+        try:
+            with self.pool.session() as driver:
+                self._navigate(driver, url)
+                return self._capture_current(driver, output_path, element_selector)
+        except Exception as e:
+            print(f"Error taking screenshot: {e}")
+            return False
+
+    def _capture_in_tabs(self, jobs: List[CaptureJob]) -> List[bool]:
+        """
+        Opens every job in its own tab of one browser so the pages load
+        concurrently, then captures them one by one.
+        """
+        with self.pool.session() as driver:
+            home = driver.window_handles[0]
+            tabs = []
+            for url, _, _ in jobs:
+                driver.switch_to.new_window('tab')
+                driver.get(url)  # Returns immediately (page_load_strategy="none")
+                tabs.append(driver.current_window_handle)
+
+            results = []
+            for handle, (_, output_path, selector) in zip(tabs, jobs):
+                driver.switch_to.window(handle)
+                results.append(self._capture_current(driver, output_path, selector))
+                driver.close()
+            driver.switch_to.window(home)
+            return results
+
+    @traced()
+    def capture_many(self, jobs: List[CaptureJob]) -> List[bool]:
+        """
+        Captures many elements at once.
+        Jobs are spread across the pool's browsers, each loading its share in
+        parallel tabs. Results are returned in job order.
+        """
+        if not jobs:
+            return []
+
+        workers = max(1, min(self.pool.size, len(jobs)))
+        groups = [jobs[i::workers] for i in range(workers)]
+
+        def run_group(group: List[CaptureJob]) -> List[bool]:
+            try:
+                return self._capture_in_tabs(group)
+            except Exception as e:
+                print(f"Error taking screenshots: {e}")
+                return [False] * len(group)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            group_results = list(executor.map(run_group, groups))
+
+        # Undo the round-robin split
+        results = [False] * len(jobs)
+        for i, group_result in enumerate(group_results):
+            for j, ok in enumerate(group_result):
+                results[i + j * workers] = ok
+        return results
+
     def close(self):
-        self.driver.quit()
+        """
+        Kept for compatibility. Browsers belong to the pool and stay warm;
+        call pool.close() to shut them down.
+        """
+        pass
 
     def capture_post_title(self, url: str, post_id: str) -> str:
         """
@@ -59,21 +138,29 @@ class ScreenshotManager:
         """
         # Reddit's structure changes, but shreddit-post is common in new UI
         # or div[data-test-id="post-content"]
-        
+
         # We'll use a specific customized view if possible, or just the post container
         # For now, let's target the post container in the new Reddit UI
-        selector = "shreddit-post" 
-        
+        selector = "shreddit-post"
+
         output_file = os.path.join("assets", "temp", f"{post_id}_title.png")
         if self.capture_screenshot(url, output_file, selector):
              return output_file
         return ""
 
     def capture_comment(self, url: str, comment_id: str) -> str:
-        # Construct permalink to comment? 
+        # Construct permalink to comment?
         # Or find by id on the page
-        selector = f"#t1_{comment_id}" # Reddit usually uses thing_id 
+        selector = f"#t1_{comment_id}" # Reddit usually uses thing_id
         output_file = os.path.join("assets", "temp", f"{comment_id}.png")
         if self.capture_screenshot(url, output_file, selector):
             return output_file
         return ""
+
+    def capture_comments(self, url: str, comment_ids: List[str]) -> List[str]:
+        """
+        Batch version of capture_comment. Returns one path per comment ("" on failure).
+        """
+        jobs = [(url, os.path.join("assets", "temp", f"{cid}.png"), f"#t1_{cid}") for cid in comment_ids]
+        results = self.capture_many(jobs)
+        return [job[1] if ok else "" for job, ok in zip(jobs, results)]
@@ -0,0 +1,216 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stories (
+    id TEXT PRIMARY KEY,
+    fullname TEXT,
+    subreddit TEXT NOT NULL,
+    title TEXT,
+    content TEXT,
+    url TEXT,
+    author TEXT,
+    score INTEGER NOT NULL DEFAULT 0,
+    num_comments INTEGER NOT NULL DEFAULT 0,
+    created_utc REAL,
+    status TEXT NOT NULL DEFAULT 'new',
+    fetched_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_stories_status_score ON stories (status, score DESC);
+CREATE INDEX IF NOT EXISTS idx_stories_subreddit_created ON stories (subreddit, created_utc);
+CREATE TABLE IF NOT EXISTS comments (
+    post_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    subreddit TEXT PRIMARY KEY,
+    last_fullname TEXT,
+    updated_at REAL
+);
+"""
+
+STORY_FIELDS = ("id", "fullname", "subreddit", "title", "content", "url", "author",
+                "score", "num_comments", "created_utc", "status")
+
+# Story lifecycle
+STATUS_NEW = "new"
+STATUS_SELECTED = "selected"
+STATUS_RENDERED = "rendered"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class StoryCatalog:
+    """
+    Local SQLite catalog of every post seen, indexed by id, subreddit,
+    score and status. Keeps the newest fullname per subreddit so listings
+    can be fetched incrementally, and an in-memory id set for fast
+    "already processed?" checks.
+    """
+    def __init__(self, db_path: str = Config.CATALOG_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+        rows = self._conn.execute("SELECT id, status FROM stories").fetchall()
+        self._known = {row["id"] for row in rows}
+        self._processed = {row["id"] for row in rows if row["status"] != STATUS_NEW}
+
+    def close(self):
+        self._conn.close()
+
+    def is_known(self, post_id: str) -> bool:
+        return post_id in self._known
+
+    def is_processed(self, post_id: str) -> bool:
+        """
+        True once a story has left the 'new' state (selected, rendered, failed, skipped).
+        """
+        return post_id in self._processed
+
+    def add_stories(self, stories: Iterable[Dict[str, Any]]) -> int:
+        """
+        Inserts new stories and refreshes score / comment counts of known ones.
+        Already processed stories are skipped. Returns the number of new stories.
+        """
+        now = time.time()
+        added = 0
+        with self._lock, self._conn:
+            for story in stories:
+                if story["id"] in self._processed:
+                    continue
+                if story["id"] not in self._known:
+                    added += 1
+                self._conn.execute(
+                    """
+                    INSERT INTO stories (id, fullname, subreddit, title, content, url, author,
+                                         score, num_comments, created_utc, status, fetched_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        score = excluded.score,
+                        num_comments = excluded.num_comments,
+                        updated_at = excluded.updated_at
+                    """,
+                    (story["id"], story.get("fullname") or f"t3_{story['id']}", story["subreddit"],
+                     story.get("title"), story.get("content"), story.get("url"), story.get("author"),
+                     story.get("score", 0), story.get("num_comments", 0), story.get("created_utc"),
+                     STATUS_NEW, now, now)
+                )
+                self._known.add(story["id"])
+        return added
+
+    def get_cursor(self, subreddit: str) -> Optional[str]:
+        row = self._conn.execute("SELECT last_fullname FROM cursors WHERE subreddit = ?", (subreddit,)).fetchone()
+        return row["last_fullname"] if row else None
+
+    def set_cursor(self, subreddit: str, fullname: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO cursors (subreddit, last_fullname, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(subreddit) DO UPDATE SET last_fullname = excluded.last_fullname,
+                                                     updated_at = excluded.updated_at
+                """,
+                (subreddit, fullname, time.time())
+            )
+
+    def get_comments(self, post_id: str, max_age: float = Config.COMMENT_CACHE_TTL) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns cached comments for a post if they are younger than max_age seconds.
+        """
+        row = self._conn.execute("SELECT payload, fetched_at FROM comments WHERE post_id = ?", (post_id,)).fetchone()
+        if not row or time.time() - row["fetched_at"] > max_age:
+            return None
+        return json.loads(row["payload"])
+
+    def put_comments(self, post_id: str, comments: List[Dict[str, Any]]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO comments (post_id, payload, fetched_at) VALUES (?, ?, ?)
+                ON CONFLICT(post_id) DO UPDATE SET payload = excluded.payload, fetched_at = excluded.fetched_at
+                """,
+                (post_id, json.dumps(comments, ensure_ascii=False, separators=(",", ":")), time.time())
+            )
+
+    def _to_story(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {field: row[field] for field in STORY_FIELDS}
+
+    def get_story(self, post_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT * FROM stories WHERE id = ?", (post_id,)).fetchone()
+        return self._to_story(row) if row else None
+
+    def iter_stories(self, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yields every catalogued story in batches, e.g. for corpus statistics.
+        """
+        cursor = self._conn.execute("SELECT * FROM stories ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [self._to_story(row) for row in rows]
+
+    def candidates(self, limit: int = 1, min_score: int = Config.MIN_UPVOTES,
+                   subreddits: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Best unprocessed stories by score, in one indexed query.
+        """
+        query = "SELECT * FROM stories WHERE status = ? AND score >= ?"
+        params: list = [STATUS_NEW, min_score]
+        if subreddits:
+            query += f" AND subreddit IN ({','.join('?' * len(subreddits))})"
+            params += subreddits
+        query += " ORDER BY score DESC LIMIT ?"
+        params.append(limit)
+        return [self._to_story(row) for row in self._conn.execute(query, params)]
+
+    def claim_next(self, min_score: int = Config.MIN_UPVOTES,
+                   subreddits: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Picks the best unprocessed story and marks it 'selected',
+        so concurrent runs never pick the same post. The claim is a
+        conditional UPDATE on status, so if another process takes the
+        story first the update matches no row and the next one is tried.
+        """
+        with self._lock:
+            while True:
+                found = self.candidates(1, min_score, subreddits)
+                if not found:
+                    return None
+                story = found[0]
+                with self._conn:
+                    claimed = self._conn.execute(
+                        "UPDATE stories SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                        (STATUS_SELECTED, time.time(), story["id"], STATUS_NEW)).rowcount
+                self._processed.add(story["id"])
+                if claimed:
+                    break
+        story["status"] = STATUS_SELECTED
+        return story
+
+    def mark_status(self, post_id: str, status: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE stories SET status = ?, updated_at = ? WHERE id = ?",
+                               (status, time.time(), post_id))
+            if status == STATUS_NEW:
+                self._processed.discard(post_id)
+            else:
+                self._processed.add(post_id)
+
+    def count(self, status: Optional[str] = None) -> int:
+        if status:
+            return self._conn.execute("SELECT COUNT(*) FROM stories WHERE status = ?", (status,)).fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM stories").fetchone()[0]
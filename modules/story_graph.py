@@ -0,0 +1,228 @@
+import asyncio
+import functools
+import os
+from typing import Dict, Any, List, Optional, Sequence
+
+from config import Config
+from modules.pipeline import Stage, StageGraph, STAGE_ASYNC, STAGE_THREAD, STAGE_PROCESS, source_hash
+
+# Catalog bookkeeping that doesn't change what gets rendered
+VOLATILE_STORY_FIELDS = ("status",)
+
+
+def story_input(story: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The 'story' graph input, without fields that would needlessly invalidate stage manifests.
+    """
+    return {key: value for key, value in story.items() if key not in VOLATILE_STORY_FIELDS}
+
+
+def variant_path(output_path: str, name: str) -> str:
+    """
+    Where a fan-out format of output_path is written: <output>_<name>.mp4.
+    """
+    base, ext = os.path.splitext(output_path)
+    return f"{base}_{name}{ext}"
+
+
+def render_story_video(output_path: str, background_video: str, title_audio: str, title_timings,
+                       title_image: Optional[str], content_audio: str, content_timings, content_overlays,
+                       mixed_audio: Optional[str] = None, title_duration: Optional[float] = None,
+                       total_duration: Optional[float] = None, preview: bool = False,
+                       variants: Sequence[str] = (), assembler=None) -> str:
+    """
+    Assembles the final video from the outputs of the other stages, or with
+    preview=True a draft plus a contact sheet (<output>_sheet.jpg).
+    variants: names from Config.VARIANT_FORMATS rendered in the same pass
+    (see VideoAssembler.assemble_variants), written next to the output.
+    Module level (and picklable) so it can run in a render process.
+    """
+    if assembler is None:
+        from modules.video_editor import VideoAssembler
+        assembler = VideoAssembler()
+    files_map = {
+        'title_audio': title_audio,
+        'title_timings': title_timings,
+        'title_screenshot': title_image or None,
+        'content_audio': content_audio,
+        # Comment cards already show the text, so no word captions on top of them
+        'content_timings': [] if content_overlays else content_timings,
+        'content_overlays': content_overlays,
+        'mixed_audio': mixed_audio,
+        'title_duration': title_duration,
+        'total_duration': total_duration
+    }
+    if preview:
+        assembler.render_preview(background_video, files_map, output_path,
+                                 contact_sheet=os.path.splitext(output_path)[0] + "_sheet.jpg")
+    elif variants:
+        targets = [{'name': 'main', 'width': assembler.width, 'height': assembler.height, 'output': output_path}]
+        for name in variants:
+            width, height, crf = Config.VARIANT_FORMATS[name]
+            targets.append({'name': name, 'width': width, 'height': height, 'crf': crf,
+                            'output': variant_path(output_path, name)})
+        assembler.assemble_variants(background_video, files_map, targets)
+    else:
+        assembler.assemble_video(background_video, files_map, output_path)
+    return output_path
+
+
+def build_story_graph(work_dir: str,
+                      output_path: Optional[str] = None,
+                      scraper=None,
+                      catalog=None,
+                      tts=None,
+                      visuals=None,
+                      assembler=None,
+                      preview: bool = False) -> StageGraph:
+    """
+    Per-story pipeline: story -> {title card, title TTS, content TTS, background} -> audio mix -> render.
+    Every intermediate file is written into work_dir, with stage manifests in
+    work_dir/manifests, so re-running a story only rebuilds stages whose inputs
+    or settings changed. The graph expects a 'story' dict as its initial input
+    (see story_input) and produces 'video' (the output path).
+    With preview=True the render stage makes a draft (see VideoAssembler.render_preview).
+    Collaborators are created on demand if not passed in.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    output_path = output_path or os.path.join(work_dir, "final_video.mp4")
+
+    if tts is None:
+        from modules.tts_engine import TTSEngine
+        tts = TTSEngine()
+    if visuals is None:
+        from modules.visual_manager import VisualManager
+        visuals = VisualManager()
+
+    def path(name: str) -> str:
+        return os.path.join(work_dir, name)
+
+    def title_card(story: Dict[str, Any]) -> Optional[str]:
+        # Drawn offline with Pillow, or screenshotted from Reddit
+        if Config.TITLE_CARD_SOURCE == "screenshot":
+            from modules.screenshot_manager import ScreenshotManager
+            ss_manager = ScreenshotManager()
+            screenshot_path = ss_manager.capture_post_title(story['url'], story['id'])
+            ss_manager.close()
+        else:
+            from modules.card_renderer import CardRenderer
+            screenshot_path = CardRenderer().render_title_card(story, path("title.png"))
+        if not screenshot_path:
+            print("Failed to capture screenshot.")
+        return screenshot_path
+
+    async def title_tts(story: Dict[str, Any]):
+        title_audio_path = path("title.mp3")
+        title_timings = await tts.generate_audio(story['title'], title_audio_path)
+        tts.save_timings(title_timings, path("title_timings.wtl"))
+        return title_audio_path, title_timings
+
+    async def content_tts(story: Dict[str, Any]):
+        # Full length, synthesized in concurrent chunks
+        content_audio_path = path("content.mp3")
+        content_timings = await tts.generate_audio_long(story['content'], content_audio_path)
+        tts.save_timings(content_timings, path("content_timings.wtl"))
+        return content_audio_path, content_timings, []
+
+    async def fetch_comments(story: Dict[str, Any]) -> List[Dict[str, Any]]:
+        nonlocal scraper
+        if scraper is None:
+            from modules.reddit_scraper import RedditScraper
+            scraper = RedditScraper()
+        comments = (await scraper.fetch_comments_batch([story['id']], catalog=catalog))[story['id']]
+        if not comments:
+            raise RuntimeError("No usable comments found.")
+        return comments
+
+    async def comment_tts(comments: List[Dict[str, Any]]):
+        from modules.card_renderer import CardRenderer
+        renderer = CardRenderer()
+        content_audio_path = path("content.mp3")
+        card_paths = [path(f"{c['id']}_comment.png") for c in comments]
+
+        # TTS runs on the event loop while cards are drawn on worker threads
+        (content_timings, bounds), *_ = await asyncio.gather(
+            tts.generate_segments([c['body'] for c in comments], content_audio_path),
+            *[asyncio.to_thread(renderer.render_comment_card, c, card) for c, card in zip(comments, card_paths)]
+        )
+        tts.save_timings(content_timings, path("content_timings.wtl"))
+        content_overlays = [
+            {'image': card, 'start': start, 'end': end}
+            for card, (start, end) in zip(card_paths, bounds) if end > start
+        ]
+        return content_audio_path, content_timings, content_overlays
+
+    def background(story: Dict[str, Any]) -> str:
+        # Use content text to find relevant bg
+        background_video_path = visuals.get_background_video(story['content'] or story['title'])
+        if not background_video_path or not os.path.exists(background_video_path):
+            raise RuntimeError("No background video found (check assets/backgrounds/ or Pexels key).")
+        return background_video_path
+
+    def mix_audio(title_audio: str, title_timings, content_audio: str, content_timings):
+        from modules.audio_mixer import AudioMixer
+        return AudioMixer().mix(title_audio, content_audio, path("mix.m4a"),
+                                title_timings=title_timings, content_timings=content_timings)
+
+    tts_params = {
+        "voice": tts.voice,
+        "engine": getattr(tts.backend, "version", type(tts.backend).__name__),
+        "chunk_chars": Config.TTS_CHUNK_CHARS,
+    }
+    card_params = {
+        "source": Config.TITLE_CARD_SOURCE,
+        "width": Config.CARD_WIDTH,
+        "fonts": [Config.CARD_FONT, Config.CARD_FONT_BOLD],
+        "template": source_hash("modules.card_renderer"),
+    }
+    render_params = {
+        "output": output_path,
+        "size": [Config.VIDEO_WIDTH, Config.VIDEO_HEIGHT],
+        "engine": Config.RENDER_ENGINE,
+        "caption_font": Config.CAPTION_FONT,
+        "phrase_max_chars": Config.CAPTION_PHRASE_MAX_CHARS,
+        "encoder": [Config.FFMPEG_PRESET, Config.FFMPEG_CRF],
+        "preview": [Config.PREVIEW_SCALE, Config.PREVIEW_FPS, Config.PREVIEW_CRF] if preview else False,
+        "variants": [] if preview else [[name, Config.VARIANT_FORMATS[name]] for name in Config.OUTPUT_VARIANTS],
+        "template": source_hash("modules.video_editor", "modules.caption_layer",
+                                "modules.caption_renderer", "modules.ffmpeg_renderer"),
+    }
+
+    mix_params = {
+        "sample_rate": Config.AUDIO_SAMPLE_RATE,
+        "target_dbfs": Config.AUDIO_TARGET_DBFS,
+        "gap": Config.AUDIO_TITLE_GAP,
+        "music": Config.BACKGROUND_MUSIC,
+        "ducking": [Config.MUSIC_VOLUME_DB, Config.MUSIC_DUCK_DB, Config.MUSIC_DUCK_ATTACK, Config.MUSIC_DUCK_RELEASE],
+        "template": source_hash("modules.audio_mixer"),
+    }
+
+    content_outputs = ("content_audio", "content_timings", "content_overlays")
+    mix_outputs = ("mixed_audio", "title_duration", "total_duration")
+    graph = StageGraph([
+        Stage("title_card", title_card, inputs=("story",), outputs=("title_image",), kind=STAGE_THREAD,
+              params=card_params),
+        Stage("title_tts", title_tts, inputs=("story",), outputs=("title_audio", "title_timings"), kind=STAGE_ASYNC,
+              params=tts_params),
+        Stage("background", background, inputs=("story",), outputs=("background_video",), kind=STAGE_THREAD),
+    ], manifest_dir=path("manifests"))
+    if Config.VIDEO_MODE == "comments":
+        graph.add(Stage("comments", fetch_comments, inputs=("story",), outputs=("comments",), kind=STAGE_ASYNC,
+                        params={"count": Config.COMMENTS_PER_POST, "max_chars": Config.COMMENT_MAX_CHARS}))
+        graph.add(Stage("content_tts", comment_tts, inputs=("comments",), outputs=content_outputs, kind=STAGE_ASYNC,
+                        params=dict(tts_params, template=card_params["template"])))
+    else:
+        graph.add(Stage("content_tts", content_tts, inputs=("story",), outputs=content_outputs, kind=STAGE_ASYNC,
+                        params=tts_params))
+    graph.add(Stage("mix_audio", mix_audio,
+                    inputs=("title_audio", "title_timings", "content_audio", "content_timings"),
+                    outputs=mix_outputs, kind=STAGE_THREAD, params=mix_params))
+    # Without an injected assembler the render can run in a separate process
+    render = functools.partial(render_story_video, output_path, preview=preview,
+                               variants=() if preview else tuple(Config.OUTPUT_VARIANTS), assembler=assembler)
+    graph.add(Stage("render", render,
+                    inputs=("background_video", "title_audio", "title_timings", "title_image") + content_outputs
+                    + mix_outputs,
+                    outputs=("video",), kind=STAGE_PROCESS if assembler is None else STAGE_THREAD,
+                    params=render_params))
+    return graph
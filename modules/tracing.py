@@ -0,0 +1,277 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import glob
+import inspect
+import io
+import json
+import multiprocessing
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from config import Config
+
+# Spans currently open in this task / thread, innermost last
+_active_spans: contextvars.ContextVar = contextvars.ContextVar("active_spans", default=())
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process so far, in MB (None where unsupported).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Span:
+    """
+    One timed operation. Counters (bytes, frames) added while the span is
+    open are also added to the spans enclosing it.
+    """
+    __slots__ = ("name", "category", "args", "start", "end", "cpu", "peak_rss_mb",
+                 "counters", "pid", "tid", "_cpu_start")
+
+    def __init__(self, name: str, category: str, args: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+        self.end = 0.0
+        self.cpu = 0.0
+        self.peak_rss_mb: Optional[float] = None
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self._cpu_start = 0.0
+
+    @property
+    def wall(self) -> float:
+        return self.end - self.start
+
+    def add(self, **counters: float):
+        for key, value in counters.items():
+            self.counters[key] += value
+
+    def to_event(self) -> Dict[str, Any]:
+        """
+        Chrome trace "complete" event (timestamps in microseconds).
+        """
+        args = dict(self.args)
+        args.update(self.counters)
+        args["cpu_s"] = round(self.cpu, 4)
+        if self.peak_rss_mb is not None:
+            args["peak_rss_mb"] = round(self.peak_rss_mb, 1)
+        if self.counters.get("frames") and self.wall > 0:
+            args["fps"] = round(self.counters["frames"] / self.wall, 2)
+        return {
+            "name": self.name, "cat": self.category or "default", "ph": "X",
+            "ts": round(self.start * 1e6), "dur": round(self.wall * 1e6),
+            "pid": self.pid, "tid": self.tid, "args": args,
+        }
+
+
+class Tracer:
+    """
+    Collects spans with wall time, CPU time (of the thread running the span),
+    peak RSS, bytes transferred and frames encoded. Spans export to Chrome
+    trace JSON (chrome://tracing, Perfetto) and to an aggregated summary.
+    If a span's name matches profile_stage it also runs under cProfile.
+    """
+    def __init__(self, enabled: bool = Config.TRACE_ENABLED,
+                 trace_dir: str = Config.TRACE_DIR,
+                 profile_stage: Optional[str] = Config.PROFILE_STAGE):
+        self.enabled = enabled
+        self.trace_dir = trace_dir
+        self.profile_stage = profile_stage
+        self.pid = os.getpid()
+        # Partial files are named after the run (the parent process, when this
+        # is a worker), so tracers of unrelated runs sharing trace_dir never
+        # collect each other's partials
+        parent = multiprocessing.parent_process()
+        self.run_id = parent.pid if parent else self.pid
+        self.spans: List[Span] = []
+        # Events collected from worker processes
+        self._partials: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # perf_counter is precise but per process; anchor it to the wall clock
+        # so spans recorded in render processes line up with the parent's
+        self._epoch = time.time() - time.perf_counter()
+
+    def now(self) -> float:
+        return self._epoch + time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "", **args):
+        if not self.enabled:
+            yield Span(name, category, args)
+            return
+
+        span = Span(name, category, args)
+        profiler = cProfile.Profile() if self.profile_stage and name == self.profile_stage else None
+        token = _active_spans.set(_active_spans.get() + (span,))
+        span._cpu_start = time.thread_time()
+        span.start = self.now()
+        if profiler:
+            profiler.enable()
+        try:
+            yield span
+        finally:
+            if profiler:
+                profiler.disable()
+            span.end = self.now()
+            span.cpu = time.thread_time() - span._cpu_start
+            span.peak_rss_mb = peak_rss_mb()
+            _active_spans.reset(token)
+            with self._lock:
+                self.spans.append(span)
+            if profiler:
+                self._save_profile(name, profiler)
+
+    def count(self, **counters: float):
+        """
+        Adds counters (e.g. bytes=..., frames=...) to every open span of the caller.
+        """
+        for span in _active_spans.get():
+            span.add(**counters)
+
+    def _save_profile(self, name: str, profiler: cProfile.Profile):
+        os.makedirs(self.trace_dir, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() else "_" for c in name)
+        path = os.path.join(self.trace_dir, f"{safe_name}_{os.getpid()}_{int(time.time())}.prof")
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(20)
+        print(f"Profile of '{name}' saved to {path}\n{out.getvalue()}")
+
+    def dump_partial(self):
+        """
+        Used in worker processes: writes this process's spans to the trace
+        directory, where the parent picks them up on export.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            spans, self.spans = self.spans, []
+        if not spans:
+            return
+        os.makedirs(self.trace_dir, exist_ok=True)
+        path = os.path.join(self.trace_dir, f"partial_{self.run_id}_{os.getpid()}_{time.time_ns()}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([span.to_event() for span in spans], f)
+
+    def events(self) -> List[Dict[str, Any]]:
+        """
+        All events: this process's spans plus partials written by its worker processes.
+        """
+        for path in glob.glob(os.path.join(self.trace_dir, f"partial_{self.run_id}_*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    partial = json.load(f)
+                os.remove(path)
+            except (OSError, ValueError):
+                continue
+            with self._lock:
+                self._partials.extend(partial)
+        with self._lock:
+            events = [span.to_event() for span in self.spans] + self._partials
+        return sorted(events, key=lambda e: e["ts"])
+
+    def export(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Writes a Chrome trace JSON. Returns the path, or None if tracing is off.
+        """
+        if not self.enabled:
+            return None
+        events = self.events()
+        os.makedirs(self.trace_dir, exist_ok=True)
+        path = path or os.path.join(self.trace_dir, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Spans aggregated by name: count, wall/CPU totals, peak RSS, bytes and frames.
+        """
+        events = self.events()
+        totals: Dict[str, Dict[str, Any]] = {}
+        for event in events:
+            args = event["args"]
+            row = totals.setdefault(event["name"], {"name": event["name"], "count": 0, "wall_s": 0.0,
+                                                    "cpu_s": 0.0, "peak_rss_mb": 0.0, "bytes": 0, "frames": 0})
+            row["count"] += 1
+            row["wall_s"] += event["dur"] / 1e6
+            row["cpu_s"] += args.get("cpu_s", 0.0)
+            row["peak_rss_mb"] = max(row["peak_rss_mb"], args.get("peak_rss_mb") or 0.0)
+            row["bytes"] += args.get("bytes", 0)
+            row["frames"] += args.get("frames", 0)
+        for row in totals.values():
+            row["fps"] = row["frames"] / row["wall_s"] if row["frames"] and row["wall_s"] else 0.0
+        return sorted(totals.values(), key=lambda row: row["wall_s"], reverse=True)
+
+    def format_summary(self) -> str:
+        lines = [f"{'span':<40} {'n':>4} {'wall s':>9} {'cpu s':>8} {'rss MB':>8} {'MB in':>8} {'fps':>7}"]
+        for row in self.summary():
+            lines.append(f"{row['name'][:40]:<40} {row['count']:>4} {row['wall_s']:>9.2f} {row['cpu_s']:>8.2f} "
+                         f"{row['peak_rss_mb']:>8.0f} {row['bytes'] / 1e6:>8.2f} {row['fps']:>7.1f}")
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+            self._partials = []
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """
+    Process-wide tracer. A forked worker process starts a fresh one instead
+    of re-reporting the spans it inherited from its parent.
+    """
+    global _tracer
+    if _tracer is None or _tracer.pid != os.getpid():
+        _tracer = Tracer()
+    return _tracer
+
+
+def in_worker_process() -> bool:
+    return multiprocessing.parent_process() is not None
+
+
+def traced(name: Optional[str] = None, category: str = ""):
+    """
+    Decorator: runs a function (sync or async) inside a span named
+    "<Class>.<method>" by default.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().span(span_name, category):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
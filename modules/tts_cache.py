@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+
+class TTSCache:
+    """
+    Content-addressed cache for synthesized speech.
+    Entries are keyed on (voice, engine version, cleaned text hash) and store
+    the audio next to its word timings. The directory is kept under max_bytes
+    by evicting the least recently used entries.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(voice: str, engine_version: str, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{voice}\0{engine_version}\0{text_hash}".encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.mp3", f"{base}.json"
+
+    def get(self, key: str) -> Optional[Tuple[bytes, List[Dict[str, Any]], float]]:
+        """
+        Returns (audio, timings, duration) for a key, or None on a miss.
+        """
+        audio_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(audio_path, "rb") as f:
+                audio = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Bump the access time used for LRU eviction
+        now = time.time()
+        try:
+            os.utime(meta_path, (now, now))
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return audio, meta["timings"], meta["duration"]
+
+    def put(self, key: str, audio: bytes, timings: List[Dict[str, Any]], duration: float):
+        """
+        Stores an entry, then evicts old entries if the cache is over budget.
+        """
+        audio_path, meta_path = self._paths(key)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        meta = json.dumps({"timings": timings, "duration": duration}, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+        # Size of the entry being overwritten, if any, so it isn't counted twice
+        try:
+            replaced = os.path.getsize(meta_path) + os.path.getsize(audio_path)
+        except OSError:
+            replaced = 0
+
+        # Audio first, metadata last: an entry only counts once its .json exists
+        for path, data in ((audio_path, audio), (meta_path, meta)):
+            with open(path + suffix, "wb") as f:
+                f.write(data)
+            os.replace(path + suffix, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(audio) + len(meta) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """
+        Lists (last access, size, key) for every complete entry.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            audio_path, meta_path = self._paths(key)
+            try:
+                meta_stat = os.stat(meta_path)
+                size = meta_stat.st_size + os.path.getsize(audio_path)
+            except OSError:
+                continue
+            entries.append((meta_stat.st_mtime, size, key))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Evict down to 90% so we don't rescan on every put
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= target:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+        self._total_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes": self._total_bytes if self._total_bytes is not None else self._scan_size(),
+            }
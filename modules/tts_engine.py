@@ -1,14 +1,131 @@
 import re
 import edge_tts
 import asyncio
-import json
 import os
 from config import Config
-from typing import List, Dict, Any
+from modules.tts_cache import TTSCache
+from modules.tracing import get_tracer, traced
+from modules.word_timeline import WordTimeline, as_timeline
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+# edge-tts streams audio-24khz-48kbitrate-mono-mp3 (constant bitrate)
+EDGE_MP3_BITRATE = 48000
+
+
+class SynthesisResult:
+    """
+    Output of one synthesis call: encoded audio, word timings
+    (seconds, relative to the start of this audio) and its duration.
+    """
+    def __init__(self, audio: bytes, timings: List[Dict[str, Any]], duration: float):
+        self.audio = audio
+        self.timings = timings
+        self.duration = duration
+
+
+class EdgeTTSBackend:
+    """
+    Default synthesis backend using Microsoft Edge's online TTS.
+    Any object with the same async synthesize(text, voice) method can be
+    passed to TTSEngine instead (e.g. a local fake for tests).
+    """
+    # Part of the TTS cache key, so upgrading edge-tts invalidates old audio
+    version = f"edge-tts-{getattr(edge_tts, '__version__', 'unknown')}"
+
+    async def synthesize(self, text: str, voice: str) -> SynthesisResult:
+        # edge-tts 7 reports sentence boundaries unless asked for words
+        communicate = edge_tts.Communicate(text, voice, boundary="WordBoundary")
+        
+        # We need to capture the subtitle data (word boundaries)
+        # edge-tts returns events.
+        
+        audio = bytearray()
+        word_timings = []
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                # offset and duration are in 100ns units (ticks)
+                # 1s = 10,000,000 ticks
+                start_s = chunk["offset"] / 10_000_000
+                end_s = (chunk["offset"] + chunk["duration"]) / 10_000_000
+                
+                word_timings.append({
+                    "word": chunk["text"],
+                    "start": start_s,
+                    "end": end_s
+                })
+
+        get_tracer().count(bytes=len(audio))
+        # CBR stream, so the duration follows directly from the byte count
+        duration = len(audio) * 8 / EDGE_MP3_BITRATE
+        return SynthesisResult(bytes(audio), word_timings, duration)
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """
+    Splits text into chunks of at most max_chars.
+    Paragraphs always start a new chunk; inside a paragraph whole sentences
+    are packed together, and only sentences longer than max_chars are cut on spaces.
+    """
+    chunks = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+
+        current = ""
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            pieces = [sentence]
+            if len(sentence) > max_chars:
+                pieces = []
+                piece = ""
+                for word in sentence.split(" "):
+                    if piece and len(piece) + 1 + len(word) > max_chars:
+                        pieces.append(piece)
+                        piece = word
+                    else:
+                        piece = f"{piece} {word}" if piece else word
+                if piece:
+                    pieces.append(piece)
+
+            for piece in pieces:
+                if current and len(current) + 1 + len(piece) > max_chars:
+                    chunks.append(current)
+                    current = piece
+                else:
+                    current = f"{current} {piece}" if current else piece
+        if current:
+            chunks.append(current)
+    return chunks
+
 
 class TTSEngine:
-    def __init__(self, voice: str = Config.VOICE_NAME):
+    def __init__(self, voice: str = Config.VOICE_NAME, backend: Optional[Any] = None, cache: Optional[TTSCache] = None):
         self.voice = voice
+        self.backend = backend or EdgeTTSBackend()
+        self.cache = cache
+        if self.cache is None and Config.TTS_CACHE_DIR:
+            self.cache = TTSCache(Config.TTS_CACHE_DIR, Config.TTS_CACHE_MAX_BYTES)
+
+    @traced()
+    async def synthesize(self, text: str) -> SynthesisResult:
+        """
+        Synthesizes text through the cache: a hit returns the stored audio
+        and timings without calling the backend.
+        """
+        if not self.cache:
+            return await self.backend.synthesize(text, self.voice)
+
+        engine_version = getattr(self.backend, "version", type(self.backend).__name__)
+        key = TTSCache.make_key(self.voice, engine_version, text)
+        cached = self.cache.get(key)
+        if cached:
+            return SynthesisResult(*cached)
+
+        result = await self.backend.synthesize(text, self.voice)
+        self.cache.put(key, result.audio, result.timings, result.duration)
+        return result
 
     def clean_text(self, text: str) -> str:
         """
@@ -32,6 +149,7 @@ class TTSEngine:
         
         return text.strip()
 
+    @traced()
     async def generate_audio(self, text: str, output_path: str) -> List[Dict[str, Any]]:
         """
         Generates audio file and returns word-level timestamps.
@@ -40,38 +158,100 @@ class TTSEngine:
         if not text:
             return []
 
-        communicate = edge_tts.Communicate(text, self.voice)
-        
-        # We need to capture the subtitle data (word boundaries)
-        # edge-tts returns events.
-        
-        word_timings = []
-        
+        result = await self.synthesize(text)
+
         # Ensure directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
         with open(output_path, "wb") as file:
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    file.write(chunk["data"])
-                elif chunk["type"] == "WordBoundary":
-                    # chunk is dict: {'type': 'WordBoundary', 'offset': 0, 'duration': 0, 'text': 'Hello'}
-                    # Convert to seconds? 
-                    # offset and duration are usually in 100ns units (ticks), need to verify for edge-tts
-                    # edge-tts doc: "offset": int (100ns units), "duration": int (100ns units)
-                    # 1s = 10,000,000 ticks
-                    
-                    start_s = chunk["offset"] / 10_000_000
-                    end_s = (chunk["offset"] + chunk["duration"]) / 10_000_000
-                    
+            file.write(result.audio)
+
+        return result.timings
+
+    async def generate_audio_long(self,
+                                  text: str,
+                                  output_path: str,
+                                  max_chars: int = Config.TTS_CHUNK_CHARS,
+                                  max_concurrency: int = Config.TTS_CONCURRENCY) -> List[Dict[str, Any]]:
+        """
+        Generates audio for full-length text.
+        The cleaned text is split on paragraph/sentence boundaries, chunks are
+        synthesized concurrently (at most max_concurrency at a time), then the
+        audio is stitched in order and word timings are rebased onto one timeline.
+        """
+        timings, _ = await self.generate_segments([text], output_path, max_chars, max_concurrency)
+        return timings
+
+    @traced()
+    async def generate_segments(self,
+                                texts: List[str],
+                                output_path: str,
+                                max_chars: int = Config.TTS_CHUNK_CHARS,
+                                max_concurrency: int = Config.TTS_CONCURRENCY) -> Tuple[List[Dict[str, Any]], List[Tuple[float, float]]]:
+        """
+        Generates one audio file reading several texts back to back (e.g. comments).
+        All chunks of all texts are synthesized concurrently.
+        Returns the word timings and the (start, end) of each text on the shared timeline;
+        texts that are empty after cleaning get a zero-length segment.
+        """
+        # (segment index, chunk text) for every chunk of every text
+        jobs = []
+        for index, text in enumerate(texts):
+            text = self.clean_text(text)
+            if text:
+                jobs.extend((index, chunk) for chunk in split_text(text, max_chars))
+        if not jobs:
+            return [], [(0.0, 0.0) for _ in texts]
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def synthesize_chunk(chunk: str) -> SynthesisResult:
+            async with semaphore:
+                # Cached per chunk, so sentences shared between stories are reused
+                return await self.synthesize(chunk)
+
+        results = await asyncio.gather(*[synthesize_chunk(chunk) for _, chunk in jobs])
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        word_timings = []
+        starts = {}
+        ends = {}
+        offset = 0.0
+        with open(output_path, "wb") as file:
+            for (index, _), result in zip(jobs, results):
+                starts.setdefault(index, offset)
+                # MP3 frames can be concatenated as-is
+                file.write(result.audio)
+                for t in result.timings:
                     word_timings.append({
-                        "word": chunk["text"],
-                        "start": start_s,
-                        "end": end_s
+                        "word": t["word"],
+                        "start": t["start"] + offset,
+                        "end": t["end"] + offset
                     })
+                offset += result.duration
+                ends[index] = offset
+
+        bounds = []
+        position = 0.0
+        for index in range(len(texts)):
+            if index in starts:
+                position = ends[index]
+                bounds.append((starts[index], ends[index]))
+            else:
+                bounds.append((position, position))
+        return word_timings, bounds
 
-        return word_timings
+    def save_timings(self, timings: Union[WordTimeline, List[Dict[str, Any]]], output_path: str):
+        """
+        Saves word timings in the binary WordTimeline format (or as JSON if
+        output_path ends in .json); modules.word_timeline.load_timings reads both.
+        """
+        timeline = as_timeline(timings)
+        if output_path.endswith(".json"):
+            timeline.save_json(output_path)
+        else:
+            timeline.save(output_path)
 
-    def save_subtitles_to_json(self, timings: List[Dict[str, Any]], output_path: str):
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(timings, f, ensure_ascii=False, indent=2)
+    def save_subtitles_to_json(self, timings: Union[WordTimeline, List[Dict[str, Any]]], output_path: str):
+        as_timeline(timings).save_json(output_path)
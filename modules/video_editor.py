@@ -1,19 +1,33 @@
-from moviepy.editor import VideoFileClip, AudioFileClip, TextClip, ImageClip, CompositeVideoClip, concatenate_audioclips
-from moviepy.video.tools.subtitles import SubtitlesClip
+from moviepy.editor import VideoFileClip, AudioFileClip, ImageClip, CompositeVideoClip, concatenate_audioclips
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+import math
 import os
-from typing import List, Dict, Any, Tuple
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Union
+import numpy as np
+from PIL import Image, ImageDraw
 from config import Config
+from modules.audio_mixer import AudioMixer
+from modules.caption_renderer import CaptionRenderer, load_font
+from modules.caption_layer import CaptionLayer
+from modules.ffmpeg_renderer import FFmpegRenderer
+from modules.media_utils import run_ffmpeg, probe_media
+from modules.tracing import get_tracer, traced
+from modules.word_timeline import WordTimeline, as_timeline
 
 class VideoAssembler:
     def __init__(self, output_width=1080, output_height=1920):
         self.width = output_width
         self.height = output_height
         self.safe_margin = 100
+        self.caption_renderer = CaptionRenderer()
 
-    def create_caption_clips(self, timings: List[Dict[str, Any]], fontsize=70, color='white', stroke_color='black', stroke_width=2) -> List[TextClip]:
+    def create_caption_clips(self, timings: List[Dict[str, Any]], fontsize=70, color='white', stroke_color='black', stroke_width=2) -> List[ImageClip]:
         """
-        Creates individual TextClips for dynamic captions.
+        Creates individual ImageClips for dynamic captions.
         timings: list of dicts with 'word', 'start', 'end'
+        Bitmaps come from the CaptionRenderer cache, so repeated words are drawn once.
         """
         clips = []
         for timing in timings:
@@ -22,57 +36,100 @@ class VideoAssembler:
             end = timing['end']
             duration = end - start
             
-            # Create TextClip
-            # Note: Method might vary slightly depending on MoviePy version (v1 vs v2)
-            # Assuming v1 common usage
-            try:
-                txt_clip = TextClip(
-                    word, 
-                    fontsize=fontsize, 
-                    color=color, 
-                    font='Arial-Bold', 
-                    stroke_color=stroke_color, 
-                    stroke_width=stroke_width,
-                    method='caption',
-                    size=(self.width - 200, None) # Wrap text if needed, though usually single words
-                )
-                txt_clip = txt_clip.set_position('center').set_start(start).set_duration(duration)
-                clips.append(txt_clip)
-            except Exception as e:
-                print(f"Error creating text clip for word '{word}': {e}")
-                # Fallback or invalid configuration (ImageMagick missing)
-                return []
+            bitmap = self.caption_renderer.render(
+                word,
+                fontsize=fontsize,
+                color=color,
+                stroke_color=stroke_color,
+                stroke_width=stroke_width,
+                max_width=self.width - 200
+            )
+            mask = ImageClip(bitmap.alpha, ismask=True)
+            txt_clip = ImageClip(bitmap.rgb).set_mask(mask)
+            txt_clip = txt_clip.set_position('center').set_start(start).set_duration(duration)
+            clips.append(txt_clip)
         
         return clips
 
-    def assemble_video(self, 
-                       background_path: str,
-                       files_map: Dict[str, Any],
-                       output_path: str):
+    def create_caption_layer(self, timings: Union[WordTimeline, List[Dict[str, Any]]], duration: float, fontsize=70, color='white', stroke_color='black', stroke_width=2) -> CaptionLayer:
         """
-        files_map: {
-            'title_audio': str,
-            'title_timings': List,
-            'title_screenshot': str,
-            'content_audio': str,
-            'content_timings': List
-        }
+        Creates a single clip that shows every caption.
+        Preferred over create_caption_clips for rendering, since the
+        compositor only has to check one layer per frame.
+        """
+        return CaptionLayer(
+            timings,
+            self.caption_renderer,
+            duration,
+            fontsize=fontsize,
+            color=color,
+            stroke_color=stroke_color,
+            stroke_width=stroke_width,
+            max_width=self.width - 200,
+            phrase_max_chars=Config.CAPTION_PHRASE_MAX_CHARS
+        ).set_position('center')
+
+    def fit_background(self, bg_clip: VideoFileClip) -> VideoFileClip:
+        """
+        Resizes a background to cover the output size and center crops it.
+        Proxies are already at the output size, so they pass through untouched
+        and no per-frame resize happens during the render.
+        """
+        if tuple(bg_clip.size) == (self.width, self.height):
+            return bg_clip
+
+        if bg_clip.w * self.height > self.width * bg_clip.h:
+            bg_clip = bg_clip.resize(height=self.height)
+        else:
+            bg_clip = bg_clip.resize(width=self.width)
+        # Center crop
+        if tuple(bg_clip.size) != (self.width, self.height):
+            bg_clip = bg_clip.crop(x_center=bg_clip.w/2, y_center=bg_clip.h/2, width=self.width, height=self.height)
+        return bg_clip
+
+    def fit_overlay(self, clip: ImageClip) -> ImageClip:
+        """
+        Shrinks a card or screenshot to leave a margin inside the output frame.
+        """
+        if clip.w > self.width - 100:
+            clip = clip.resize(width=self.width - 100)
+        if clip.h > self.height - 100:
+            clip = clip.resize(height=self.height - 100)
+        return clip
+
+    @traced()
+    def build_composite(self,
+                        background_path: str,
+                        files_map: Dict[str, Any],
+                        background: Optional[VideoFileClip] = None,
+                        captions: Optional[CaptionLayer] = None) -> Optional[CompositeVideoClip]:
+        """
+        Builds the full composite (background, title screenshot, captions, audio)
+        without writing it. Returns None if the background can't be loaded.
+        Uses the premixed track from mix_audio if files_map has one.
+        background / captions: already loaded layers to use instead of
+        background_path and content_timings (shared between the
+        composites of assemble_variants).
         """
-        print("Assembling video...")
-        
         # Load Resources
         try:
-            bg_clip = VideoFileClip(background_path)
+            bg_clip = background if background is not None else VideoFileClip(background_path)
         except Exception as e:
             print(f"Failed to load background video: {e}")
-            return
+            return None
 
-        title_audio = AudioFileClip(files_map['title_audio'])
-        content_audio = AudioFileClip(files_map['content_audio'])
-        
-        # Concatenate Audio
-        final_audio = concatenate_audioclips([title_audio, content_audio])
-        total_duration = final_audio.duration
+        if files_map.get('mixed_audio'):
+            final_audio = AudioFileClip(files_map['mixed_audio'])
+            title_duration = files_map['title_duration']
+            total_duration = files_map['total_duration']
+        else:
+            title_audio = AudioFileClip(files_map['title_audio'])
+            content_audio = AudioFileClip(files_map['content_audio'])
+
+            # Concatenate Audio
+            final_audio = concatenate_audioclips([title_audio, content_audio])
+            title_duration = title_audio.duration
+            total_duration = final_audio.duration
         
         # Prepare Background (Loop if needed)
         if bg_clip.duration < total_duration:
@@ -80,50 +137,398 @@ class VideoAssembler:
         else:
             bg_clip = bg_clip.subclip(0, total_duration)
             
-        bg_clip = bg_clip.resize(height=self.height)
-        # Center crop
-        if bg_clip.w > self.width:
-            bg_clip = bg_clip.crop(x1=bg_clip.w/2 - self.width/2, width=self.width, height=self.height)
+        bg_clip = self.fit_background(bg_clip)
         
         # 1. Title Section
         # Overlay Screenshot for the duration of title audio
-        title_duration = title_audio.duration
-        
         clips_to_overlay = []
         
         if files_map.get('title_screenshot') and os.path.exists(files_map['title_screenshot']):
             title_img = ImageClip(files_map['title_screenshot']).set_duration(title_duration).set_position('center')
-            # Resize if too wide
-            if title_img.w > self.width - 100:
-                title_img = title_img.resize(width=self.width - 100)
+            # Resize if too large
+            clips_to_overlay.append(self.fit_overlay(title_img))
             
-            clips_to_overlay.append(title_img)
+        # Optional images shown during parts of the content (e.g. comment cards)
+        for overlay in files_map.get('content_overlays', []):
+            if not overlay.get('image') or not os.path.exists(overlay['image']):
+                continue
+            card = ImageClip(overlay['image']).set_position('center')
+            card = card.set_start(title_duration + overlay['start']).set_duration(overlay['end'] - overlay['start'])
+            clips_to_overlay.append(self.fit_overlay(card))
             
         # 2. Content Section (Dynamic Captions)
-        # Offset timings by title_duration
-        content_timings = files_map.get('content_timings', [])
-        offset_timings = []
-        for t in content_timings:
-            offset_timings.append({
-                'word': t['word'],
-                'start': t['start'] + title_duration,
-                'end': t['end'] + title_duration
-            })
-            
-        captions = self.create_caption_clips(offset_timings)
-        clips_to_overlay.extend(captions)
+        # Offset timings by title_duration (shifting a timeline copies nothing)
+        content_timings = as_timeline(files_map.get('content_timings'))
+        if captions is None and len(content_timings):
+            captions = self.create_caption_layer(content_timings.shift(title_duration), total_duration)
+        if captions is not None:
+            clips_to_overlay.append(captions)
         
         # Combine
         final_video = CompositeVideoClip([bg_clip] + clips_to_overlay)
         final_video.audio = final_audio
-        
-        # Write File
-        print(f"Writing video to {output_path}...")
-        final_video.write_videofile(
-            output_path, 
-            fps=24, 
-            codec='libx264', 
-            audio_codec='aac',
-            threads=4
+        return final_video
+
+    def mix_audio(self, files_map: Dict[str, Any], output_path: str) -> Dict[str, Any]:
+        """
+        Premixes the soundtrack (see AudioMixer.mix) and returns files_map
+        with 'mixed_audio', 'title_duration' and 'total_duration' added.
+        """
+        mix = AudioMixer().mix(
+            files_map['title_audio'],
+            files_map['content_audio'],
+            output_path,
+            title_timings=files_map.get('title_timings'),
+            content_timings=files_map.get('content_timings')
         )
+        return dict(files_map, **mix)
+
+    @traced()
+    def assemble_video(self, 
+                       background_path: str,
+                       files_map: Dict[str, Any],
+                       output_path: str,
+                       engine: Optional[str] = None):
+        """
+        files_map: {
+            'title_audio': str,
+            'title_timings': List,
+            'title_screenshot': str,
+            'content_audio': str,
+            'content_timings': List,
+            'content_overlays': List (optional, {'image', 'start', 'end'} relative to content start),
+            'mixed_audio', 'title_duration', 'total_duration' (optional, from mix_audio;
+                mixed here if missing)
+        }
+        engine: "moviepy", "ffmpeg" or "parallel", defaults to Config.RENDER_ENGINE
+        """
+        engine = engine or Config.RENDER_ENGINE
+        if engine not in ("moviepy", "ffmpeg", "parallel"):
+            raise ValueError(f"Unknown render engine: {engine}")
+
+        with tempfile.TemporaryDirectory(prefix="mix_") as tmp_dir:
+            if not files_map.get('mixed_audio'):
+                files_map = self.mix_audio(files_map, os.path.join(tmp_dir, "mix.m4a"))
+
+            if engine == "ffmpeg":
+                FFmpegRenderer(self.width, self.height).render(background_path, files_map, output_path)
+            elif engine == "parallel":
+                self.assemble_video_parallel(background_path, files_map, output_path)
+            else:
+                print("Assembling video...")
+                final_video = self.build_composite(background_path, files_map)
+                if final_video is None:
+                    return
+
+                # Write File (the premixed AAC track is muxed as is)
+                print(f"Writing video to {output_path}...")
+                final_video.write_videofile(
+                    output_path,
+                    fps=24,
+                    codec='libx264',
+                    audio=files_map['mixed_audio'],
+                    threads=4
+                )
+                print("Video generation complete!")
+        self._count_frames(output_path)
+
+    @traced()
+    def render_preview(self,
+                       background_path: str,
+                       files_map: Dict[str, Any],
+                       output_path: Optional[str],
+                       scale: float = Config.PREVIEW_SCALE,
+                       fps: int = Config.PREVIEW_FPS,
+                       sample_every: Optional[float] = None,
+                       contact_sheet: Optional[str] = None,
+                       sheet_frames: int = 24,
+                       sheet_columns: int = 6) -> int:
+        """
+        Draft render for checking captions and card placement.
+        Frames come from the same build_composite as the final render, so the
+        layout is identical; they are only downscaled by `scale`, taken at
+        `fps` and encoded with the ultrafast preset. With sample_every, only
+        one frame every that many seconds is rendered (a silent time-lapse).
+        contact_sheet: optional image path for a grid of up to sheet_frames
+        timestamped thumbnails (output_path may then be None).
+        Returns the number of frames rendered.
+        """
+        step = sample_every or 1.0 / fps
+        with tempfile.TemporaryDirectory(prefix="preview_") as tmp_dir:
+            if not files_map.get('mixed_audio'):
+                files_map = self.mix_audio(files_map, os.path.join(tmp_dir, "mix.m4a"))
+            # Decoding the background is most of the per-frame cost, so it is
+            # first cut down to exactly the frames the preview needs
+            background_path = self._preview_background(background_path, files_map['total_duration'],
+                                                       1.0 / step, os.path.join(tmp_dir, "background.mp4"))
+            final_video = self.build_composite(background_path, files_map)
+            if final_video is None:
+                return 0
+
+            times = np.arange(0.0, final_video.duration, step)
+            # libx264 with yuv420p needs even dimensions
+            size = (max(2, round(self.width * scale / 2) * 2), max(2, round(self.height * scale / 2) * 2))
+            sheet_step = max(1, math.ceil(len(times) / sheet_frames))
+            thumbnails = []
+
+            writer = None
+            if output_path:
+                os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+                writer = FFMPEG_VideoWriter(
+                    output_path, size, 1.0 / step if sample_every else fps,
+                    codec='libx264',
+                    preset='ultrafast',
+                    # Sampled frames don't line up with the soundtrack
+                    audiofile=None if sample_every else files_map['mixed_audio'],
+                    ffmpeg_params=['-crf', str(Config.PREVIEW_CRF), '-pix_fmt', 'yuv420p']
+                )
+            print(f"Rendering preview ({size[0]}x{size[1]}, {len(times)} frames)...")
+            try:
+                for i, t in enumerate(times):
+                    frame = Image.fromarray(final_video.get_frame(t).astype(np.uint8))
+                    frame = frame.resize(size, Image.BILINEAR, reducing_gap=2.0)
+                    if writer:
+                        writer.write_frame(np.asarray(frame))
+                    if contact_sheet and i % sheet_step == 0:
+                        thumbnails.append((float(t), frame))
+            finally:
+                if writer:
+                    writer.close()
+                final_video.close()
+
+        if contact_sheet:
+            self.write_contact_sheet(thumbnails, contact_sheet, sheet_columns)
+            print(f"Contact sheet written to {contact_sheet}")
+        get_tracer().count(frames=len(times))
+        return len(times)
+
+    def _preview_background(self, background_path: str, duration: float, fps: float, output_path: str) -> str:
+        """
+        Loops, fits (cover and center crop, as in fit_background) and
+        resamples the background to `fps` in one ffmpeg pass, so the preview
+        reads it sequentially with no skipped or resized frames.
+        Falls back to the original file if ffmpeg fails.
+        """
+        W, H = self.width, self.height
+        try:
+            run_ffmpeg([
+                "-stream_loop", "-1", "-i", background_path,
+                "-t", f"{duration:.3f}",
+                "-vf", f"fps={fps:.4f},scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},setsar=1",
+                "-an", "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28",
+                output_path,
+            ])
+        except RuntimeError as e:
+            print(f"Could not prepare preview background: {e}")
+            return background_path
+        return output_path
+
+    def write_contact_sheet(self, thumbnails: List[Tuple[float, Image.Image]], output_path: str,
+                            columns: int = 6, thumb_width: int = 216):
+        """
+        Saves (time, frame) pairs as one grid image, each labeled with its timestamp.
+        """
+        if not thumbnails:
+            return
+        first = thumbnails[0][1]
+        thumb_size = (thumb_width, round(first.height * thumb_width / first.width))
+        rows = math.ceil(len(thumbnails) / columns)
+        padding = 8
+        sheet = Image.new("RGB", (columns * (thumb_size[0] + padding) + padding,
+                                  rows * (thumb_size[1] + padding) + padding), (16, 16, 16))
+        draw = ImageDraw.Draw(sheet)
+        font = load_font(Config.CAPTION_FONT, 18)
+        for i, (t, frame) in enumerate(thumbnails):
+            x = padding + (i % columns) * (thumb_size[0] + padding)
+            y = padding + (i // columns) * (thumb_size[1] + padding)
+            sheet.paste(frame.resize(thumb_size, Image.BILINEAR), (x, y))
+            draw.text((x + 6, y + 4), f"{int(t // 60)}:{t % 60:04.1f}", font=font, fill="white",
+                      stroke_width=2, stroke_fill="black")
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        sheet.save(output_path, quality=85)
+
+    @traced()
+    def assemble_variants(self,
+                          background_path: str,
+                          files_map: Dict[str, Any],
+                          targets: List[Dict[str, Any]],
+                          fps: int = 24) -> Dict[str, str]:
+        """
+        Fan-out render: several formats (e.g. 9:16, 1:1, 16:9) in one pass.
+        targets: [{'name', 'width', 'height', 'output', optional 'crf', 'bitrate', 'preset'}]
+        The soundtrack is mixed once, the background is decoded once (every
+        target's fitted copy reads the same cached frame) and the captions are
+        rasterized once, at the narrowest target's width, and shared. Each
+        target gets its own composite and its own ffmpeg encoder; frames are
+        handed to the encoders on writer threads, so the encoders run side by
+        side while the next frame is composited.
+        Returns {name: output path}.
+        """
+        with tempfile.TemporaryDirectory(prefix="mix_") as tmp_dir:
+            if not files_map.get('mixed_audio'):
+                files_map = self.mix_audio(files_map, os.path.join(tmp_dir, "mix.m4a"))
+            try:
+                background = VideoFileClip(background_path)
+            except Exception as e:
+                raise RuntimeError(f"Failed to load background video: {e}") from e
+
+            assemblers = [VideoAssembler(target['width'], target['height']) for target in targets]
+            for assembler in assemblers:
+                assembler.caption_renderer = self.caption_renderer
+            captions = None
+            content_timings = as_timeline(files_map.get('content_timings'))
+            if len(content_timings):
+                narrowest = min(assemblers, key=lambda a: a.width)
+                captions = narrowest.create_caption_layer(content_timings.shift(files_map['title_duration']),
+                                                          files_map['total_duration'])
+            composites = [assembler.build_composite(background_path, files_map, background=background,
+                                                    captions=captions)
+                          for assembler in assemblers]
+
+            writers = []
+            for target in targets:
+                os.makedirs(os.path.dirname(os.path.abspath(target['output'])), exist_ok=True)
+                params = ['-pix_fmt', 'yuv420p']
+                if not target.get('bitrate'):
+                    params += ['-crf', str(target.get('crf', Config.FFMPEG_CRF))]
+                writers.append(FFMPEG_VideoWriter(
+                    target['output'], (target['width'], target['height']), fps,
+                    codec='libx264',
+                    # write_videofile's default, so the main format matches assemble_video
+                    preset=target.get('preset', 'medium'),
+                    bitrate=target.get('bitrate'),
+                    audiofile=files_map['mixed_audio'],
+                    ffmpeg_params=params
+                ))
+
+            print(f"Writing {len(targets)} formats in one pass: " +
+                  ", ".join(f"{t['name']} {t['width']}x{t['height']}" for t in targets))
+            n_frames = int(files_map['total_duration'] * fps)
+            pools = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"encode-{t['name']}") for t in targets]
+            pending = [None] * len(targets)
+            try:
+                for i in range(n_frames):
+                    t = i / fps
+                    for k, composite in enumerate(composites):
+                        frame = composite.get_frame(t).astype(np.uint8)
+                        # At most one frame in flight per encoder
+                        if pending[k] is not None:
+                            pending[k].result()
+                        pending[k] = pools[k].submit(writers[k].write_frame, frame)
+                for future in pending:
+                    if future is not None:
+                        future.result()
+            finally:
+                for pool in pools:
+                    pool.shutdown(wait=True)
+                for writer in writers:
+                    writer.close()
+                background.close()
+        get_tracer().count(frames=n_frames * len(targets))
         print("Video generation complete!")
+        return {target['name']: target['output'] for target in targets}
+
+    def _count_frames(self, output_path: str):
+        """
+        Adds the number of encoded frames to the open trace spans (for frames/s).
+        """
+        tracer = get_tracer()
+        if not tracer.enabled or not os.path.exists(output_path):
+            return
+        try:
+            info = probe_media(output_path)
+        except RuntimeError:
+            return
+        tracer.count(frames=round(info["duration"] * (info["fps"] or 24)))
+
+    def plan_segments(self, total_duration: float, workers: int, fps: int = 24, gop: int = 24) -> List[Tuple[float, float]]:
+        """
+        Splits [0, total_duration] into at most `workers` segments.
+        Boundaries fall on multiples of the GOP length, so every segment
+        starts on a keyframe and the pieces can be joined without re-encoding.
+        """
+        gop_seconds = gop / fps
+        total_gops = max(1, math.ceil(total_duration / gop_seconds))
+        workers = max(1, min(workers, total_gops))
+        gops_per_segment = math.ceil(total_gops / workers)
+
+        segments = []
+        for first_gop in range(0, total_gops, gops_per_segment):
+            start = first_gop * gop_seconds
+            end = min(total_duration, (first_gop + gops_per_segment) * gop_seconds)
+            if end > start:
+                segments.append((start, end))
+        return segments
+
+    @traced()
+    def assemble_video_parallel(self,
+                                background_path: str,
+                                files_map: Dict[str, Any],
+                                output_path: str,
+                                workers: Optional[int] = None):
+        """
+        Renders the timeline in keyframe-aligned segments, one worker process each,
+        then joins them with ffmpeg's concat demuxer (video is stream-copied)
+        and muxes the premixed audio track.
+        """
+        workers = workers or Config.RENDER_WORKERS or os.cpu_count() or 1
+        fps = 24
+        total_duration = files_map['total_duration']
+        segments = self.plan_segments(total_duration, workers, fps=fps, gop=fps)
+        print(f"Assembling video in {len(segments)} parallel segments...")
+
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(output_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="segments_", dir=output_dir) as tmp_dir:
+            jobs = []
+            for i, (start, end) in enumerate(segments):
+                segment_path = os.path.join(tmp_dir, f"segment_{i:04d}.mp4")
+                jobs.append((self.width, self.height, background_path, files_map, start, end, fps, segment_path))
+
+            with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+                segment_paths = list(pool.map(_render_segment, jobs))
+
+            list_path = os.path.join(tmp_dir, "segments.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for path in segment_paths:
+                    f.write(f"file '{path}'\n")
+
+            print(f"Joining segments into {output_path}...")
+            run_ffmpeg([
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-i", files_map['mixed_audio'],
+                "-map", "0:v", "-map", "1:a",
+                "-c:v", "copy",
+                "-c:a", "copy",
+                "-movflags", "+faststart",
+                output_path,
+            ])
+        print("Video generation complete!")
+
+
+def _render_segment(job: tuple) -> str:
+    """
+    Worker entry point for assemble_video_parallel.
+    Rebuilds the composite from the same inputs and encodes one time range (video only).
+    """
+    width, height, background_path, files_map, start, end, fps, segment_path = job
+    tracer = get_tracer()
+    with tracer.span("VideoAssembler.render_segment", start=start, end=end) as span:
+        assembler = VideoAssembler(width, height)
+        final_video = assembler.build_composite(background_path, files_map)
+        if final_video is None:
+            raise RuntimeError(f"Could not load background {background_path}")
+
+        segment = final_video.subclip(start, end).without_audio()
+        segment.write_videofile(
+            segment_path,
+            fps=fps,
+            codec='libx264',
+            audio=False,
+            threads=1,
+            ffmpeg_params=['-g', str(fps), '-pix_fmt', 'yuv420p'],
+            logger=None
+        )
+        span.add(frames=round((end - start) * fps))
+    tracer.dump_partial()
+    return segment_path
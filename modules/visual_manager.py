@@ -1,51 +1,88 @@
-import requests
 import random
 import os
-import re
-from collections import Counter
+import threading
 from config import Config
-from typing import List, Optional
+from modules.background_proxy import BackgroundProxyCache
+from modules.downloader import Downloader, SearchCache
+from modules.background_index import BackgroundIndex, tokenize_tags
+from modules.keyword_engine import get_shared_engine
+from modules.tracing import get_tracer, traced
+from typing import List, Optional, Tuple
 
 class VisualManager:
     def __init__(self):
         self.api_key = Config.PEXELS_API_KEY
-        self.base_url = "https://api.pexels.com/videos/search"
+        self.base_url = Config.PEXELS_API_URL
         self.fallback_dir = os.path.join("assets", "backgrounds")
         
         # Ensure fallback dir exists
         os.makedirs(self.fallback_dir, exist_ok=True)
+        self.proxies = BackgroundProxyCache() if Config.USE_BACKGROUND_PROXIES else None
+        # One pooled session for searches and downloads
+        self.downloader = Downloader()
+        self.session = self.downloader.session
+        self.search_cache = SearchCache()
+        # Local tagged library: selection never needs the network
+        self.index = BackgroundIndex()
+        self.index.scan_directory(self.fallback_dir)
+        self._growth_lock = threading.Lock()
+        self._growth_thread: Optional[threading.Thread] = None
+        self.keywords = get_shared_engine()
 
+    def ingest_library(self) -> List[str]:
+        """
+        Creates render-ready proxies for every clip in the fallback library.
+        Safe to run repeatedly: already ingested clips are skipped.
+        """
+        if not self.proxies:
+            return []
+        return self.proxies.ingest_directory(self.fallback_dir)
+
+    @traced()
+    def to_proxy(self, path: str) -> str:
+        """
+        Returns the proxy for a background clip, or the clip itself if proxies
+        are disabled or transcoding fails.
+        """
+        if not self.proxies or not path:
+            return path
+        try:
+            return self.proxies.get_proxy(path)
+        except (OSError, RuntimeError) as e:
+            print(f"Could not create background proxy: {e}")
+            return path
+
+    @traced()
     def extract_keywords(self, text: str, max_keywords: int = 3) -> str:
         """
         Extracts search keywords from text.
-        Simple logic: remove stopwords, sort by length/frequency.
+        Words are ranked by TF-IDF against every story seen so far,
+        so generic words rank below story-specific ones. The story itself was
+        already added to the corpus (by id) from the catalog, so it is not
+        counted again here.
         """
         if not text:
             return "satisfying" # Generic fallback
 
-        # Basic stopwords list
-        stopwords = set(['the', 'and', 'to', 'of', 'a', 'in', 'is', 'that', 'with', 'for', 'it', 'on', 'was', 'my', 'me', 'at', 'this', 'but', 'have', 'had', 'not', 'be', 'are', 'we', 'from', 'so', 'just', 'like', 'about', 'what', 'an', 'if', 'or', 'when', 'one', 'all', 'do', 'they', 'can', 'up', 'out', 'there', 'who', 'get', 'go', 'would'])
-        
-        words = re.findall(r'\w+', text.lower())
-        meaningful_words = [w for w in words if w not in stopwords and len(w) > 3]
-        
-        if not meaningful_words:
+        keywords = self.keywords.extract(text, max_keywords, update=False)
+        if not keywords:
             return "satisfying"
-
-        # Most common meaningful words might set the "theme"
-        # But for Reddit stories, often "minecraft parkour" or "subway surfers" is the requested style.
-        # If the user wants specific background styles, we can enforce that.
-        # For "Dynamic Backgrounds" based on story:
-        counts = Counter(meaningful_words)
-        common = counts.most_common(max_keywords)
-        
-        return " ".join([w[0] for w in common])
+        return " ".join(keywords)
 
     def search_pexels(self, query: str) -> Optional[str]:
         """
         Searches Pexels for vertical videos.
         Returns the download URL of a video.
         """
+        result = self.search_pexels_video(query)
+        return result[0] if result else None
+
+    @traced()
+    def search_pexels_video(self, query: str) -> Optional[Tuple[str, List[str]]]:
+        """
+        Same as search_pexels, but also returns tags for the picked video
+        (taken from its Pexels page slug, e.g. /video/aerial-view-of-city-123/).
+        """
         if not self.api_key:
             print("Pexels API Key not found.")
             return None
@@ -59,9 +96,12 @@ class VisualManager:
         }
 
         try:
-            response = requests.get(self.base_url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self.search_cache.get(params)
+            if data is None:
+                response = self.session.get(self.base_url, headers=headers, params=params, timeout=30)
+                response.raise_for_status()
+                data = response.json()
+                self.search_cache.put(params, data)
             
             videos = data.get("videos", [])
             if not videos:
@@ -83,48 +123,92 @@ class VisualManager:
             if not target_file and video_files:
                 target_file = video_files[0]
                 
-            return target_file.get("link")
+            tags = tokenize_tags(video.get("url", "").rstrip("/").rsplit("/", 1)[-1])
+            return target_file.get("link"), tags
 
         except Exception as e:
             print(f"Error searching Pexels: {e}")
             return None
 
-    def download_video(self, url: str, output_path: str) -> bool:
+    @traced()
+    def download_video(self, url: str) -> str:
+        """
+        Downloads a video into the content-addressed download store.
+        Returns the local path, or "" on failure.
+        """
+        before = self.downloader.bytes_downloaded
         try:
-            with requests.get(url, stream=True) as r:
-                r.raise_for_status()
-                with open(output_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            return True
+            return self.downloader.download(url)
         except Exception as e:
             print(f"Error downloading video: {e}")
-            return False
+            return ""
+        finally:
+            get_tracer().count(bytes=self.downloader.bytes_downloaded - before)
 
-    def get_background_video(self, text: str = "") -> str:
+    @traced()
+    def fetch_from_pexels(self, keywords: str) -> str:
+        """
+        Searches Pexels, downloads the clip and adds it to the background index.
+        Returns the local path, or "" on failure.
+        """
+        # Can force "minecraft parkour" search if generic keywords
+        search_query = keywords + " aesthetic" 
+        
+        result = self.search_pexels_video(search_query)
+        if not result:
+            return ""
+        video_url, tags = result
+        output_path = self.download_video(video_url)
+        if output_path:
+            self.index.add_clip(output_path, tokenize_tags(keywords) + tags, source="pexels")
+        return output_path
+
+    def grow_library(self, keywords: str) -> Optional[threading.Thread]:
+        """
+        Fetches a matching clip from Pexels on a background thread,
+        so the next story with similar keywords finds it locally.
+        Only one growth download runs at a time.
+        """
+        if not self.api_key:
+            return None
+        with self._growth_lock:
+            if self._growth_thread and self._growth_thread.is_alive():
+                return self._growth_thread
+
+            def grow():
+                path = self.fetch_from_pexels(keywords)
+                if path:
+                    # Warm the proxy too, so the first render using it is fast
+                    self.to_proxy(path)
+
+            self._growth_thread = threading.Thread(target=grow, name="background-growth", daemon=True)
+            self._growth_thread.start()
+            return self._growth_thread
+
+    @traced()
+    def get_background_video(self, text: str = "", min_duration: float = 0.0) -> str:
         """
         Main method to get a background video path.
-        Returns absolute path to video file.
+        Picks the best match from the local background index (no network);
+        the library is grown in the background when matches are weak.
         """
         keywords = self.extract_keywords(text)
         print(f"Extracted background keywords: {keywords}")
         
-        # Try Pexels
-        # Can force "minecraft parkour" search if generic keywords
-        search_query = keywords + " aesthetic" 
-        
-        video_url = self.search_pexels(search_query)
-        if video_url:
-            output_path = os.path.join("assets", "temp", "background.mp4")
-            if self.download_video(video_url, output_path):
-                return output_path
+        path, score = self.index.select(tokenize_tags(keywords), min_duration)
+        if score < Config.BACKGROUND_MATCH_THRESHOLD:
+            self.grow_library(keywords)
+        if path:
+            print(f"Using indexed background (match {score:.2f}).")
+            return self.to_proxy(path)
         
-        # Fallback to local
-        print("Using fallback background.")
-        # Check if any mp4 exists in fallback_dir
-        files = [f for f in os.listdir(self.fallback_dir) if f.endswith(".mp4")]
-        if files:
-            return os.path.join(self.fallback_dir, random.choice(files))
+        # Empty library: nothing to fall back to, so fetch synchronously
+        thread = self.grow_library(keywords)
+        if thread:
+            thread.join()
+            path, _ = self.index.select(tokenize_tags(keywords), min_duration)
+            if path:
+                return self.to_proxy(path)
         
         print(f"No background found in {self.fallback_dir}.")
         return ""
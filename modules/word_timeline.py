@@ -0,0 +1,312 @@
+import json
+import os
+import struct
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+# Binary layout: header, starts (float64), ends (float64), word ids (uint32),
+# word table byte lengths (uint32), word table (UTF-8, concatenated)
+MAGIC = b"WTL1"
+HEADER = struct.Struct("<4sIId")  # magic, entries, table size, offset
+
+
+def _format_timestamps(seconds: np.ndarray, ms_digits: int, separator: str, hour_width: int) -> List[str]:
+    """
+    H:MM:SS.cc style timestamps for a whole array; the arithmetic is vectorized.
+    """
+    unit = 10 ** ms_digits
+    ticks = np.round(np.maximum(seconds, 0.0) * unit).astype(np.int64)
+    hours, ticks = np.divmod(ticks, 3600 * unit)
+    minutes, ticks = np.divmod(ticks, 60 * unit)
+    secs, fraction = np.divmod(ticks, unit)
+    return [f"{h:0{hour_width}d}:{m:02d}:{s:02d}{separator}{f:0{ms_digits}d}"
+            for h, m, s, f in zip(hours.tolist(), minutes.tolist(), secs.tolist(), fraction.tolist())]
+
+
+class WordTimeline:
+    """
+    Word timings as parallel arrays: start and end times (float64 seconds)
+    and word ids into an interned table of distinct words.
+    shift() only changes a stored offset and slicing returns views, so
+    moving a timeline (e.g. past the title) or cutting a window out of an
+    hour-long one copies nothing; lookups by time are binary searches.
+    Pipeline stages still pass timings around as lists of
+    {'word', 'start', 'end'} dicts (they have to be JSON for manifests);
+    consumers convert once with as_timeline.
+    """
+    __slots__ = ("_starts", "_ends", "word_ids", "words", "offset")
+
+    def __init__(self,
+                 starts: np.ndarray,
+                 ends: np.ndarray,
+                 word_ids: np.ndarray,
+                 words: List[str],
+                 offset: float = 0.0):
+        self._starts = np.asarray(starts, dtype=np.float64)
+        self._ends = np.asarray(ends, dtype=np.float64)
+        self.word_ids = np.asarray(word_ids, dtype=np.uint32)
+        self.words = words
+        self.offset = float(offset)
+
+    @classmethod
+    def from_dicts(cls, timings: Iterable[Dict[str, Any]]) -> "WordTimeline":
+        table: Dict[str, int] = {}
+        starts, ends, ids = [], [], []
+        for t in timings:
+            starts.append(t['start'])
+            ends.append(t['end'])
+            ids.append(table.setdefault(t['word'], len(table)))
+        return cls(np.array(starts, dtype=np.float64), np.array(ends, dtype=np.float64),
+                   np.array(ids, dtype=np.uint32), list(table))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        words = self.words
+        return [{'word': words[i], 'start': s, 'end': e}
+                for i, s, e in zip(self.word_ids.tolist(), self.starts.tolist(), self.ends.tolist())]
+
+    # Access
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.to_dicts())
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Dict[str, Any], "WordTimeline"]:
+        if isinstance(key, slice):
+            return WordTimeline(self._starts[key], self._ends[key], self.word_ids[key], self.words, self.offset)
+        return {'word': self.words[self.word_ids[key]],
+                'start': float(self._starts[key]) + self.offset,
+                'end': float(self._ends[key]) + self.offset}
+
+    def __repr__(self):
+        return f"WordTimeline({len(self)} words, {len(self.words)} distinct, {self.start:.2f}s-{self.end:.2f}s)"
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts + self.offset if self.offset else self._starts
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends + self.offset if self.offset else self._ends
+
+    @property
+    def start(self) -> float:
+        return float(self._starts[0]) + self.offset if len(self) else self.offset
+
+    @property
+    def end(self) -> float:
+        return float(self._ends.max()) + self.offset if len(self) else self.offset
+
+    def texts(self) -> List[str]:
+        words = self.words
+        return [words[i] for i in self.word_ids.tolist()]
+
+    def intervals(self) -> np.ndarray:
+        """
+        (n, 2) array of [start, end] rows.
+        """
+        return np.stack([self.starts, self.ends], axis=1) if len(self) else np.zeros((0, 2))
+
+    # Time operations (timelines are expected to be sorted by start, see sorted())
+
+    def shift(self, delta: float) -> "WordTimeline":
+        """
+        The same words delta seconds later. O(1): the arrays are shared.
+        """
+        return WordTimeline(self._starts, self._ends, self.word_ids, self.words, self.offset + delta)
+
+    def is_sorted(self) -> bool:
+        return bool(np.all(self._starts[1:] >= self._starts[:-1]))
+
+    def sorted(self) -> "WordTimeline":
+        if self.is_sorted():
+            return self
+        order = np.argsort(self._starts, kind="stable")
+        return WordTimeline(self._starts[order], self._ends[order], self.word_ids[order], self.words, self.offset)
+
+    def index_at(self, t: float) -> int:
+        """
+        Index of the word being spoken at time t, or -1.
+        """
+        i = int(np.searchsorted(self._starts, t - self.offset, side="right")) - 1
+        if i >= 0 and t - self.offset < self._ends[i]:
+            return i
+        return -1
+
+    def indices_at(self, times: Sequence[float]) -> np.ndarray:
+        """
+        index_at for many times at once (-1 where no word is active).
+        """
+        local = np.asarray(times, dtype=np.float64) - self.offset
+        indices = np.searchsorted(self._starts, local, side="right") - 1
+        active = indices >= 0
+        active[active] = local[active] < self._ends[indices[active]]
+        return np.where(active, indices, -1)
+
+    def window(self, t0: float, t1: float) -> "WordTimeline":
+        """
+        View of the words starting in [t0, t1).
+        """
+        lo, hi = np.searchsorted(self._starts, [t0 - self.offset, t1 - self.offset], side="left")
+        return self[int(lo):int(hi)]
+
+    @classmethod
+    def concat(cls, timelines: Sequence["WordTimeline"]) -> "WordTimeline":
+        """
+        Joins timelines (each with its own offset) into one, allocating every
+        array once. Word tables are merged, or shared if all parts use the same one.
+        """
+        timelines = [t for t in timelines if len(t)]
+        if not timelines:
+            return cls.empty()
+        total = sum(len(t) for t in timelines)
+        starts = np.empty(total, dtype=np.float64)
+        ends = np.empty(total, dtype=np.float64)
+        ids = np.empty(total, dtype=np.uint32)
+
+        shared = all(t.words is timelines[0].words for t in timelines)
+        words = timelines[0].words if shared else []
+        table: Dict[str, int] = {}
+        position = 0
+        for timeline in timelines:
+            n = len(timeline)
+            np.add(timeline._starts, timeline.offset, out=starts[position:position + n])
+            np.add(timeline._ends, timeline.offset, out=ends[position:position + n])
+            if shared:
+                ids[position:position + n] = timeline.word_ids
+            else:
+                remap = np.array([table.setdefault(w, len(table)) for w in timeline.words], dtype=np.uint32)
+                ids[position:position + n] = remap[timeline.word_ids]
+            position += n
+        if not shared:
+            words = list(table)
+        return cls(starts, ends, ids, words)
+
+    @classmethod
+    def empty(cls) -> "WordTimeline":
+        return cls(np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.uint32), [])
+
+    def group_phrases(self, max_chars: int, max_gap: float = 0.35) -> "WordTimeline":
+        """
+        Merges consecutive words into short phrases: a new phrase starts when
+        adding a word would exceed max_chars or when the pause before it is
+        longer than max_gap seconds.
+        The greedy packing is computed without a loop over words: for every
+        word, the word that would start the next phrase is found from
+        cumulative lengths (searchsorted) and the next forced break; the chain
+        of phrase starts from word 0 is then collected by pointer doubling.
+        """
+        n = len(self)
+        if n == 0:
+            return self
+        lengths = np.array([len(w) for w in self.words], dtype=np.int64)[self.word_ids]
+        # cumulative[i] = characters of words before i, each followed by a space
+        cumulative = np.concatenate([[0], np.cumsum(lengths + 1)])
+        index = np.arange(n)
+
+        fits = np.searchsorted(cumulative, cumulative[:-1] + max_chars + 1, side="right") - 1
+        breaks = np.flatnonzero(self._starts[1:] - self._ends[:-1] > max_gap) + 1
+        after = np.searchsorted(breaks, index, side="right")
+        next_break = np.append(breaks, n)[after]
+        next_start = np.maximum(index + 1, np.minimum(fits, next_break))
+
+        # Starts reachable from word 0: after step k the set covers chains of up to 2^k - 1 jumps
+        jump = np.append(next_start, n)
+        on_chain = np.zeros(n + 1, dtype=bool)
+        on_chain[0] = True
+        for _ in range(max(1, int(n).bit_length())):
+            on_chain[jump[np.flatnonzero(on_chain)]] = True
+            jump = jump[jump]
+        phrase_starts = np.flatnonzero(on_chain[:n])
+        phrase_ends = np.append(phrase_starts[1:], n)
+
+        texts = self.texts()
+        table: Dict[str, int] = {}
+        ids = np.array([table.setdefault(" ".join(texts[a:b]), len(table))
+                        for a, b in zip(phrase_starts.tolist(), phrase_ends.tolist())], dtype=np.uint32)
+        return WordTimeline(self._starts[phrase_starts], self._ends[phrase_ends - 1], ids, list(table), self.offset)
+
+    # Serialization
+
+    def save(self, path: str):
+        """
+        Writes the compact binary format (see load).
+        """
+        encoded = [w.encode("utf-8") for w in self.words]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(self), len(encoded), self.offset))
+            f.write(np.ascontiguousarray(self._starts, dtype="<f8").tobytes())
+            f.write(np.ascontiguousarray(self._ends, dtype="<f8").tobytes())
+            f.write(np.ascontiguousarray(self.word_ids, dtype="<u4").tobytes())
+            f.write(np.array([len(b) for b in encoded], dtype="<u4").tobytes())
+            f.write(b"".join(encoded))
+
+    @classmethod
+    def load(cls, path: str) -> "WordTimeline":
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, n, table_size, offset = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a word timeline file")
+        position = HEADER.size
+
+        def take(dtype: str, count: int) -> np.ndarray:
+            nonlocal position
+            array = np.frombuffer(data, dtype=dtype, count=count, offset=position)
+            position += array.nbytes
+            return array
+
+        starts, ends, ids = take("<f8", n), take("<f8", n), take("<u4", n)
+        lengths = take("<u4", table_size).tolist()
+        words = []
+        for length in lengths:
+            words.append(data[position:position + length].decode("utf-8"))
+            position += length
+        return cls(starts, ends, ids, words, offset)
+
+    def save_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dicts(), f, ensure_ascii=False, separators=(",", ":"))
+
+    def to_srt(self) -> str:
+        begins = _format_timestamps(self.starts, 3, ",", 2)
+        finishes = _format_timestamps(self.ends, 3, ",", 2)
+        blocks = [f"{i}\n{b} --> {e}\n{text}\n"
+                  for i, (b, e, text) in enumerate(zip(begins, finishes, self.texts()), start=1)]
+        return "\n".join(blocks)
+
+    def ass_events(self, style: str, font_sizes: Optional[Sequence[Optional[int]]] = None) -> List[str]:
+        """
+        ASS Dialogue lines, one per entry. font_sizes (parallel to self.words)
+        overrides the style's font size for individual words or phrases.
+        """
+        begins = _format_timestamps(self.starts, 2, ".", 1)
+        finishes = _format_timestamps(self.ends, 2, ".", 1)
+        # Braces start override blocks in ASS, so they can't appear in plain text
+        table = [w.replace("{", "(").replace("}", ")").replace("\n", " ") for w in self.words]
+        if font_sizes:
+            table = [f"{{\\fs{size}}}{text}" if size else text for text, size in zip(table, font_sizes)]
+        return [f"Dialogue: 0,{b},{e},{style},,0,0,0,,{table[i]}"
+                for b, e, i in zip(begins, finishes, self.word_ids.tolist())]
+
+
+def as_timeline(timings: Optional[Union[WordTimeline, Iterable[Dict[str, Any]]]]) -> WordTimeline:
+    """
+    Accepts a WordTimeline or a list of {'word', 'start', 'end'} dicts.
+    """
+    if isinstance(timings, WordTimeline):
+        return timings
+    return WordTimeline.from_dicts(timings or [])
+
+
+def load_timings(path: str) -> WordTimeline:
+    """
+    Loads a binary timeline or a JSON list of timings, by extension.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return WordTimeline.from_dicts(json.load(f))
+    return WordTimeline.load(path)
@@ -0,0 +1,78 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.browser_pool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakePool(BrowserPool):
+    def __init__(self, size=1):
+        super().__init__(size)
+        self.created = []
+
+    def _create_driver(self):
+        driver = FakeDriver()
+        self.created.append(driver)
+        return driver
+
+
+def test_session_returns_driver_after_other_errors():
+    pool = FakePool(size=1)
+    with pytest.raises(ValueError):
+        with pool.session():
+            raise ValueError("boom")
+    # With size 1 this would block forever if the driver had leaked
+    with pool.session(timeout=1) as driver:
+        assert driver is pool.created[0]
+    assert len(pool.created) == 1
+
+
+def test_session_replaces_crashed_driver():
+    pool = FakePool(size=1)
+    with pytest.raises(WebDriverException):
+        with pool.session():
+            raise WebDriverException("crashed")
+    assert pool.created[0].quit_called
+    with pool.session(timeout=1) as driver:
+        assert driver is pool.created[1]
+
+
+def test_crash_wakes_waiting_caller():
+    pool = FakePool(size=1)
+    acquired = []
+
+    def wait_for_browser():
+        with pool.session(timeout=5) as driver:
+            acquired.append(driver)
+
+    with pytest.raises(WebDriverException):
+        with pool.session():
+            waiter = threading.Thread(target=wait_for_browser)
+            waiter.start()
+            time.sleep(0.1)  # Let the waiter block on the full pool
+            raise WebDriverException("crashed")
+    waiter.join(timeout=5)
+    assert not waiter.is_alive()
+    assert acquired == [pool.created[1]]
+
+
+def test_acquire_times_out_when_pool_is_busy():
+    pool = FakePool(size=1)
+    with pool.session():
+        with pytest.raises(TimeoutError):
+            with pool.session(timeout=0.1):
+                pass